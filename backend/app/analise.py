@@ -0,0 +1,304 @@
+# backend/app/analise.py
+# Análise estática da KB: grafo de dependências entre variáveis, ciclos,
+# ordem topológica e regras que nunca podem disparar.
+
+import os
+
+from .models import BaseConhecimento, _OPERADORES_ORDEM, _para_float
+
+# Com KB_PODAR_REGRAS=0 os motores voltam a usar todas as regras (a análise
+# continua disponível em /api/analise)
+PODAR_REGRAS = os.environ.get("KB_PODAR_REGRAS", "1") != "0"
+
+_OPERADORES = ("==", "!=", "in", *_OPERADORES_ORDEM)
+
+
+class _Dominio:
+    """Valores que uma variável pode assumir: os declarados (valores_possiveis
+    da univalorada, intervalo min/max da numérica) mais os concluídos por
+    regras vivas. Sem declaração o domínio é aberto e nada se pode descartar."""
+
+    __slots__ = ("declarados", "concluidos", "minimo", "maximo", "aberto")
+
+    def __init__(self, variavel):
+        self.declarados = ()
+        self.concluidos = {}  # repr(valor) -> valor
+        self.minimo = self.maximo = None
+        self.aberto = True
+        if variavel is None:
+            return
+        if variavel.tipo == "univalorada" and variavel.valores_possiveis:
+            self.declarados = tuple(variavel.valores_possiveis)
+            self.aberto = False
+        elif variavel.tipo == "numerica":
+            self.minimo = _para_float(variavel.min_val)
+            self.maximo = _para_float(variavel.max_val)
+            self.aberto = self.minimo is None and self.maximo is None
+
+    def valores(self):
+        return (*self.declarados, *self.concluidos.values())
+
+    def admite(self, condicoes):
+        """Algum valor do domínio satisfaz todas as condições (sobre esta variável)?"""
+        if self.aberto:
+            return True
+        if any(all(c.avaliar(v) for c in condicoes) for v in self.valores()):
+            return True
+        if self.declarados:
+            return False
+        # Intervalo numérico: basta cada condição caber nele (a conjunção não é checada)
+        return all(self._intervalo_admite(c) for c in condicoes)
+
+    def _intervalo_admite(self, cond):
+        lo, hi = self.minimo, self.maximo
+
+        def dentro(x):
+            return (lo is None or x >= lo) and (hi is None or x <= hi)
+
+        if cond.operador in _OPERADORES_ORDEM:
+            alvo = _para_float(cond.valor)
+            if cond.operador in (">", ">="):
+                return hi is None or _OPERADORES_ORDEM[cond.operador](hi, alvo)
+            return lo is None or _OPERADORES_ORDEM[cond.operador](lo, alvo)
+        if cond.operador == "==":
+            alvo = _para_float(cond.valor)
+            return alvo is None or dentro(alvo)
+        if cond.operador == "!=":
+            alvo = _para_float(cond.valor)
+            return not (alvo is not None and lo == hi == alvo)
+        itens = cond.valor if isinstance(cond.valor, (list, tuple, set)) else str(cond.valor).split(",")
+        numeros = [_para_float(str(i).strip()) for i in itens]
+        return any(n is None or dentro(n) for n in numeros)
+
+
+def _sempre_falsa(cond):
+    if cond.operador not in _OPERADORES:
+        return f"operador desconhecido '{cond.operador}'"
+    if cond.operador in _OPERADORES_ORDEM and _para_float(cond.valor) is None:
+        return f"'{cond.operador}' com alvo não numérico {cond.valor!r}"
+    return None
+
+
+class AnaliseBase:
+    """Estrutura da base calculada uma vez por versão (ver obter_analise).
+
+    - componentes: variáveis agrupadas em componentes fortemente conexos do
+      grafo "conclusão depende de premissa", em ordem topológica (as
+      premissas antes de quem as conclui);
+    - ciclos: componentes com mais de uma variável ou com laço próprio;
+    - mortas: regras que nunca disparam, com o motivo. 'insatisfativel' se
+      uma premissa é falsa para todo valor do domínio da variável;
+      'inalcancavel' se o valor exigido só seria produzido por regras mortas;
+    - regras_vivas / vivas_por_conclusao: conjunto de trabalho dos motores;
+    - conflitantes: variáveis que regras vivas concluem com valores
+      diferentes (o resultado depende da ordem de disparo);
+    - ordem_regras: as regras vivas em ordem topológica das conclusões. É
+      só informativa (sai em /api/analise): os motores disparam na ordem do
+      arquivo, que é a que define o resultado das conflitantes.
+    """
+
+    def __init__(self, bc: BaseConhecimento):
+        self.versao = bc.versao
+        self.regras_total = len(bc.regras)
+        self.mortas = {}  # id(regra) -> (regra, tipo, variavel, motivo)
+        self.indefinidas = sorted({
+            cond.variavel
+            for regra in bc.regras
+            for cond in (*regra.condicoes_se, *regra.conclusoes_entao)
+            if cond.variavel not in bc.variaveis
+        })
+        self._podar(bc)
+        self.regras_vivas = [r for r in bc.regras if id(r) not in self.mortas]
+        self.vivas_por_conclusao = {}
+        for variavel, regras in bc.regras_por_conclusao.items():
+            vivas = [r for r in regras if id(r) not in self.mortas]
+            if vivas:
+                self.vivas_por_conclusao[variavel] = vivas
+        concluidos = {}
+        for regra in self.regras_vivas:
+            for conc in regra.conclusoes_entao:
+                concluidos.setdefault(conc.variavel, set()).add(repr(conc.valor))
+        self.conflitantes = {v for v, valores in concluidos.items() if len(valores) > 1}
+        self.componentes = self._componentes(bc)
+        posicao = {v: i for i, comp in enumerate(self.componentes) for v in comp}
+        self.ciclos = [
+            comp for comp in self.componentes
+            if len(comp) > 1 or any(
+                c.variavel == comp[0]
+                for r in self.vivas_por_conclusao.get(comp[0], ())
+                for c in r.condicoes_se
+            )
+        ]
+        # Ordem topológica (informativa): regras das conclusões mais "baixas"
+        # primeiro; dentro de um componente, a ordem do arquivo
+        self.ordem_regras = sorted(
+            self.regras_vivas,
+            key=lambda r: min((posicao[c.variavel] for c in r.conclusoes_entao), default=0),
+        )
+
+    # --- poda por domínio (ponto fixo) ---
+    def _podar(self, bc):
+        dominios = {}
+
+        def dominio(nome):
+            if nome not in dominios:
+                dominios[nome] = _Dominio(bc.variaveis.get(nome))
+            return dominios[nome]
+
+        for regra in bc.regras:
+            for conc in regra.conclusoes_entao:
+                dom = dominio(conc.variavel)
+                if not dom.aberto:
+                    dom.concluidos.setdefault(repr(conc.valor), conc.valor)
+
+        pendentes = list(bc.regras)
+        tipo = "insatisfativel"
+        while pendentes:
+            mudaram = set()
+            for regra in pendentes:
+                if id(regra) in self.mortas:
+                    continue
+                motivo = self._motivo(regra, dominio)
+                if motivo is None:
+                    continue
+                variavel, texto = motivo
+                self.mortas[id(regra)] = (regra, tipo, variavel, texto)
+                mudaram.update(c.variavel for c in regra.conclusoes_entao)
+            # Recalcula os valores concluídos das variáveis afetadas e reavalia
+            # só as regras que as usam como premissa
+            pendentes = []
+            for nome in mudaram:
+                dom = dominio(nome)
+                if dom.aberto:
+                    continue
+                antes = len(dom.concluidos)
+                dom.concluidos = {
+                    repr(c.valor): c.valor
+                    for r in bc.regras_por_conclusao.get(nome, ())
+                    if id(r) not in self.mortas
+                    for c in r.conclusoes_entao if c.variavel == nome
+                }
+                if len(dom.concluidos) != antes:
+                    pendentes.extend(bc.regras_por_premissa.get(nome, ()))
+            tipo = "inalcancavel"
+
+    @staticmethod
+    def _motivo(regra, dominio):
+        por_variavel = {}
+        for cond in regra.condicoes_se:
+            texto = _sempre_falsa(cond)
+            if texto:
+                return cond.variavel, texto
+            por_variavel.setdefault(cond.variavel, []).append(cond)
+        for variavel, condicoes in por_variavel.items():
+            if not dominio(variavel).admite(condicoes):
+                premissas = " E ".join(map(str, condicoes))
+                if len(condicoes) > 1:
+                    return variavel, f"premissas contraditórias: {premissas}"
+                return variavel, f"nenhum valor possível de '{variavel}' satisfaz {premissas}"
+        return None
+
+    # --- componentes fortemente conexos (Tarjan iterativo) ---
+    def _componentes(self, bc):
+        dependencias = {}
+        for nome in (*bc.variaveis, *bc.regras_por_conclusao, *bc.regras_por_premissa):
+            dependencias.setdefault(nome, [])
+        for regra in self.regras_vivas:
+            premissas = [c.variavel for c in regra.condicoes_se]
+            for conc in regra.conclusoes_entao:
+                dependencias[conc.variavel].extend(premissas)
+
+        indice, baixo, na_pilha = {}, {}, set()
+        pilha, componentes = [], []
+        for raiz in dependencias:
+            if raiz in indice:
+                continue
+            trabalho = [(raiz, iter(dependencias[raiz]))]
+            indice[raiz] = baixo[raiz] = len(indice)
+            pilha.append(raiz)
+            na_pilha.add(raiz)
+            while trabalho:
+                no, vizinhos = trabalho[-1]
+                for viz in vizinhos:
+                    if viz not in indice:
+                        indice[viz] = baixo[viz] = len(indice)
+                        pilha.append(viz)
+                        na_pilha.add(viz)
+                        trabalho.append((viz, iter(dependencias[viz])))
+                        break
+                    if viz in na_pilha:
+                        baixo[no] = min(baixo[no], indice[viz])
+                else:
+                    trabalho.pop()
+                    if trabalho:
+                        pai = trabalho[-1][0]
+                        baixo[pai] = min(baixo[pai], baixo[no])
+                    if baixo[no] == indice[no]:
+                        comp = []
+                        while True:
+                            v = pilha.pop()
+                            na_pilha.discard(v)
+                            comp.append(v)
+                            if v == no:
+                                break
+                        componentes.append(comp)
+        # Tarjan emite cada componente depois de tudo de que ele depende
+        return componentes
+
+    def to_dict(self):
+        return {
+            "regras": self.regras_total,
+            "regras_vivas": len(self.regras_vivas),
+            "componentes": len(self.componentes),
+            "ordem_variaveis": [v for comp in self.componentes for v in comp],
+            "ordem_regras": [r.nome for r in self.ordem_regras],
+            "ciclos": self.ciclos,
+            "variaveis_indefinidas": self.indefinidas,
+            "variaveis_conflitantes": sorted(self.conflitantes),
+            "diagnosticos": [
+                {"regra": regra.nome, "tipo": tipo, "variavel": variavel, "motivo": motivo}
+                for regra, tipo, variavel, motivo in self.mortas.values()
+            ],
+        }
+
+
+def obter_analise(bc: BaseConhecimento) -> AnaliseBase:
+    """Retorna a análise da base, refazendo-a se a base mudou."""
+    analise = getattr(bc, "_analise", None)
+    if analise is None or analise.versao != bc.versao:
+        analise = AnaliseBase(bc)
+        bc._analise = analise
+    return analise
+
+
+def fatia_para_objetivos(bc: BaseConhecimento, objetivos):
+    """(regras, regras_por_conclusao) restritas ao que pode influir nos
+    objetivos: as regras que os concluem e, recursivamente, as que concluem
+    suas premissas. A ordem do arquivo é preservada."""
+    regras, regras_por_conclusao = regras_de_trabalho(bc)
+    na_fatia, vistas = set(), set()
+    pendentes = list(objetivos)
+    while pendentes:
+        variavel = pendentes.pop()
+        if variavel in vistas:
+            continue
+        vistas.add(variavel)
+        for regra in regras_por_conclusao.get(variavel, ()):
+            if id(regra) not in na_fatia:
+                na_fatia.add(id(regra))
+                pendentes.extend(c.variavel for c in regra.condicoes_se)
+    fatia_por_conclusao = {}
+    for variavel, lista in regras_por_conclusao.items():
+        lista = [r for r in lista if id(r) in na_fatia]
+        if lista:
+            fatia_por_conclusao[variavel] = lista
+    return [r for r in regras if id(r) in na_fatia], fatia_por_conclusao
+
+
+def regras_de_trabalho(bc: BaseConhecimento):
+    """(regras, regras_por_conclusao) que os motores devem percorrer: sem as
+    regras mortas, a menos que a poda esteja desligada."""
+    if not PODAR_REGRAS:
+        return bc.regras, bc.regras_por_conclusao
+    analise = obter_analise(bc)
+    return analise.regras_vivas, analise.vivas_por_conclusao
@@ -1,19 +1,160 @@
-from flask import Flask, jsonify, request
+import base64
+import hashlib
+import io
+import json
+import os
+import queue
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from .utils import (
+    assinatura_kb,
+    cache_bases,
     carregar_base_conhecimento,
-    salvar_base_conhecimento,
+    registrar_edicoes,
     listar_kbs,
     criar_kb,
     deletar_kb,
 )
 from .models import Variavel, Regra, Condicao
-from .inference_engine import MotorBackwardChaining, MotorForwardChaining
+from .inference_engine import MotorBackwardChaining, MotorForwardChaining, SemPontoFixo
+from .lote import encadear_lote, ler_casos_csv, ler_casos_jsonl, resultados_ndjson
+from .analise import obter_analise
+from .hipoteses import SessaoHipoteses
+from .metricas import MetricasConsulta, RegistroMetricas
+from .sessoes import CanaisEventos, GerenciadorSessoes
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['ETag', 'X-Proximo-Cursor'])
+
+# Consultas backward em andamento, uma por usuário (ID devolvido em 'sessao').
+# Com SESSAO_PASTA, sessões ociosas há SESSAO_OCIOSO_DISCO segundos vão para
+# disco; com SESSAO_COMPARTILHADA=1 o disco é a fonte da verdade e qualquer
+# processo (worker) atende qualquer sessão.
+SESSAO_PASTA = os.environ.get('SESSAO_PASTA') or None
+SESSAO_COMPARTILHADA = SESSAO_PASTA is not None and os.environ.get('SESSAO_COMPARTILHADA') == '1'
+
+def _gerenciador_sessoes(subpasta, restaurar):
+    pasta = os.path.join(SESSAO_PASTA, *subpasta) if SESSAO_PASTA else None
+    return GerenciadorSessoes(
+        ttl=int(os.environ.get('SESSAO_TTL', '1800')),
+        max_sessoes=int(os.environ.get('SESSAO_MAX', '1000')),
+        pasta_disco=pasta,
+        ocioso_para_disco=int(os.environ.get('SESSAO_OCIOSO_DISCO', '300')) if pasta else None,
+        compartilhada=SESSAO_COMPARTILHADA,
+        restaurar=restaurar,
+    )
+
+sessoes = _gerenciador_sessoes((), MotorBackwardChaining.de_dict)
+# Casos "e se" do forward (/api/hipoteses)
+sessoes_hipoteses = _gerenciador_sessoes(('hipoteses',), SessaoHipoteses.de_dict)
+# Consultas acompanhadas por /api/consulta/eventos (Server-Sent Events); cada
+# canal prende uma thread do servidor, daí o limite (SSE_MAX_CANAIS=0 desliga)
+canais = CanaisEventos(max_canais=int(os.environ.get('SSE_MAX_CANAIS', '8')))
+INTERVALO_PING = 15  # segundos entre comentários de keep-alive no canal
+
+# Instrumentação dos motores: ligada por requisição (?metricas=1) ou para
+# todas com INFERENCIA_METRICAS=1; o agregado sai em /api/metrics, com
+# séries só para as METRICAS_REGRAS_TOP regras mais lentas de cada KB
+registro_metricas = RegistroMetricas(max_regras=int(os.environ.get('METRICAS_REGRAS_TOP', '20')))
+METRICAS_SEMPRE = os.environ.get('INFERENCIA_METRICAS') == '1'
+
+# Ordem das perguntas no backward ('ordem' ou 'ganho'; ver MotorBackwardChaining)
+ESTRATEGIA_PADRAO = os.environ.get('CONSULTA_ESTRATEGIA', 'ordem')
+
+def _metricas_pedidas():
+    if METRICAS_SEMPRE or request.args.get('metricas') in ('1', 'true'):
+        return MetricasConsulta()
+    return None
+
+def _com_metricas(resultado, kb_name, motor, metricas):
+    if metricas is None:
+        return resultado
+    registro_metricas.registrar(kb_name, motor, metricas)
+    return {**resultado, "metricas": metricas.to_dict()}
 
-sessao_ativa = {}
+# ------------------ LISTAGENS (variáveis e regras) ------------------
+CAMPOS_LISTAGEM = {'variaveis': Variavel.__slots__, 'regras': Regra.__slots__}
+
+def _campo(obj, campo):
+    valor = getattr(obj, campo)
+    if isinstance(valor, tuple):  # condicoes_se / conclusoes_entao
+        return [c.to_dict() for c in valor]
+    return valor
+
+def _cursor(pos, nome):
+    return base64.urlsafe_b64encode(json.dumps([pos, nome]).encode()).decode()
+
+def _posicao_do_cursor(cursor, itens):
+    """Posição do último item já entregue. O nome confere a posição; se a
+    base mudou desde então, o item é procurado pelo nome."""
+    try:
+        pos, nome = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if isinstance(pos, int) and 0 <= pos < len(itens) and itens[pos].nome == nome:
+        return pos
+    return next((i for i, obj in enumerate(itens) if obj.nome == nome), None)
+
+def _listar(kb_name, tipo):
+    """GET de variáveis/regras com ?campos=nome,tipo (projeção), ?prefixo=
+    (busca pelo início do nome), ?limite= e ?cursor= (paginação; o cursor da
+    próxima página vem em X-Proximo-Cursor). Sem parâmetros devolve a lista
+    inteira, como antes. O ETag deriva da assinatura da KB: If-None-Match
+    com o mesmo conteúdo responde 304 sem carregar nem serializar a base."""
+    campos = [c.strip() for c in request.args.get('campos', '').split(',') if c.strip()]
+    validos = CAMPOS_LISTAGEM[tipo]
+    if any(c not in validos for c in campos):
+        return jsonify({"erro": f"Campos válidos: {', '.join(validos)}."}), 400
+    prefixo = request.args.get('prefixo', '')
+    cursor = request.args.get('cursor')
+    limite = request.args.get('limite')
+    if limite is not None:
+        if not limite.isdigit() or int(limite) < 1:
+            return jsonify({"erro": "'limite' deve ser um inteiro positivo."}), 400
+        limite = int(limite)
+
+    assinatura = assinatura_kb(kb_name)
+    etag = None
+    if assinatura is not None:
+        chave = (kb_name, assinatura, tipo, campos, prefixo, cursor, limite)
+        etag = hashlib.sha1(repr(chave).encode()).hexdigest()
+        if etag in request.if_none_match:
+            resposta = Response(status=304)
+            resposta.set_etag(etag)
+            return resposta
+
+    bc = carregar_base_conhecimento(kb_name)
+    itens = list(bc.variaveis.values()) if tipo == 'variaveis' else bc.regras
+    inicio = 0
+    if cursor:
+        pos = _posicao_do_cursor(cursor, itens)
+        if pos is None:
+            return jsonify({"erro": "Cursor inválido."}), 400
+        inicio = pos + 1
+    pagina, proximo = [], None
+    for pos in range(inicio, len(itens)):
+        obj = itens[pos]
+        if prefixo and not obj.nome.startswith(prefixo):
+            continue
+        if limite is not None and len(pagina) == limite:
+            proximo = _cursor(pos_ultimo, pagina[-1].nome)
+            break
+        pagina.append(obj)
+        pos_ultimo = pos
+    if campos:
+        corpo = [{c: _campo(obj, c) for c in campos} for obj in pagina]
+    else:
+        corpo = [obj.to_dict() for obj in pagina]
+    resposta = jsonify(corpo)
+    if etag is not None:
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'no-cache'  # Sempre revalida, mas pode reusar
+    if proximo:
+        resposta.headers['X-Proximo-Cursor'] = proximo
+    return resposta
 
 # ------------------ GERENCIAMENTO DE KBs ------------------
 @app.route("/api/kbs", methods=["GET"])
@@ -42,9 +183,8 @@ def variaveis_endpoint():
     kb_name = request.args.get('kb')
     if not kb_name:
         return jsonify({"erro": "Nome da KB é obrigatório"}), 400
-    bc = carregar_base_conhecimento(kb_name)
     if request.method == 'GET':
-        return jsonify([v.to_dict() for v in bc.variaveis.values()])
+        return _listar(kb_name, 'variaveis')
     # POST
     dados = request.get_json() or {}
     try:
@@ -59,8 +199,7 @@ def variaveis_endpoint():
         )
     except KeyError:
         return jsonify({"erro": "Estrutura do JSON inválida"}), 400
-    bc.adicionar_variavel(nova)
-    salvar_base_conhecimento(kb_name, bc)
+    registrar_edicoes(kb_name, {"op": "adicionar_variavel", "dados": nova.to_dict()})
     return jsonify(nova.to_dict()), 201
 
 @app.route("/api/variaveis/<string:nome_var>", methods=["PUT", "DELETE"])
@@ -68,17 +207,17 @@ def variavel_detalhe_endpoint(nome_var):
     kb_name = request.args.get('kb')
     if not kb_name:
         return jsonify({"erro": "Nome da KB é obrigatório"}), 400
+    # Edições vão para o diário da KB; a instância em cache serve só para validar
     bc = carregar_base_conhecimento(kb_name)
     if request.method == 'DELETE':
         if nome_var not in bc.variaveis:
             return jsonify({"erro": "Variável não encontrada."}), 404
         # impedir deleção se usada em regra
-        for regra in bc.regras:
-            for cond in regra.condicoes_se + regra.conclusoes_entao:
-                if cond.variavel == nome_var:
-                    return jsonify({"erro": f"Variável '{nome_var}' em uso pela regra '{regra.nome}'."}), 409
-        del bc.variaveis[nome_var]
-        salvar_base_conhecimento(kb_name, bc)
+        em_uso = bc.regras_por_premissa.get(nome_var, [])[:1] + bc.regras_por_conclusao.get(nome_var, [])[:1]
+        if em_uso:
+            regra = min(em_uso, key=bc.regras.index)
+            return jsonify({"erro": f"Variável '{nome_var}' em uso pela regra '{regra.nome}'."}), 409
+        registrar_edicoes(kb_name, {"op": "remover_variavel", "nome": nome_var})
         return jsonify({"mensagem": f"Variável '{nome_var}' apagada."}), 200
     # PUT
     if nome_var not in bc.variaveis:
@@ -98,8 +237,7 @@ def variavel_detalhe_endpoint(nome_var):
         )
     except KeyError:
         return jsonify({"erro": "Estrutura do JSON inválida."}), 400
-    bc.variaveis[nome_var] = atualizada
-    salvar_base_conhecimento(kb_name, bc)
+    registrar_edicoes(kb_name, {"op": "adicionar_variavel", "dados": atualizada.to_dict()})
     return jsonify(atualizada.to_dict()), 200
 
 # ------------------ REGRAS ------------------
@@ -108,9 +246,8 @@ def regras_endpoint():
     kb_name = request.args.get('kb')
     if not kb_name:
         return jsonify({"erro": "Nome da KB é obrigatório"}), 400
-    bc = carregar_base_conhecimento(kb_name)
     if request.method == 'GET':
-        return jsonify([r.to_dict() for r in bc.regras])
+        return _listar(kb_name, 'regras')
     dados = request.get_json() or {}
     try:
         se = [Condicao(**c) for c in dados['condicoes_se']]
@@ -118,8 +255,7 @@ def regras_endpoint():
         nova = Regra(dados['nome'], se, entao)
     except KeyError:
         return jsonify({"erro": "Estrutura do JSON inválida"}), 400
-    bc.adicionar_regra(nova)
-    salvar_base_conhecimento(kb_name, bc)
+    registrar_edicoes(kb_name, {"op": "adicionar_regra", "dados": nova.to_dict()})
     return jsonify(nova.to_dict()), 201
 
 @app.route("/api/regras/<string:nome_regra>", methods=["PUT", "DELETE"])
@@ -127,28 +263,29 @@ def regra_detalhe_endpoint(nome_regra):
     kb_name = request.args.get('kb')
     if not kb_name:
         return jsonify({"erro": "Nome da KB é obrigatório"}), 400
+    # Edições vão para o diário da KB; a instância em cache serve só para validar
     bc = carregar_base_conhecimento(kb_name)
     regra_existente = next((r for r in bc.regras if r.nome == nome_regra), None)
     if request.method == 'DELETE':
         if not regra_existente:
             return jsonify({"erro": "Regra não encontrada."}), 404
-        bc.regras.remove(regra_existente)
-        salvar_base_conhecimento(kb_name, bc)
+        registrar_edicoes(kb_name, {"op": "remover_regra", "nome": nome_regra})
         return jsonify({"mensagem": f"Regra '{nome_regra}' apagada."}), 200
     # PUT
     if not regra_existente:
         return jsonify({"erro": "Regra para atualizar não encontrada."}), 404
     dados = request.get_json() or {}
     try:
-        bc.regras.remove(regra_existente)
         se = [Condicao(**c) for c in dados['condicoes_se']]
         entao = [Condicao(**c) for c in dados['conclusoes_entao']]
         atualizada = Regra(dados['nome'], se, entao)
     except KeyError:
-        bc.adicionar_regra(regra_existente)
         return jsonify({"erro": "Estrutura do JSON inválida"}), 400
-    bc.adicionar_regra(atualizada)
-    salvar_base_conhecimento(kb_name, bc)
+    registrar_edicoes(
+        kb_name,
+        {"op": "remover_regra", "nome": nome_regra},
+        {"op": "adicionar_regra", "dados": atualizada.to_dict()},
+    )
     return jsonify(atualizada.to_dict()), 200
 
 # ------------------ CONSULTA BACKWARD ------------------
@@ -162,24 +299,124 @@ def iniciar_consulta():
     if not objetivo:
         return jsonify({"erro": "Um 'objetivo' deve ser fornecido."}), 400
     bc = carregar_base_conhecimento(kb_name)
-    motor = MotorBackwardChaining(bc)
-    sessao_ativa[kb_name] = motor
-    resultado = motor.provar_objetivo(objetivo)
-    return jsonify(resultado)
+    try:
+        # top_k/cf_minimo (opcionais) pedem a lista ranqueada de candidatos
+        motor = MotorBackwardChaining(
+            bc, estrategia=dados.get('estrategia', ESTRATEGIA_PADRAO),
+            top_k=dados.get('top_k'), cf_minimo=dados.get('cf_minimo'),
+        )
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    sessao_id = sessoes.criar(kb_name, motor)
+    metricas = _metricas_pedidas()
+    with sessoes.usar(sessao_id) as sessao:
+        sessao.motor.metricas = metricas
+        resultado = sessao.motor.provar_objetivo(objetivo)
+        sessao.motor.metricas = None
+    if resultado.get('tipo') == 'resultado':
+        sessoes.remover(sessao_id)
+    resultado = _com_metricas(resultado, kb_name, 'backward', metricas)
+    return jsonify({"sessao": sessao_id, **resultado})
 
 @app.route('/api/consulta/responder', methods=['POST'])
 def responder_pergunta():
-    kb_name = request.args.get('kb')
-    if not kb_name:
-        return jsonify({"erro": "Nome da KB é obrigatório"}), 400
-    motor = sessao_ativa.get(kb_name)
-    if not motor:
-        return jsonify({"erro": "Nenhuma consulta ativa."}), 400
     dados = request.get_json() or {}
+    sessao_id = dados.get('sessao') or request.args.get('sessao')
     if not all(k in dados for k in ['variavel', 'valor']):
         return jsonify({"erro": "A resposta deve conter 'variavel' e 'valor'."}), 400
-    resultado = motor.adicionar_resposta(dados['variavel'], dados['valor'])
-    return jsonify(resultado)
+    metricas = _metricas_pedidas()
+    with sessoes.usar(sessao_id) as sessao:
+        if sessao is None:
+            return jsonify({"erro": "Nenhuma consulta ativa."}), 400
+        sessao.motor.metricas = metricas
+        resultado = sessao.motor.adicionar_resposta(dados['variavel'], dados['valor'])
+        sessao.motor.metricas = None
+        resultado = _com_metricas(resultado, sessao.kb_name, 'backward', metricas)
+        # Publicado ainda com o lock da sessão, para o canal manter a ordem
+        transmitido = canais.publicar(sessao_id, resultado)
+    if resultado.get('tipo') == 'resultado':
+        sessoes.remover(sessao_id)
+    if transmitido:
+        # Com um canal de eventos aberto, a pergunta/resultado segue por ele
+        return jsonify({"sessao": sessao_id, "tipo": "aceita"}), 202
+    return jsonify({"sessao": sessao_id, **resultado})
+
+def _evento_sse(tipo, dados):
+    return f"event: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+@app.route('/api/consulta/eventos', methods=['GET'])
+def eventos_consulta():
+    """Consulta backward por Server-Sent Events: abre a sessão (kb, objetivo,
+    estrategia e, opcionais, top_k e cf_minimo na query) e transmite cada
+    pergunta e o resultado final. As respostas seguem por
+    /api/consulta/responder, que então só confirma (202)."""
+    kb_name = request.args.get('kb')
+    objetivo = request.args.get('objetivo')
+    if not kb_name or not objetivo:
+        return jsonify({"erro": "Informe 'kb' e 'objetivo'."}), 400
+    bc = carregar_base_conhecimento(kb_name)
+    try:
+        top_k = request.args.get('top_k', type=int)
+        cf_minimo = request.args.get('cf_minimo', type=float)
+        if ('top_k' in request.args and top_k is None) or ('cf_minimo' in request.args and cf_minimo is None):
+            raise ValueError("'top_k' e 'cf_minimo' devem ser numéricos.")
+        motor = MotorBackwardChaining(
+            bc, estrategia=request.args.get('estrategia', ESTRATEGIA_PADRAO),
+            top_k=top_k, cf_minimo=cf_minimo,
+        )
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    # Com sessões compartilhadas a resposta pode cair em outro worker, longe
+    # da fila deste processo; sem canal livre, idem: o cliente volta ao
+    # modo de requisições (POST)
+    sessao_id = uuid.uuid4().hex
+    fila = None if sessoes.compartilhada else canais.abrir(sessao_id)
+    if fila is None:
+        return jsonify({"erro": "Canal de eventos indisponível no momento."}), 503
+    try:
+        sessoes.criar(kb_name, motor, sessao_id)
+        metricas = _metricas_pedidas()
+        with sessoes.usar(sessao_id) as sessao:
+            sessao.motor.metricas = metricas
+            resultado = sessao.motor.provar_objetivo(objetivo)
+            sessao.motor.metricas = None
+    except Exception:
+        canais.fechar(sessao_id, fila)
+        raise
+    resultado = _com_metricas(resultado, kb_name, 'backward', metricas)
+    if resultado.get('tipo') == 'resultado':
+        sessoes.remover(sessao_id)
+
+    def gerar():
+        evento, ultimo_evento = resultado, time.monotonic()
+        try:
+            yield _evento_sse('sessao', {"sessao": sessao_id})
+            while True:
+                if evento is not None:
+                    yield _evento_sse(evento.get('tipo', 'erro'), {"sessao": sessao_id, **evento})
+                    if evento.get('tipo') != 'pergunta':
+                        return
+                    ultimo_evento = time.monotonic()
+                elif time.monotonic() - ultimo_evento > sessoes.ttl:
+                    yield _evento_sse('erro', {"sessao": sessao_id, "erro": "Consulta expirada."})
+                    return
+                else:
+                    yield ": ping\n\n"
+                try:
+                    evento = fila.get(timeout=INTERVALO_PING)
+                except queue.Empty:
+                    evento = None
+        finally:
+            canais.fechar(sessao_id, fila)
+
+    resposta = Response(
+        stream_with_context(gerar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # Libera a vaga mesmo se o cliente cair antes de o gerador começar
+    resposta.call_on_close(lambda: canais.fechar(sessao_id, fila))
+    return resposta
 
 # ------------------ CONSULTA FORWARD ------------------
 @app.route('/api/consulta/forward', methods=['POST'])
@@ -189,12 +426,140 @@ def consulta_forward():
         return jsonify({"erro": "Nome da KB é obrigatório"}), 400
     dados = request.get_json() or {}
     fatos = dados.get('fatos', {})
+    # Opcional: encadeia só as regras relevantes para estas variáveis
+    objetivos = dados.get('objetivos')
+    if isinstance(objetivos, str):
+        objetivos = [objetivos]
+    if objetivos is not None and not (
+        isinstance(objetivos, list) and all(isinstance(o, str) for o in objetivos)
+    ):
+        return jsonify({"erro": "'objetivos' deve ser uma lista de nomes de variáveis."}), 400
     bc = carregar_base_conhecimento(kb_name)
-    motor = MotorForwardChaining(bc)
+    metricas = _metricas_pedidas()
+    motor = MotorForwardChaining(bc, metricas, objetivos)
     for var, val in fatos.items():
         motor.adicionar_fato(var, val)
-    resultado = motor.encadear()
-    return jsonify(resultado)
+    try:
+        resultado = motor.encadear(motor.limite_passos())
+    except SemPontoFixo as e:
+        return jsonify({"erro": str(e)}), 409
+    return jsonify(_com_metricas(resultado, kb_name, 'forward', metricas))
+
+@app.route('/api/consulta/forward/lote', methods=['POST'])
+def consulta_forward_lote():
+    """Aceita {"casos": [...]} em JSON, um corpo CSV/JSONL ou um arquivo
+    enviado no campo 'arquivo'; responde um resultado por linha (NDJSON)."""
+    kb_name = request.args.get('kb')
+    if not kb_name:
+        return jsonify({"erro": "Nome da KB é obrigatório"}), 400
+    formato = request.args.get('formato')
+    arquivo_aberto = None
+    if 'arquivo' in request.files:
+        arquivo = request.files['arquivo']
+        # O Flask fecha os uploads ao encerrar a view, antes de a resposta
+        # ser transmitida; assumimos o arquivo e o fechamos ao final do lote.
+        fluxo = arquivo_aberto = arquivo.stream
+        arquivo.stream = io.BytesIO()
+        formato = formato or ('csv' if (arquivo.filename or '').lower().endswith('.csv') else 'jsonl')
+    else:
+        fluxo = request.stream
+        if not formato:
+            if request.mimetype == 'text/csv':
+                formato = 'csv'
+            elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+                formato = 'jsonl'
+            else:
+                formato = 'json'
+    if formato == 'json':
+        dados = request.get_json(silent=True) or {}
+        casos = dados.get('casos')
+        if not isinstance(casos, list):
+            return jsonify({"erro": "Envie uma lista em 'casos'."}), 400
+    elif formato in ('csv', 'jsonl'):
+        texto = io.TextIOWrapper(fluxo, encoding='utf-8', newline='')
+        casos = ler_casos_csv(texto) if formato == 'csv' else ler_casos_jsonl(texto)
+    else:
+        return jsonify({"erro": "Formato deve ser 'json', 'csv' ou 'jsonl'."}), 400
+    bc = carregar_base_conhecimento(kb_name)
+
+    def gerar():
+        try:
+            yield from resultados_ndjson(encadear_lote(bc, casos))
+        except (ValueError, UnicodeDecodeError) as e:
+            yield from resultados_ndjson([{"erro": f"Entrada inválida: {e}"}])
+        finally:
+            if arquivo_aberto is not None:
+                arquivo_aberto.close()
+
+    return Response(stream_with_context(gerar()), mimetype='application/x-ndjson')
+
+# ------------------ ANÁLISE ESTÁTICA ------------------
+@app.route('/api/analise', methods=['GET'])
+def analise_kb():
+    """Ciclos, ordem topológica e regras mortas (que os motores ignoram)."""
+    kb_name = request.args.get('kb')
+    if not kb_name:
+        return jsonify({"erro": "Nome da KB é obrigatório"}), 400
+    bc = carregar_base_conhecimento(kb_name)
+    return jsonify(obter_analise(bc).to_dict())
+
+# ------------------ HIPÓTESES ("E SE") ------------------
+@app.route('/api/hipoteses', methods=['POST'])
+def criar_hipoteses():
+    """Encadeia o caso {"fatos": {...}, "objetivos": [...]} e o mantém numa
+    sessão para alterações posteriores."""
+    kb_name = request.args.get('kb')
+    if not kb_name:
+        return jsonify({"erro": "Nome da KB é obrigatório"}), 400
+    dados = request.get_json() or {}
+    fatos = dados.get('fatos', {})
+    objetivos = dados.get('objetivos')
+    if not isinstance(fatos, dict) or (objetivos is not None and not isinstance(objetivos, list)):
+        return jsonify({"erro": "Envie 'fatos' como objeto e 'objetivos' como lista."}), 400
+    bc = carregar_base_conhecimento(kb_name)
+    try:
+        caso = SessaoHipoteses(bc, fatos, objetivos)
+    except SemPontoFixo as e:
+        return jsonify({"erro": str(e)}), 409
+    sessao_id = sessoes_hipoteses.criar(kb_name, caso)
+    return jsonify({"sessao": sessao_id, **caso.resultado()}), 201
+
+@app.route('/api/hipoteses/<string:sessao_id>', methods=['GET', 'PATCH', 'DELETE'])
+def hipoteses_detalhe(sessao_id):
+    """PATCH {"alterar": {var: valor}, "retirar": [var]} re-deriva só o que
+    depende das entradas mudadas e devolve a diferença de fatos (409, sem
+    mudar a sessão, se as novas entradas não têm ponto fixo)."""
+    if request.method == 'DELETE':
+        sessoes_hipoteses.remover(sessao_id)
+        return jsonify({"mensagem": "Sessão encerrada."}), 200
+    dados = request.get_json(silent=True) or {}
+    alterar = dados.get('alterar', {})
+    retirar = dados.get('retirar', [])
+    if not isinstance(alterar, dict) or not isinstance(retirar, list):
+        return jsonify({"erro": "Envie 'alterar' como objeto e 'retirar' como lista."}), 400
+    with sessoes_hipoteses.usar(sessao_id) as sessao:
+        if sessao is None:
+            return jsonify({"erro": "Sessão não encontrada ou expirada."}), 404
+        if request.method == 'GET':
+            return jsonify({"sessao": sessao_id, **sessao.motor.resultado()})
+        try:
+            resultado = sessao.motor.alterar(alterar, retirar)
+        except SemPontoFixo as e:
+            return jsonify({"erro": str(e)}), 409
+    return jsonify({"sessao": sessao_id, **resultado})
+
+# ------------------ MÉTRICAS ------------------
+@app.route('/api/metrics', methods=['GET'])
+def metricas_endpoint():
+    return Response(registro_metricas.prometheus(), mimetype='text/plain; version=0.0.4')
+
+# ------------------ SAÚDE ------------------
+@app.route('/api/saude', methods=['GET'])
+def saude():
+    # Resposta barata, sem tocar em KBs: o lançador (main.py) a consulta
+    # até o servidor aceitar conexões. Com vários workers, 'pid' e 'cache'
+    # mostram qual versão publicada de cada KB o processo que respondeu usa.
+    return jsonify({"status": "ok", "pid": os.getpid(), "cache": cache_bases.estatisticas()})
 
 @app.route('/')
 def index():
@@ -0,0 +1,271 @@
+# backend/app/compilado.py
+# Formato binário compilado da KB (base.kbc), lido por mmap.
+#
+# É o formato de publicação da base (ver utils._publicar): snapshot + diário
+# já aplicados, com um número de versão no cabeçalho que todos os processos
+# leem. Não é uma representação de trabalho: os motores usam a
+# BaseConhecimento montada por BaseCompilada.para_base, e carregá-la custa
+# quase o mesmo que ler os JSON (o que se poupa é o parse e o diário).
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+from .models import BaseConhecimento, Condicao, Regra, Variavel
+
+MAGICO = b"KBC\x02"
+# magico, ordem de bytes, versão publicada, assinatura das fontes (6 x int64)
+# e contagens: strings, bytes do blob, variáveis, condições, regras,
+# chaves/itens dos índices por conclusão e por premissa
+_CABECALHO = struct.Struct("<4sIQ6q9I")
+_ORDEM = 1 if sys.byteorder == "little" else 2
+
+
+def _alinhar(n):
+    return (n + 7) & ~7
+
+
+class _Escritor:
+    def __init__(self):
+        self.partes = []
+        self.tamanho = 0
+
+    def bytes(self, dados):
+        self.partes.append(dados)
+        self.tamanho += len(dados)
+        preenchimento = _alinhar(self.tamanho) - self.tamanho
+        if preenchimento:
+            self.partes.append(b"\0" * preenchimento)
+            self.tamanho += preenchimento
+
+    def inteiros(self, valores):
+        self.bytes(struct.pack(f"={len(valores)}I", *valores))
+
+    def reais(self, valores):
+        self.bytes(struct.pack(f"={len(valores)}d", *valores))
+
+
+def _indice_csr(indice, posicao, texto):
+    """variavel -> [regras] vira (chaves, deslocamentos, índices de regra)."""
+    chaves, deslocamentos, itens = [], [0], []
+    for variavel, regras in indice.items():
+        chaves.append(texto(variavel))
+        itens.extend(posicao[id(regra)] for regra in regras)
+        deslocamentos.append(len(itens))
+    return chaves, deslocamentos, itens
+
+
+def compilar_base(bc: BaseConhecimento, caminho: str, assinatura, versao=0):
+    """Grava a base em `caminho` (atomicamente); `assinatura` identifica as
+    fontes JSON das quais ela veio (ver carregar_compilado) e `versao` é o
+    número de publicação gravado no cabeçalho."""
+    strings = {}
+
+    def texto(s):
+        if s not in strings:
+            strings[s] = len(strings)
+        return strings[s]
+
+    def valor(v):
+        return texto(json.dumps(v, ensure_ascii=False))
+
+    variaveis = list(bc.variaveis.values())
+    var_nome = [texto(v.nome) for v in variaveis]
+    var_dados = [valor(v.to_dict()) for v in variaveis]
+
+    cond_var, cond_op, cond_valor, cond_fc = [], [], [], []
+    regra_nome, regra_cond, regra_n_se = [], [0], []
+    for regra in bc.regras:
+        regra_nome.append(texto(regra.nome))
+        regra_n_se.append(len(regra.condicoes_se))
+        for cond in regra.condicoes_se:
+            cond_var.append(texto(cond.variavel))
+            cond_op.append(texto(cond.operador))
+            cond_valor.append(valor(cond.valor))
+            cond_fc.append(cond.fc)
+        for conc in regra.conclusoes_entao:
+            cond_var.append(texto(conc.variavel))
+            cond_op.append(texto(conc.operador))
+            cond_valor.append(valor(conc.valor))
+            cond_fc.append(conc.fc)
+        regra_cond.append(len(cond_var))
+
+    posicao = {id(regra): i for i, regra in enumerate(bc.regras)}
+    conclusao = _indice_csr(bc.regras_por_conclusao, posicao, texto)
+    premissa = _indice_csr(bc.regras_por_premissa, posicao, texto)
+
+    codificadas = [s.encode("utf-8") for s in strings]
+    str_off = [0]
+    for s in codificadas:
+        str_off.append(str_off[-1] + len(s))
+
+    esc = _Escritor()
+    esc.bytes(_CABECALHO.pack(
+        MAGICO, _ORDEM, versao, *assinatura,
+        len(codificadas), str_off[-1], len(variaveis), len(cond_var), len(bc.regras),
+        len(conclusao[0]), len(conclusao[2]), len(premissa[0]), len(premissa[2]),
+    ))
+    esc.inteiros(str_off)
+    esc.bytes(b"".join(codificadas))
+    for tabela in (var_nome, var_dados, cond_var, cond_op, cond_valor):
+        esc.inteiros(tabela)
+    esc.reais(cond_fc)
+    for tabela in (regra_nome, regra_cond, regra_n_se, *conclusao, *premissa):
+        esc.inteiros(tabela)
+
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as f:
+        f.writelines(esc.partes)
+    os.replace(temporario, caminho)
+
+
+class BaseCompilada:
+    """Visão somente leitura de um base.kbc mapeado em memória.
+
+    As tabelas são memoryviews sobre o mmap (sem cópia): condições em
+    colunas (variavel, operador, valor, fc; strings por índice), regras em
+    CSR (as condições da regra i são regra_cond[i]:regra_cond[i+1]; as
+    primeiras regra_n_se[i] são as premissas, as demais as conclusões) e os
+    índices por conclusão/premissa já calculados.
+
+    O mapeamento só vive durante a carga (carregar_compilado o fecha depois
+    de para_base); nenhum motor lê as tabelas diretamente.
+    """
+
+    def __init__(self, caminho):
+        with open(caminho, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._mapear()
+        except (struct.error, ValueError, TypeError):
+            self.fechar()
+            raise ValueError(f"Arquivo compilado inválido: {caminho}")
+
+    def _mapear(self):
+        cab = _CABECALHO.unpack_from(self._mm, 0)
+        if cab[0] != MAGICO or cab[1] != _ORDEM:
+            raise ValueError("versão ou ordem de bytes diferente")
+        self.versao = cab[2]
+        self.assinatura = cab[3:9]
+        (n_str, n_blob, n_var, n_cond, n_regras,
+         n_ch_conc, n_it_conc, n_ch_prem, n_it_prem) = cab[9:]
+        visao = memoryview(self._mm)
+        self._visoes = [visao]
+        pos = _alinhar(_CABECALHO.size)
+
+        def tabela(n, formato="I"):
+            nonlocal pos
+            tamanho = n * struct.calcsize(formato)
+            if pos + tamanho > len(self._mm):
+                raise ValueError("arquivo truncado")
+            t = visao[pos:pos + tamanho]
+            if formato != "B":
+                t = t.cast(formato)
+            self._visoes.append(t)
+            pos = _alinhar(pos + tamanho)
+            return t
+
+        self.str_off = tabela(n_str + 1)
+        self._blob = tabela(n_blob, "B")
+        self.var_nome = tabela(n_var)
+        self.var_dados = tabela(n_var)
+        self.cond_var = tabela(n_cond)
+        self.cond_op = tabela(n_cond)
+        self.cond_valor = tabela(n_cond)
+        self.cond_fc = tabela(n_cond, "d")
+        self.regra_nome = tabela(n_regras)
+        self.regra_cond = tabela(n_regras + 1)
+        self.regra_n_se = tabela(n_regras)
+        self.conclusao = (tabela(n_ch_conc), tabela(n_ch_conc + 1), tabela(n_it_conc))
+        self.premissa = (tabela(n_ch_prem), tabela(n_ch_prem + 1), tabela(n_it_prem))
+        self._strings = [None] * n_str
+
+    def string(self, i):
+        s = self._strings[i]
+        if s is None:
+            s = self._strings[i] = str(self._blob[self.str_off[i]:self.str_off[i + 1]], "utf-8")
+        return s
+
+    def valor(self, i):
+        return json.loads(self.string(i))
+
+    def para_base(self) -> BaseConhecimento:
+        """Monta a BaseConhecimento usada pelos motores a partir das tabelas.
+
+        Todas as Variavel, Condicao e Regra são recriadas (com os predicados
+        compilados) e os índices viram listas de novo; só o parse dos JSON e
+        a reaplicação do diário ficam de fora."""
+        bc = BaseConhecimento()
+        for i in range(len(self.var_nome)):
+            bc.adicionar_variavel(Variavel(**self.valor(self.var_dados[i])))
+        valores = {}
+
+        def condicao(j):
+            v = self.cond_valor[j]
+            if v not in valores:
+                valores[v] = self.valor(v)
+            return Condicao(self.string(self.cond_var[j]), self.string(self.cond_op[j]),
+                            valores[v], self.cond_fc[j])
+
+        for i in range(len(self.regra_nome)):
+            inicio, fim = self.regra_cond[i], self.regra_cond[i + 1]
+            meio = inicio + self.regra_n_se[i]
+            se = [condicao(j) for j in range(inicio, meio)]
+            entao = [condicao(j) for j in range(meio, fim)]
+            for cond in se:
+                cond.compilar(bc._tipo_de(cond.variavel))
+                bc.id_variavel(cond.variavel)
+            for cond in entao:
+                bc.id_variavel(cond.variavel)
+            bc.regras.append(Regra(self.string(self.regra_nome[i]), se, entao))
+        for destino, (chaves, deslocamentos, itens) in (
+            (bc.regras_por_conclusao, self.conclusao),
+            (bc.regras_por_premissa, self.premissa),
+        ):
+            for k in range(len(chaves)):
+                destino[self.string(chaves[k])] = [
+                    bc.regras[j] for j in itens[deslocamentos[k]:deslocamentos[k + 1]]
+                ]
+        # Mesma contagem de base_de_dicts: uma alteração por variável (já
+        # feitas por adicionar_variavel) e uma por regra (adicionar_regra)
+        bc.versao += len(bc.regras)
+        bc.publicacao = self.versao
+        return bc
+
+    def fechar(self):
+        for visao in reversed(getattr(self, "_visoes", [])):
+            visao.release()
+        self._visoes = []
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def carregar_compilado(caminho: str, assinatura):
+    """BaseConhecimento do arquivo compilado, ou None se ele não existe, é de
+    outra versão ou foi gerado a partir de fontes diferentes de `assinatura`."""
+    try:
+        compilada = BaseCompilada(caminho)
+    except (OSError, ValueError):
+        return None
+    with compilada:
+        if tuple(compilada.assinatura) != tuple(assinatura):
+            return None
+        return compilada.para_base()
+
+
+def versao_publicada(caminho: str) -> int:
+    """Número de publicação do arquivo compilado (0 se ele não existe ou é de
+    outro formato), lendo só o cabeçalho."""
+    try:
+        with open(caminho, "rb") as f:
+            magico, ordem, versao = _CABECALHO.unpack(f.read(_CABECALHO.size))[:3]
+    except (OSError, struct.error):
+        return 0
+    return versao if magico == MAGICO and ordem == _ORDEM else 0
@@ -0,0 +1,171 @@
+# backend/app/hipoteses.py
+# Sessões "e se": um caso de encadeamento para frente mantido entre
+# requisições, com manutenção da verdade para re-derivar só o que mudou.
+
+from .inference_engine import MotorForwardChaining
+from .models import BaseConhecimento
+
+
+class SessaoHipoteses:
+    """Caso de forward chaining que aceita mudanças nas entradas.
+
+    Cada fato derivado guarda todas as regras que o sustentam: as satisfeitas
+    que concluem exatamente o valor atual. Ao mudar ou retirar uma entrada,
+    sai o cone de fatos com algum suporte que dependa dela (direta ou
+    transitivamente) e o motor, com a rede de casamento já montada,
+    re-encadeia a partir daí; os suportes são revistos só nas regras que
+    tocam as variáveis mudadas. A explicação ("como") lista as regras de
+    suporte na ordem da base, então é a mesma de uma sessão nova com as
+    mesmas entradas.
+
+    Variáveis conflitantes (regras que concluem valores diferentes) não
+    exigem recálculo: se duas dessas regras ficam satisfeitas juntas o
+    encadeamento não tem ponto fixo (SemPontoFixo, numa sessão nova também);
+    se não, um valor derivado nunca é sobrescrito e o resultado não depende
+    da ordem de disparo. A exceção são entradas que alguma regra também
+    conclui: a regra pode sobrescrever a entrada e o que já foi derivado
+    dela, e aí o resultado depende da ordem. Enquanto houver uma entrada
+    assim, o caso é recalculado do zero.
+    """
+
+    def __init__(self, bc: BaseConhecimento, fatos, objetivos=None):
+        self.bc = bc
+        self.objetivos = objetivos
+        self.entradas = dict(fatos)
+        self._recalcular()
+
+    def para_dict(self):
+        """Estado mínimo da sessão: as entradas e os objetivos (o resto se re-deriva)."""
+        return {"entradas": self.entradas, "objetivos": self.objetivos}
+
+    @classmethod
+    def de_dict(cls, bc: BaseConhecimento, dados):
+        return cls(bc, dados["entradas"], dados.get("objetivos"))
+
+    def resultado(self):
+        return {
+            "fatos": dict(self.motor.fatos_sessao),
+            "explicacao_como": self._explicacao(),
+        }
+
+    def alterar(self, mudancas=None, retirar=()):
+        """Aplica mudanças ({var: valor}) e retiradas de entradas; devolve a
+        diferença entre os fatos antes e depois. Se as novas entradas não
+        têm ponto fixo, levanta SemPontoFixo e a sessão fica como estava."""
+        mudancas = dict(mudancas or {})
+        retirar = [v for v in retirar if v not in mudancas]
+        antes = dict(self.motor.fatos_sessao)
+        entradas_antes = dict(self.entradas)
+        alteradas = {v for v, val in mudancas.items() if self.entradas.get(v, _AUSENTE) != val}
+        alteradas.update(v for v in retirar if v in self.entradas)
+        for var in retirar:
+            self.entradas.pop(var, None)
+        self.entradas.update(mudancas)
+
+        por_conclusao = self.motor.rede.por_conclusao
+        cone = set()
+        try:
+            if any(var in por_conclusao for var in (*alteradas, *self.entradas)):
+                self._recalcular()
+                modo = "completo"
+            else:
+                cone = self._cone(alteradas)
+                self._retratar(cone, alteradas, antes)
+                modo = "incremental"
+        except Exception:
+            self.entradas = entradas_antes
+            self._recalcular()
+            raise
+        return {
+            "modo": modo,
+            "retratados": len(cone),
+            "diferenca": _diferenca(antes, self.motor.fatos_sessao),
+            "explicacao_como": self._explicacao(),
+        }
+
+    # --- internos ---
+    def _recalcular(self):
+        self.motor = MotorForwardChaining(self.bc, objetivos=self.objetivos, parar_nos_objetivos=False)
+        for var, val in self.entradas.items():
+            self.motor.adicionar_fato(var, val)
+        self.motor.encadear(self.motor.limite_passos())
+        self.motor.trilha_explicacao = []  # A explicação sai dos suportes
+        self.suportes = {}  # fato derivado -> índices (na rede) das regras que o sustentam
+        self._rever_suportes(range(len(self.motor.rede.regras)))
+
+    def _satisfeita(self, idx):
+        return self.motor._satisfeitas[idx] == self.motor.rede.num_condicoes[idx]
+
+    def _rever_suportes(self, indices):
+        fatos = self.motor.fatos_sessao
+        regras = self.motor.rede.regras
+        for idx in indices:
+            satisfeita = self._satisfeita(idx)
+            for conc in regras[idx].conclusoes_entao:
+                var = conc.variavel
+                if satisfeita and var not in self.entradas and fatos.get(var, _AUSENTE) == conc.valor:
+                    self.suportes.setdefault(var, set()).add(idx)
+                elif var in self.suportes:
+                    self.suportes[var].discard(idx)
+                    if not self.suportes[var]:
+                        del self.suportes[var]
+
+    def _explicacao(self):
+        regras = self.motor.rede.regras
+        return [regras[idx].nome for idx in sorted(set().union(*self.suportes.values()))]
+
+    def _cone(self, variaveis):
+        """Fatos derivados com algum suporte que depende (transitivamente) das variáveis."""
+        rede = self.motor.rede
+        cone, pendentes = set(), list(variaveis)
+        while pendentes:
+            for idx, _, _ in rede.alfa.get(pendentes.pop(), ()):
+                for conc in rede.regras[idx].conclusoes_entao:
+                    derivado = conc.variavel
+                    if derivado not in cone and idx in self.suportes.get(derivado, ()):
+                        cone.add(derivado)
+                        pendentes.append(derivado)
+        return cone
+
+    def _retratar(self, cone, alteradas, antes):
+        motor = self.motor
+        for var in cone:
+            del self.suportes[var]
+            del motor.fatos_sessao[var]
+        for var in alteradas:
+            if var in self.entradas:
+                motor.fatos_sessao[var] = self.entradas[var]
+            else:
+                motor.fatos_sessao.pop(var, None)
+        # Reavalia as condições afetadas; regras ainda satisfeitas que
+        # concluíam um fato retirado voltam à agenda (re-derivação)
+        for var in (*cone, *alteradas):
+            motor._propagar(var)
+        motor.encadear(motor.limite_passos())
+        motor.trilha_explicacao = []
+        # Suportes só mudam em regras com premissa ou conclusão numa
+        # variável que mudou (ou que saiu e voltou com o mesmo valor)
+        fatos = motor.fatos_sessao
+        mudadas = set(cone) | alteradas
+        mudadas.update(v for v in fatos if antes.get(v, _AUSENTE) != fatos[v])
+        mudadas.update(v for v in antes if v not in fatos)
+        rede = motor.rede
+        indices = set()
+        for var in mudadas:
+            indices.update(idx for idx, _, _ in rede.alfa.get(var, ()))
+            indices.update(rede.por_conclusao.get(var, ()))
+        self._rever_suportes(indices)
+
+
+_AUSENTE = object()
+
+
+def _diferenca(antes, depois):
+    return {
+        "adicionados": {v: val for v, val in depois.items() if v not in antes},
+        "removidos": {v: val for v, val in antes.items() if v not in depois},
+        "alterados": {
+            v: {"antes": antes[v], "depois": val}
+            for v, val in depois.items() if v in antes and antes[v] != val
+        },
+    }
@@ -1,46 +1,233 @@
 
 # backend/app/inference_engine.py
 
-from .models import BaseConhecimento, Condicao
+import heapq
+
+from .analise import fatia_para_objetivos, regras_de_trabalho
+from .models import BaseConhecimento, Condicao, FatosSessao
+
+# --- Rede de Casamento (estilo Rete) ---
+class RedeCasamento:
+    """Estrutura estática compilada uma única vez por BaseConhecimento.
+
+    Cada condição SE vira um nó alfa indexado pela variável que testa; assim,
+    quando um fato muda, só as condições (e regras) que o referenciam são
+    reavaliadas. Regras que a análise estática provou mortas ficam de fora;
+    com `objetivos`, só entram as regras das quais eles podem depender.
+    """
+
+    def __init__(self, bc: BaseConhecimento, objetivos=None):
+        self.versao = bc.versao
+        if objetivos is None:
+            regras, regras_por_conclusao = regras_de_trabalho(bc)
+        else:
+            regras, regras_por_conclusao = fatia_para_objetivos(bc, objetivos)
+        self.regras = list(regras)
+        self.num_condicoes = [len(r.condicoes_se) for r in self.regras]
+        # variavel -> lista de (indice_regra, posicao_condicao, condicao)
+        self.alfa = {}
+        for idx, regra in enumerate(self.regras):
+            for pos, cond in enumerate(regra.condicoes_se):
+                self.alfa.setdefault(cond.variavel, []).append((idx, pos, cond))
+        # variavel -> indices das regras que a concluem (a partir do índice da base)
+        posicao = {id(regra): idx for idx, regra in enumerate(self.regras)}
+        self.por_conclusao = {
+            variavel: [posicao[id(regra)] for regra in regras]
+            for variavel, regras in regras_por_conclusao.items()
+        }
+        # objetivo -> valores distintos que as regras da fatia podem lhe dar
+        self.valores_objetivos = {}
+        for objetivo in objetivos or ():
+            valores = self.valores_objetivos[objetivo] = []
+            for idx in self.por_conclusao.get(objetivo, ()):
+                for conc in self.regras[idx].conclusoes_entao:
+                    if conc.variavel == objetivo and conc.valor not in valores:
+                        valores.append(conc.valor)
+
+
+# Fatias por conjunto de objetivos guardadas por base (descartadas ao encher)
+MAX_REDES_POR_OBJETIVOS = 64
+
+
+def obter_rede_casamento(bc: BaseConhecimento, objetivos=None) -> RedeCasamento:
+    """Retorna a rede compilada da base (ou da fatia relevante para
+    `objetivos`), recompilando se a base mudou."""
+    if objetivos is not None:
+        chave = frozenset(objetivos)
+        cache = getattr(bc, "_redes_por_objetivos", None)
+        if cache is None or cache[0] != bc.versao:
+            cache = bc._redes_por_objetivos = (bc.versao, {})
+        rede = cache[1].get(chave)
+        if rede is None:
+            if len(cache[1]) >= MAX_REDES_POR_OBJETIVOS:
+                cache[1].clear()
+            rede = cache[1][chave] = RedeCasamento(bc, chave)
+        return rede
+    rede = getattr(bc, "_rede_casamento", None)
+    if rede is None or rede.versao != bc.versao:
+        rede = RedeCasamento(bc)
+        bc._rede_casamento = rede
+    return rede
+
 
 # --- Motor de Encadeamento para Frente ---
 class MotorForwardChaining:
-    def __init__(self, bc: BaseConhecimento):
+    """Encadeamento para frente até o ponto fixo.
+
+    Com `objetivos` (nomes de variáveis) só a fatia de regras das quais eles
+    dependem é avaliada, e os valores deles são os do encadeamento completo.
+    Com `parar_nos_objetivos` (padrão) o encadeamento também termina antes do
+    ponto fixo da fatia, assim que cada objetivo está decidido: tem um valor e
+    nenhuma regra da fatia conclui outro para ele (ou nenhuma o conclui).
+    Nesse caso os fatos intermediários e a trilha podem ficar incompletos.
+    """
+
+    def __init__(self, bc: BaseConhecimento, metricas=None, objetivos=None, parar_nos_objetivos=True):
         self.bc = bc
         self.fatos_sessao = dict(bc.fatos)  # Fatos conhecidos
         self.trilha_explicacao = []
+        self.metricas = metricas  # MetricasConsulta opcional (ver metricas.py)
+        self.rede = obter_rede_casamento(bc, objetivos)
+        self.parar_nos_objetivos = parar_nos_objetivos and objetivos is not None
+        # Memórias alfa da sessão: (indice_regra, posicao_condicao) -> satisfeita?
+        self._alfa_estado = {}
+        # Estado de junção: quantas condições de cada regra estão satisfeitas
+        self._satisfeitas = [0] * len(self.rede.regras)
+        # Agenda: regras acordadas ainda no passo atual (heap) e no próximo passo
+        self._fila_passo = []
+        self._na_fila_passo = set()
+        self._proximo_passo = set()
+        self._cursor = -1
+        for idx, n in enumerate(self.rede.num_condicoes):
+            if n == 0:
+                self._acordar(idx)
+        for variavel in list(self.fatos_sessao):
+            self._propagar_medido(variavel)
 
     def adicionar_fato(self, variavel, valor):
         self.fatos_sessao[variavel] = valor
+        self._propagar_medido(variavel)
+
+    def _propagar_medido(self, variavel):
+        # O casamento dos fatos de entrada conta no tempo do motor, como o
+        # que acontece dentro de encadear(): o tempo por regra é medido nos dois
+        metricas = self.metricas
+        if metricas is None:
+            self._propagar(variavel)
+            return
+        inicio = metricas.relogio()
+        self._propagar(variavel)
+        metricas.segundos += metricas.relogio() - inicio
+
+    def _acordar(self, idx):
+        # Regras à frente do cursor ainda são vistas neste passo; as demais
+        # só no próximo, reproduzindo a varredura em ordem do motor original.
+        if idx > self._cursor:
+            if idx not in self._na_fila_passo:
+                self._na_fila_passo.add(idx)
+                heapq.heappush(self._fila_passo, idx)
+        else:
+            self._proximo_passo.add(idx)
 
-    def encadear(self):
-        alterado = True
-        while alterado:
+    def _propagar(self, variavel):
+        valor = self.fatos_sessao.get(variavel)
+        metricas = self.metricas
+        for idx, pos, cond in self.rede.alfa.get(variavel, ()):
+            chave = (idx, pos)
+            antes = self._alfa_estado.get(chave, False)
+            if metricas is None:
+                agora = valor is not None and cond.avaliar(valor)
+            else:
+                t0 = metricas.relogio()
+                agora = valor is not None and cond.avaliar(valor)
+                metricas.avaliacoes_condicao += 1
+                metricas.tempo(self.rede.regras[idx], metricas.relogio() - t0)
+            if agora != antes:
+                self._alfa_estado[chave] = agora
+                self._satisfeitas[idx] += 1 if agora else -1
+            if agora and self._satisfeitas[idx] == self.rede.num_condicoes[idx]:
+                self._acordar(idx)
+        # Regras que concluem a variável podem voltar a disparar se o valor mudou
+        for idx in self.rede.por_conclusao.get(variavel, ()):
+            if self._satisfeitas[idx] == self.rede.num_condicoes[idx]:
+                self._acordar(idx)
+
+    def _objetivo_decidido(self, objetivo):
+        valor = self.fatos_sessao.get(objetivo)
+        return all(valor == v for v in self.rede.valores_objetivos[objetivo])
+
+    def limite_passos(self):
+        """Passos que um encadeamento com ponto fixo não passa: sem
+        sobrescritas cada passo fixa ao menos um fato novo. Para encadear(),
+        quando as regras podem oscilar e a chamada não pode ficar presa."""
+        return 2 * (len(self.rede.regras) + len(self.fatos_sessao)) + 2
+
+    def encadear(self, max_passos=None):
+        """Encadeia até o ponto fixo. Regras que concluem valores diferentes
+        para uma mesma variável e ficam satisfeitas juntas se sobrescrevem a
+        cada passo, sem ponto fixo; com `max_passos` isso vira SemPontoFixo."""
+        regras = self.rede.regras
+        metricas = self.metricas
+        if metricas is not None:
+            inicio = metricas.relogio()
+        passos = 0
+        pendentes = None
+        if self.parar_nos_objetivos:
+            pendentes = {o for o in self.rede.valores_objetivos if not self._objetivo_decidido(o)}
+        while pendentes is None or pendentes:
+            passos += 1
+            if max_passos is not None and passos > max_passos:
+                raise SemPontoFixo(max_passos)
+            if metricas is not None:
+                metricas.passos += 1
             alterado = False
-            for regra in self.bc.regras:
-                # Verifica se todas as condições SE são satisfeitas
-                todas_satisfeitas = True
-                for cond in regra.condicoes_se:
-                    valor = self.fatos_sessao.get(cond.variavel)
-                    if valor is None or not avaliar_condicao_com_valor(cond, valor):
-                        todas_satisfeitas = False
-                        break
-                if todas_satisfeitas:
-                    # Aplica conclusões ENTÃO
-                    for conc in regra.conclusoes_entao:
-                        valor_existente = self.fatos_sessao.get(conc.variavel)
-                        if valor_existente != conc.valor:
-                            self.fatos_sessao[conc.variavel] = conc.valor
-                            self.trilha_explicacao.append(regra)
-                            alterado = True
+            while self._fila_passo and (pendentes is None or pendentes):
+                idx = heapq.heappop(self._fila_passo)
+                self._na_fila_passo.discard(idx)
+                self._cursor = idx
+                if self._satisfeitas[idx] != self.rede.num_condicoes[idx]:
+                    continue
+                regra = regras[idx]
+                disparou = False
+                # Aplica conclusões ENTÃO
+                for conc in regra.conclusoes_entao:
+                    valor_existente = self.fatos_sessao.get(conc.variavel)
+                    if valor_existente != conc.valor:
+                        self.fatos_sessao[conc.variavel] = conc.valor
+                        self.trilha_explicacao.append(regra)
+                        alterado = disparou = True
+                        self._propagar(conc.variavel)
+                        if pendentes and conc.variavel in pendentes and self._objetivo_decidido(conc.variavel):
+                            pendentes.discard(conc.variavel)
+                if disparou and metricas is not None:
+                    metricas.disparo(regra)
+            self._cursor = -1
+            if not alterado:
+                break
+            for idx in self._proximo_passo:
+                self._na_fila_passo.add(idx)
+                self._fila_passo.append(idx)
+            heapq.heapify(self._fila_passo)
+            self._proximo_passo.clear()
 
+        if metricas is not None:
+            metricas.segundos += metricas.relogio() - inicio
         return {
             "fatos": self.fatos_sessao,
             "explicacao_como": [r.nome for r in self.trilha_explicacao],
         }
 
 
-# --- Exceção Customizada ---
+# --- Exceções Customizadas ---
+class SemPontoFixo(Exception):
+    def __init__(self, passos):
+        super().__init__(
+            f"O encadeamento não atingiu um ponto fixo em {passos} passos: "
+            "regras satisfeitas ao mesmo tempo concluem valores diferentes."
+        )
+        self.passos = passos
+
+
 class AskUserException(Exception):
     def __init__(self, variavel, pergunta="", explicacao="", regra_contexto=None):
         self.variavel = variavel
@@ -51,30 +238,8 @@ class AskUserException(Exception):
 
 # --- Função de Avaliação Simplificada ---
 def avaliar_condicao_com_valor(condicao: Condicao, valor):
-    op = condicao.operador
-    alvo = condicao.valor
-
-    try:
-        valor_num = float(valor)
-        alvo_num = float(alvo)
-    except (ValueError, TypeError):
-        valor_num = None
-        alvo_num = None
-
-    if op == "==":
-        return valor == alvo
-    if op == "!=":
-        return valor != alvo
-    if valor_num is not None and alvo_num is not None:
-        if op == ">":
-            return valor_num > alvo_num
-        if op == "<":
-            return valor_num < alvo_num
-        if op == ">=":
-            return valor_num >= alvo_num
-        if op == "<=":
-            return valor_num <= alvo_num
-    return False
+    # O predicado é compilado uma vez quando a regra entra na base
+    return condicao.avaliar(valor)
 
 
 def _combinar_cf(cf1, cf2):
@@ -84,31 +249,207 @@ def _combinar_cf(cf1, cf2):
     return max(cf1, cf2)  # Simplificação para outros casos
 
 
+class _QuadroObjetivo:
+    """Continuação de um subobjetivo pendente na agenda do backward chaining."""
+
+    def __init__(self, variavel, regras):
+        self.variavel = variavel
+        self.regras = regras  # Regras que concluem a variável
+        self.i_regra = 0  # Regra em avaliação
+        self.i_condicao = 0  # Quantas condições SE da regra em avaliação já valem
+        self.satisfeitas = set()  # Posições dessas condições (fora de ordem na estratégia 'ganho')
+        self.cf_premissa = 1.0
+        self.dependencias = set()  # Variáveis que decidiram as regras exploradas
+        self.ciclo = False  # Alguma regra foi pulada por ciclo (resultado depende do contexto)
+
+
+ESTRATEGIAS_PERGUNTA = ("ordem", "ganho")
+
+
 class MotorBackwardChaining:
-    def __init__(self, bc: BaseConhecimento):
+    """Backward chaining com agenda de subobjetivos.
+
+    `estrategia` define qual premissa desconhecida é perseguida primeiro:
+    'ordem' segue o arquivo de regras; 'ganho' avalia antes as premissas que
+    já têm valor e depois pergunta pela que mais provavelmente decide as
+    regras restantes do subobjetivo (ver _nota_premissa).
+
+    Com `top_k` e/ou `cf_minimo` o objetivo é ranqueado: cada valor concluído
+    vira um candidato com o CF combinado de todas as regras que o concluem, e
+    o resultado traz os `top_k` melhores com CF >= `cf_minimo` (cf_minimo=-1
+    lista todos). Uma regra do objetivo é pulada, sem perguntar suas
+    premissas, quando nem o CF máximo que ela e as demais regras do mesmo
+    valor ainda podem somar leva esse valor ao resultado (ver _fora_do_limite).
+    """
+
+    def __init__(self, bc: BaseConhecimento, metricas=None, estrategia="ordem", top_k=None, cf_minimo=None):
+        if estrategia not in ESTRATEGIAS_PERGUNTA:
+            raise ValueError(f"Estratégia desconhecida: {estrategia!r}")
+        if top_k is not None and (isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1):
+            raise ValueError("'top_k' deve ser um inteiro positivo.")
+        if cf_minimo is not None and (
+            isinstance(cf_minimo, bool) or not isinstance(cf_minimo, (int, float)) or not -1 <= cf_minimo <= 1
+        ):
+            raise ValueError("'cf_minimo' deve ser um número entre -1 e 1.")
         self.bc = bc
-        self.fatos_sessao = {}
+        self.estrategia = estrategia
+        self.top_k = top_k
+        self.cf_minimo = cf_minimo
+        self.ranquear = top_k is not None or cf_minimo is not None
+        self.candidatos = {}  # repr(valor) -> [valor, cf] do objetivo ranqueado
+        self.regras_podadas = []  # Regras do objetivo puladas pelo limite
+        self.metricas = metricas  # MetricasConsulta opcional (ver metricas.py)
+        # Regras que concluem cada variável, sem as mortas (ver analise.py)
+        self._regras_por_conclusao = regras_de_trabalho(bc)[1]
+        self.fatos_sessao = FatosSessao(bc)  # variavel -> (valor, cf)
         for var, val in bc.fatos.items():
             self.fatos_sessao[var] = (val, 1.0)
         self.trilha_explicacao = []
         self.objetivo_inicial = None
+        # Pilha de subobjetivos pendentes; uma resposta retoma do topo
+        self.agenda = []
+        self.em_exploracao = set()  # Variáveis na agenda (detecção de ciclos)
+        self.regras_disparadas = set()  # Cada regra dispara no máximo uma vez
+        # Memo da sessão, invalidado por adicionar_resposta só onde depende da
+        # variável respondida:
+        self._regra_falhou = {}  # id(regra) -> variável da premissa que a falsificou
+        self._falhas_por_variavel = {}  # variável -> ids das regras que ela falsificou
+        self._sem_derivacao = {}  # subobjetivo sem regra aplicável -> dependências
+        self._dependentes = {}  # variável -> subobjetivos em _sem_derivacao que dependem dela
+
+    def para_dict(self):
+        """Estado compacto (serializável em JSON) da consulta; regras viajam pelo nome."""
+        return {
+            "objetivo": self.objetivo_inicial,
+            "estrategia": self.estrategia,
+            "fatos": {var: [val, cf] for var, (val, cf) in self.fatos_sessao.items()},
+            "trilha": [regra.nome for regra in self.trilha_explicacao],
+            "agenda": [
+                [
+                    q.variavel, q.i_regra, q.i_condicao, q.cf_premissa,
+                    sorted(q.dependencias), q.ciclo, sorted(q.satisfeitas),
+                ]
+                for q in self.agenda
+            ],
+            "disparadas": [r.nome for r in self.bc.regras if id(r) in self.regras_disparadas],
+            "ranking": {
+                "top_k": self.top_k,
+                "cf_minimo": self.cf_minimo,
+                "candidatos": list(self.candidatos.values()),
+                "podadas": [regra.nome for regra in self.regras_podadas],
+            } if self.ranquear else None,
+        }
+
+    @classmethod
+    def de_dict(cls, bc: BaseConhecimento, dados):
+        """Reconstrói a consulta salva por para_dict() sobre a mesma base."""
+        ranking = dados.get("ranking") or {}
+        motor = cls(
+            bc, estrategia=dados.get("estrategia", "ordem"),
+            top_k=ranking.get("top_k"), cf_minimo=ranking.get("cf_minimo"),
+        )
+        regras = {regra.nome: regra for regra in bc.regras}
+        motor.candidatos = {repr(valor): [valor, cf] for valor, cf in ranking.get("candidatos", [])}
+        motor.regras_podadas = [regras[nome] for nome in ranking.get("podadas", []) if nome in regras]
+        motor.objetivo_inicial = dados["objetivo"]
+        motor.fatos_sessao = FatosSessao(bc, {var: (val, cf) for var, (val, cf) in dados["fatos"].items()})
+        motor.trilha_explicacao = [regras[nome] for nome in dados["trilha"] if nome in regras]
+        motor.regras_disparadas = {id(regras[n]) for n in dados["disparadas"] if n in regras}
+        for variavel, i_regra, i_condicao, cf_premissa, *memo in dados["agenda"]:
+            # Um quadro pode já ter valor (segue explorando regras para combinar o CF)
+            quadro = _QuadroObjetivo(variavel, motor._regras_por_conclusao.get(variavel, []))
+            motor.agenda.append(quadro)
+            motor.em_exploracao.add(variavel)
+            quadro.i_regra, quadro.i_condicao = i_regra, i_condicao
+            quadro.cf_premissa = cf_premissa
+            quadro.satisfeitas = set(memo[2]) if len(memo) > 2 else set(range(i_condicao))
+            if memo:
+                quadro.dependencias, quadro.ciclo = set(memo[0]), memo[1]
+            else:  # Estado salvo sem o memo: não arrisca registrar o quadro como sem derivação
+                quadro.ciclo = True
+        return motor
 
     def adicionar_resposta(self, variavel: str, valor):
         self.fatos_sessao[variavel] = (valor, 1.0)
-        return self.provar_objetivo(self.objetivo_inicial)
+        self._invalidar_memo(variavel)
+        self._podar_agenda()
+        self._reiniciar_quadros(variavel)
+        return self._executar_agenda()
+
+    def _reiniciar_quadros(self, variavel):
+        # Uma resposta nova para uma variável já usada (correção) invalida o
+        # progresso do subobjetivo mais externo em aberto que dependia dela:
+        # ele volta à primeira regra e o que foi empilhado acima dele sai.
+        # Regras já disparadas e falhas que não dependem da variável
+        # continuam no memo, então só o que mudou é reavaliado.
+        for pos, quadro in enumerate(self.agenda):
+            regra = quadro.regras[quadro.i_regra] if quadro.i_regra < len(quadro.regras) else None
+            if variavel in quadro.dependencias or (
+                regra is not None
+                and any(regra.condicoes_se[i].variavel == variavel for i in quadro.satisfeitas)
+            ):
+                for descartado in self.agenda[pos + 1:]:
+                    self.em_exploracao.discard(descartado.variavel)
+                del self.agenda[pos + 1:]
+                quadro.i_regra = 0
+                quadro.i_condicao = 0
+                quadro.satisfeitas = set()
+                quadro.cf_premissa = 1.0
+                quadro.dependencias = set()
+                quadro.ciclo = False
+                break
+
+    def _invalidar_memo(self, variavel):
+        self._sem_derivacao.pop(variavel, None)
+        for id_regra in self._falhas_por_variavel.pop(variavel, ()):
+            self._regra_falhou.pop(id_regra, None)
+        for objetivo in self._dependentes.pop(variavel, ()):
+            self._sem_derivacao.pop(objetivo, None)
+
+    def _registrar_falha(self, regra, variavel):
+        self._regra_falhou[id(regra)] = variavel
+        self._falhas_por_variavel.setdefault(variavel, set()).add(id(regra))
+
+    def _registrar_sem_derivacao(self, quadro):
+        self._sem_derivacao[quadro.variavel] = quadro.dependencias
+        for variavel in quadro.dependencias:
+            self._dependentes.setdefault(variavel, set()).add(quadro.variavel)
 
     def provar_objetivo(self, objetivo: str):
         self.objetivo_inicial = objetivo
+        self.agenda = []
+        self.em_exploracao = set()
+        self.candidatos = {}
+        self.regras_podadas = []
+        self._empilhar(objetivo)
+        return self._executar_agenda()
+
+    def _executar_agenda(self):
+        objetivo = self.objetivo_inicial
+        metricas = self.metricas
+        if metricas is not None:
+            inicio = metricas.relogio()
         try:
-            resultado = self._buscar_valor_para(objetivo)
-            valor, cf = resultado if resultado else (None, 0)
-            return {
+            try:
+                self._processar_agenda()
+            finally:
+                if metricas is not None:
+                    metricas.segundos += metricas.relogio() - inicio
+            valor, cf = self.fatos_sessao.get(objetivo, (None, 0))
+            resultado = {
                 "tipo": "resultado",
                 "objetivo": objetivo,
                 "valor": valor,
                 "cf": cf,
                 "explicacao_como": [regra.nome for regra in self.trilha_explicacao],
             }
+            if self.ranquear:
+                candidatos = self._candidatos_ranqueados()
+                if candidatos:
+                    resultado["valor"], resultado["cf"] = candidatos[0]["valor"], candidatos[0]["cf"]
+                resultado["candidatos"] = candidatos
+                resultado["regras_podadas"] = [regra.nome for regra in self.regras_podadas]
+            return resultado
         except AskUserException as e:
             justificativa_regra = e.regra_contexto.nome if e.regra_contexto else ""
             return {
@@ -119,78 +460,259 @@ class MotorBackwardChaining:
                 "contexto_regra": justificativa_regra,
             }
 
-    def _buscar_valor_para(self, variavel_alvo: str, pilha_recursao=None):
-        if pilha_recursao is None:
-            pilha_recursao = set()
+    def _buscar_valor_para(self, variavel_alvo: str):
+        """Resolve a variável pela agenda; levanta AskUserException se faltar resposta."""
+        self._empilhar(variavel_alvo)
+        self._processar_agenda()
+        return self.fatos_sessao.get(variavel_alvo)
 
-        if variavel_alvo in self.fatos_sessao:
-            return self.fatos_sessao[variavel_alvo]
+    def _empilhar(self, variavel):
+        if variavel in self.fatos_sessao:
+            return
+        self.em_exploracao.add(variavel)
+        quadro = _QuadroObjetivo(variavel, self._regras_por_conclusao.get(variavel, []))
+        if variavel in self._sem_derivacao:
+            # Já se sabe que nenhuma regra conclui a variável: vai direto à pergunta
+            quadro.i_regra = len(quadro.regras)
+        self.agenda.append(quadro)
+        if self.metricas is not None:
+            self.metricas.profundidade(len(self.agenda))
 
-        if variavel_alvo in pilha_recursao:
-            return None
-        pilha_recursao.add(variavel_alvo)
+    def _podar_agenda(self):
+        # Subobjetivos que já têm valor estão resolvidos: descarta-os junto
+        # com tudo o que foi empilhado acima deles.
+        for pos, quadro in enumerate(self.agenda):
+            if quadro.variavel in self.fatos_sessao:
+                for descartado in self.agenda[pos:]:
+                    self.em_exploracao.discard(descartado.variavel)
+                del self.agenda[pos:]
+                break
 
-        regras_relevantes = [
-            r
-            for r in self.bc.regras
-            if any(c.variavel == variavel_alvo for c in r.conclusoes_entao)
-        ]
+    def _processar_agenda(self):
+        while self.agenda:
+            quadro = self.agenda[-1]
 
-        for regra in regras_relevantes:
-            cf_premissa = 1.0
-            try:
-                for condicao in regra.condicoes_se:
-                    valor_condicao, cf_condicao = self._buscar_valor_para(
-                        condicao.variavel, pilha_recursao
-                    )
-                    if avaliar_condicao_com_valor(condicao, valor_condicao):
-                        cf_premissa = min(cf_premissa, cf_condicao)
+            # Todas as regras do subobjetivo foram exploradas
+            if quadro.i_regra >= len(quadro.regras):
+                # O objetivo ranqueado não é perguntado: sem regra que o
+                # conclua, a lista de candidatos sai vazia
+                ranqueado = self.ranquear and quadro.variavel == self.objetivo_inicial
+                if quadro.variavel not in self.fatos_sessao and not ranqueado:
+                    if not quadro.ciclo and quadro.variavel not in self._sem_derivacao:
+                        self._registrar_sem_derivacao(quadro)
+                    # O quadro permanece na agenda até a resposta chegar
+                    self._perguntar(quadro.variavel)
+                self.agenda.pop()
+                self.em_exploracao.discard(quadro.variavel)
+                continue
+
+            regra = quadro.regras[quadro.i_regra]
+            if id(regra) in self.regras_disparadas:
+                self._proxima_regra(quadro)
+                continue
+            falsificada_por = self._regra_falhou.get(id(regra))
+            if falsificada_por is not None:
+                # Premissa já avaliada como falsa e ainda não respondida de novo
+                quadro.dependencias.add(falsificada_por)
+                self._proxima_regra(quadro)
+                continue
+            if self.ranquear and quadro.variavel == self.objetivo_inicial and self._fora_do_limite(quadro, regra):
+                # Branch and bound: a regra não muda o resultado, então suas
+                # premissas ainda desconhecidas nem são perguntadas
+                self.regras_podadas.append(regra)
+                self._proxima_regra(quadro)
+                continue
+
+            if quadro.i_condicao < len(regra.condicoes_se):
+                pos = self._escolher_premissa(quadro, regra)
+                condicao = regra.condicoes_se[pos]
+                if condicao.variavel in self.fatos_sessao:
+                    valor_condicao, cf_condicao = self.fatos_sessao[condicao.variavel]
+                    if self.metricas is None:
+                        satisfeita = condicao.avaliar(valor_condicao)
                     else:
-                        cf_premissa = 0
-                        break
-            except AskUserException:
-                raise
-            except TypeError:
-                cf_premissa = 0
-
-            if cf_premissa > 0:
-                for conclusao in regra.conclusoes_entao:
-                    cf_final_conclusao = cf_premissa * getattr(conclusao, "fc", 1.0)
-                    if conclusao.variavel in self.fatos_sessao:
-                        valor_existente, cf_existente = self.fatos_sessao[
-                            conclusao.variavel
-                        ]
-                        if valor_existente == conclusao.valor:
-                            novo_cf = _combinar_cf(cf_existente, cf_final_conclusao)
-                            self.fatos_sessao[conclusao.variavel] = (
-                                conclusao.valor,
-                                novo_cf,
-                            )
+                        t0 = self.metricas.relogio()
+                        satisfeita = condicao.avaliar(valor_condicao)
+                        self.metricas.avaliacoes_condicao += 1
+                        self.metricas.tempo(regra, self.metricas.relogio() - t0)
+                    if satisfeita:
+                        quadro.cf_premissa = min(quadro.cf_premissa, cf_condicao)
+                        quadro.i_condicao += 1
+                        quadro.satisfeitas.add(pos)
                     else:
-                        self.fatos_sessao[conclusao.variavel] = (
-                            conclusao.valor,
-                            cf_final_conclusao,
-                        )
-                    self.trilha_explicacao.append(regra)
+                        self._registrar_falha(regra, condicao.variavel)
+                        quadro.dependencias.add(condicao.variavel)
+                        self._proxima_regra(quadro)
+                elif condicao.variavel in self.em_exploracao:
+                    # Ciclo: a premissa depende do próprio subobjetivo em aberto
+                    quadro.ciclo = True
+                    self._proxima_regra(quadro)
+                else:
+                    self._empilhar(condicao.variavel)
+                continue
+
+            # Premissas verdadeiras: o resultado depende de todas elas (inclusive do CF)
+            quadro.dependencias.update(c.variavel for c in regra.condicoes_se)
+            if quadro.cf_premissa > 0:
+                if self.metricas is None:
+                    self._disparar_regra(regra, quadro.cf_premissa)
+                else:
+                    t0 = self.metricas.relogio()
+                    self._disparar_regra(regra, quadro.cf_premissa)
+                    self.metricas.disparo(regra)
+                    self.metricas.tempo(regra, self.metricas.relogio() - t0)
+            self._proxima_regra(quadro)
+
+    @staticmethod
+    def _proxima_regra(quadro):
+        quadro.i_regra += 1
+        quadro.i_condicao = 0
+        quadro.satisfeitas = set()
+        quadro.cf_premissa = 1.0
+
+    def _escolher_premissa(self, quadro, regra):
+        """Posição da próxima condição SE a examinar na regra atual."""
+        if self.estrategia == "ordem":
+            return quadro.i_condicao
+        melhor, melhor_nota = None, None
+        for pos, cond in enumerate(regra.condicoes_se):
+            if pos in quadro.satisfeitas:
+                continue
+            # Premissas que se decidem sem perguntar nada vêm primeiro
+            if cond.variavel in self.fatos_sessao or cond.variavel in self.em_exploracao:
+                return pos
+            nota = self._nota_premissa(quadro, cond.variavel)
+            if melhor_nota is None or nota > melhor_nota:
+                melhor, melhor_nota = pos, nota
+        return melhor
+
+    def _nota_premissa(self, quadro, variavel):
+        """Quantas regras restantes do subobjetivo a variável deve falsificar
+        (soma das probabilidades de as premissas sobre ela serem falsas),
+        dividido pelo custo de obtê-la: 1 pergunta, ou mais se ela ainda
+        tiver de ser deduzida."""
+        decididas = 0.0
+        for regra in quadro.regras[quadro.i_regra:]:
+            if id(regra) in self.regras_disparadas or id(regra) in self._regra_falhou:
+                continue
+            for cond in regra.condicoes_se:
+                if cond.variavel == variavel:
+                    decididas += self._prob_falsa(cond)
+        custo = 2.0 if variavel in self._regras_por_conclusao else 1.0
+        return decididas / custo
 
-        pilha_recursao.remove(variavel_alvo)
-        if variavel_alvo in self.fatos_sessao:
-            return self.fatos_sessao[variavel_alvo]
+    def _prob_falsa(self, cond):
+        # Sem distribuição das respostas, assume valores possíveis equiprováveis
+        variavel = self.bc.variaveis.get(cond.variavel)
+        k = len(variavel.valores_possiveis) if variavel else 0
+        if not k or cond.operador not in ("==", "!=", "in"):
+            return 0.5
+        if cond.operador == "==":
+            return 1 - 1 / k
+        if cond.operador == "!=":
+            return 1 / k
+        itens = cond.valor if isinstance(cond.valor, (list, tuple, set)) else str(cond.valor).split(",")
+        return max(0.0, 1 - len(itens) / k)
 
+    def _fora_do_limite(self, quadro, regra):
+        """A regra (do objetivo ranqueado) pode ser pulada? Sim se, para cada
+        valor que ela conclui, o teto de CF do valor fica abaixo de cf_minimo
+        ou de top_k outros candidatos. Como _combinar_cf nunca reduz um CF,
+        o CF atual dos outros candidatos é um piso e o resultado não muda."""
+        objetivo = self.objetivo_inicial
+        if any(c.variavel != objetivo for c in regra.conclusoes_entao):
+            return False  # Concluiria também outras variáveis
+        for conclusao in regra.conclusoes_entao:
+            chave = repr(conclusao.valor)
+            teto = self._teto_cf(quadro, chave)
+            if self.cf_minimo is not None and teto < self.cf_minimo:
+                continue
+            if self.top_k is not None and sum(
+                1 for outra, (_, cf) in self.candidatos.items() if outra != chave and cf > teto
+            ) >= self.top_k:
+                continue
+            return False
+        return True
+
+    def _teto_cf(self, quadro, chave):
+        """Maior CF que o candidato `chave` ainda pode alcançar: o atual
+        combinado com o máximo de cada regra restante que o conclui (fc vezes
+        o teto do CF das premissas). Com contribuições >= 0 a combinação é
+        1 - prod(1 - cf); as negativas não sobem o CF e contam como 0."""
+        candidato = self.candidatos.get(chave)
+        complemento = 1.0 - max(0.0, candidato[1]) if candidato else 1.0
+        for pos in range(quadro.i_regra, len(quadro.regras)):
+            regra = quadro.regras[pos]
+            if id(regra) in self.regras_disparadas or id(regra) in self._regra_falhou:
+                continue
+            teto = None
+            for conclusao in regra.conclusoes_entao:
+                if conclusao.variavel != self.objetivo_inicial or repr(conclusao.valor) != chave:
+                    continue
+                if teto is None:
+                    teto = self._teto_premissas(regra)
+                    if pos == quadro.i_regra:
+                        teto = min(teto, quadro.cf_premissa)
+                complemento *= 1.0 - max(0.0, teto * conclusao.fc)
+        return 1.0 - complemento
+
+    def _teto_premissas(self, regra):
+        # Premissas já conhecidas limitam o CF (ou anulam a regra); as
+        # desconhecidas ainda podem valer 1
+        teto = 1.0
+        for cond in regra.condicoes_se:
+            fato = self.fatos_sessao.get(cond.variavel)
+            if fato is not None:
+                if not cond.avaliar(fato[0]):
+                    return 0.0
+                teto = min(teto, fato[1])
+        return teto
+
+    def _candidatos_ranqueados(self):
+        candidatos = list(self.candidatos.values())
+        if not candidatos and self.objetivo_inicial in self.fatos_sessao:
+            # Objetivo já dado nos fatos da base
+            candidatos = [list(self.fatos_sessao[self.objetivo_inicial])]
+        candidatos.sort(key=lambda c: -c[1])  # Empates: ordem da primeira conclusão
+        if self.cf_minimo is not None:
+            candidatos = [c for c in candidatos if c[1] >= self.cf_minimo]
+        return [{"valor": valor, "cf": cf} for valor, cf in candidatos[:self.top_k]]
+
+    def _disparar_regra(self, regra, cf_premissa):
+        self.regras_disparadas.add(id(regra))
+        for conclusao in regra.conclusoes_entao:
+            cf_final_conclusao = cf_premissa * getattr(conclusao, "fc", 1.0)
+            if self.ranquear and conclusao.variavel == self.objetivo_inicial:
+                # Objetivo ranqueado: cada valor acumula seu próprio CF
+                candidato = self.candidatos.get(repr(conclusao.valor))
+                if candidato is None:
+                    self.candidatos[repr(conclusao.valor)] = [conclusao.valor, cf_final_conclusao]
+                else:
+                    candidato[1] = _combinar_cf(candidato[1], cf_final_conclusao)
+            elif conclusao.variavel in self.fatos_sessao:
+                valor_existente, cf_existente = self.fatos_sessao[conclusao.variavel]
+                if valor_existente == conclusao.valor:
+                    novo_cf = _combinar_cf(cf_existente, cf_final_conclusao)
+                    self.fatos_sessao[conclusao.variavel] = (
+                        conclusao.valor,
+                        novo_cf,
+                    )
+            else:
+                self.fatos_sessao[conclusao.variavel] = (
+                    conclusao.valor,
+                    cf_final_conclusao,
+                )
+            self.trilha_explicacao.append(regra)
+
+    def _perguntar(self, variavel_alvo):
         variavel_obj = self.bc.variaveis.get(variavel_alvo)
         pergunta_texto = (
             variavel_obj.pergunta if variavel_obj and variavel_obj.pergunta else f"Informe o valor para '{variavel_alvo}'."
         )
         explicacao_texto = variavel_obj.explicacao if variavel_obj else ""
 
-        regra_contexto = next(
-            (
-                r
-                for r in self.bc.regras
-                if any(c.variavel == variavel_alvo for c in r.condicoes_se)
-            ),
-            None,
-        )
+        regras_premissa = self.bc.regras_por_premissa.get(variavel_alvo)
+        regra_contexto = regras_premissa[0] if regras_premissa else None
 
         raise AskUserException(
             variavel_alvo, pergunta_texto, explicacao_texto, regra_contexto
@@ -0,0 +1,202 @@
+# backend/app/lote.py
+# Consultas em lote: uma base carregada (e compilada) para muitos casos.
+
+import csv
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .inference_engine import MotorBackwardChaining, MotorForwardChaining, SemPontoFixo
+from .models import BaseConhecimento
+from .utils import base_de_dicts, base_para_dicts, carregar_base_conhecimento
+
+
+def ler_casos_jsonl(linhas):
+    """Gera um dict de fatos por linha JSON não vazia."""
+    for linha in linhas:
+        linha = linha.strip()
+        if linha:
+            yield json.loads(linha)
+
+
+def ler_casos_csv(linhas):
+    """Gera um dict de fatos por linha do CSV; células vazias são ignoradas
+    (mesmo comportamento dos campos deixados em branco no frontend)."""
+    for linha in csv.DictReader(linhas):
+        yield {
+            var: val.strip()
+            for var, val in linha.items()
+            if var and val is not None and val.strip() != ""
+        }
+
+
+def encadear_caso(bc: BaseConhecimento, fatos: dict):
+    motor = MotorForwardChaining(bc)
+    for var, val in fatos.items():
+        motor.adicionar_fato(var, val)
+    return motor.encadear(motor.limite_passos())
+
+
+def consultar_caso(bc: BaseConhecimento, objetivo: str, fatos: dict):
+    """Backward chaining com as respostas já fornecidas pelo caso.
+
+    Se faltar um fato necessário, o resultado é a pergunta que seria feita ao
+    usuário ("tipo": "pergunta").
+    """
+    motor = MotorBackwardChaining(bc)
+    for var, val in fatos.items():
+        motor.fatos_sessao[var] = (val, 1.0)
+    return motor.provar_objetivo(objetivo)
+
+
+def _resultado_caso(bc, indice, fatos, objetivo=None):
+    if not isinstance(fatos, dict):
+        return {"indice": indice, "erro": "Cada caso deve ser um objeto de fatos."}
+    if objetivo is None:
+        try:
+            resultado = encadear_caso(bc, fatos)
+        except SemPontoFixo as e:
+            return {"indice": indice, "erro": str(e)}
+    else:
+        resultado = consultar_caso(bc, objetivo, fatos)
+    return {"indice": indice, **resultado}
+
+
+def encadear_lote(bc: BaseConhecimento, casos, objetivo=None):
+    """Executa o encadeamento para frente em cada caso, um por vez.
+
+    `casos` pode ser qualquer iterável (lista, gerador de CSV/JSONL); os
+    resultados são gerados à medida que saem, então a memória não cresce com
+    o tamanho do lote. A rede de casamento da base é compilada uma única vez.
+    Com `objetivo`, cada caso é uma consulta backward para esse objetivo.
+    """
+    for indice, fatos in enumerate(casos):
+        yield _resultado_caso(bc, indice, fatos, objetivo)
+
+
+def resultados_ndjson(resultados):
+    """Serializa cada resultado como uma linha de NDJSON."""
+    for resultado in resultados:
+        yield json.dumps(resultado, ensure_ascii=False) + "\n"
+
+
+# ------------------ EXECUÇÃO PARALELA ------------------
+_bc_processo = None  # Base carregada uma vez em cada processo do pool
+
+
+def _iniciar_processo(kb_name, dados_base):
+    global _bc_processo
+    if dados_base is None:
+        _bc_processo = carregar_base_conhecimento(kb_name)
+    else:
+        _bc_processo = base_de_dicts(*dados_base)
+
+
+def _processar_bloco(inicio, bloco, objetivo):
+    t0 = time.perf_counter()
+    resultados = [
+        _resultado_caso(_bc_processo, indice, fatos, objetivo)
+        for indice, fatos in enumerate(bloco, inicio)
+    ]
+    return os.getpid(), time.perf_counter() - t0, resultados
+
+
+class LoteParalelo:
+    """Distribui os casos de um lote entre processos (ProcessPoolExecutor).
+
+    Cada processo carrega a base uma única vez: pelo nome, com
+    carregar_base_conhecimento, ou a partir da forma compacta de uma
+    BaseConhecimento já carregada (base_para_dicts). Os casos seguem em
+    blocos de `tamanho_bloco`; no máximo `2 * processos` blocos ficam em voo,
+    então a entrada pode ser um gerador de milhões de linhas. Os resultados
+    saem na ordem de entrada.
+    """
+
+    def __init__(self, base, processos=None, tamanho_bloco=500, objetivo=None):
+        if isinstance(base, BaseConhecimento):
+            self._kb_name, self._dados_base = None, base_para_dicts(base)
+        else:
+            self._kb_name, self._dados_base = base, None
+        self.processos = processos or os.cpu_count() or 1
+        self.tamanho_bloco = max(1, int(tamanho_bloco))
+        self.objetivo = objetivo
+        self._por_processo = {}  # pid -> [casos, segundos]
+        self._inicio = self._fim = None
+
+    def executar(self, casos):
+        self._por_processo = {}
+        self._inicio, self._fim = time.perf_counter(), None
+        casos = iter(casos)
+        pendentes = deque()
+        inicio = 0
+        with ProcessPoolExecutor(
+            max_workers=self.processos,
+            initializer=_iniciar_processo,
+            initargs=(self._kb_name, self._dados_base),
+        ) as executor:
+            while True:
+                while len(pendentes) < 2 * self.processos:
+                    bloco = list(itertools.islice(casos, self.tamanho_bloco))
+                    if not bloco:
+                        break
+                    pendentes.append(
+                        executor.submit(_processar_bloco, inicio, bloco, self.objetivo)
+                    )
+                    inicio += len(bloco)
+                if not pendentes:
+                    break
+                pid, segundos, resultados = pendentes.popleft().result()
+                totais = self._por_processo.setdefault(pid, [0, 0.0])
+                totais[0] += len(resultados)
+                totais[1] += segundos
+                yield from resultados
+        self._fim = time.perf_counter()
+
+    def relatorio(self):
+        """Vazão do último lote: total e casos/s de cada processo."""
+        fim = self._fim if self._fim is not None else time.perf_counter()
+        duracao = fim - self._inicio if self._inicio is not None else 0.0
+        total = sum(casos for casos, _ in self._por_processo.values())
+        return {
+            "casos": total,
+            "segundos": duracao,
+            "casos_por_segundo": total / duracao if duracao else 0.0,
+            "processos": [
+                {
+                    "pid": pid,
+                    "casos": casos,
+                    "segundos": segundos,
+                    "casos_por_segundo": casos / segundos if segundos else 0.0,
+                }
+                for pid, (casos, segundos) in sorted(self._por_processo.items())
+            ],
+        }
+
+
+def encadear_lote_paralelo(base, casos, processos=None, tamanho_bloco=500, objetivo=None):
+    """Atalho para LoteParalelo(...).executar(casos)."""
+    return LoteParalelo(base, processos, tamanho_bloco, objetivo).executar(casos)
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.lote <kb> <casos.csv|casos.jsonl> [--processos N]
+    #                          [--bloco N] [--objetivo VAR] > resultados.ndjson
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Consulta em lote, em paralelo.")
+    parser.add_argument("kb")
+    parser.add_argument("arquivo")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--bloco", type=int, default=500)
+    parser.add_argument("--objetivo", default=None)
+    args = parser.parse_args()
+
+    lote = LoteParalelo(args.kb, args.processos, args.bloco, args.objetivo)
+    with open(args.arquivo, encoding="utf-8", newline="") as f:
+        ler = ler_casos_csv if args.arquivo.lower().endswith(".csv") else ler_casos_jsonl
+        sys.stdout.writelines(resultados_ndjson(lote.executar(ler(f))))
+    print(json.dumps(lote.relatorio(), indent=2), file=sys.stderr)
@@ -0,0 +1,133 @@
+# backend/app/metricas.py
+# Instrumentação opcional dos motores de inferência.
+
+import threading
+from time import perf_counter
+
+
+class MetricasConsulta:
+    """Contadores de uma chamada aos motores (passe como `metricas=`).
+
+    Os motores só tocam neste objeto quando ele é fornecido; sem ele o custo
+    é uma comparação com None por evento.
+    """
+
+    __slots__ = (
+        "avaliacoes_condicao", "disparos", "passos", "profundidade_max",
+        "tempo_regra", "disparos_regra", "segundos",
+    )
+
+    relogio = staticmethod(perf_counter)
+
+    def __init__(self):
+        self.avaliacoes_condicao = 0
+        self.disparos = 0
+        self.passos = 0  # Passos do encadeamento para frente
+        self.profundidade_max = 0  # Maior pilha de subobjetivos no backward
+        self.tempo_regra = {}  # nome da regra -> segundos
+        self.disparos_regra = {}  # nome da regra -> disparos
+        self.segundos = 0.0
+
+    def tempo(self, regra, segundos):
+        self.tempo_regra[regra.nome] = self.tempo_regra.get(regra.nome, 0.0) + segundos
+
+    def disparo(self, regra):
+        self.disparos += 1
+        self.disparos_regra[regra.nome] = self.disparos_regra.get(regra.nome, 0) + 1
+
+    def profundidade(self, n):
+        if n > self.profundidade_max:
+            self.profundidade_max = n
+
+    def to_dict(self, regras_lentas=10):
+        lentas = sorted(self.tempo_regra.items(), key=lambda item: -item[1])[:regras_lentas]
+        return {
+            "segundos": self.segundos,
+            "avaliacoes_condicao": self.avaliacoes_condicao,
+            "disparos": self.disparos,
+            "passos": self.passos,
+            "profundidade_max": self.profundidade_max,
+            "regras_lentas": [
+                {"regra": nome, "segundos": seg, "disparos": self.disparos_regra.get(nome, 0)}
+                for nome, seg in lentas
+            ],
+        }
+
+
+def _rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RegistroMetricas:
+    """Agrega as MetricasConsulta de todas as requisições (por KB e motor) e
+    as exporta no formato texto do Prometheus.
+
+    Uma série por regra teria cardinalidade sem limite (bases grandes,
+    regras renomeadas); só as `max_regras` mais lentas de cada KB saem com o
+    próprio rótulo e as demais somadas em regra="(outras)". Com
+    max_regras=0 as séries por regra não são exportadas.
+    """
+
+    OUTRAS = "(outras)"
+
+    def __init__(self, max_regras=20):
+        self.max_regras = max_regras
+        self._lock = threading.Lock()
+        self._por_motor = {}  # (kb, motor) -> [consultas, segundos, avaliacoes, disparos, passos, prof_max]
+        self._por_regra = {}  # (kb, regra) -> [segundos, disparos]
+
+    def registrar(self, kb_name, motor, metricas: MetricasConsulta):
+        with self._lock:
+            total = self._por_motor.setdefault((kb_name, motor), [0, 0.0, 0, 0, 0, 0])
+            total[0] += 1
+            total[1] += metricas.segundos
+            total[2] += metricas.avaliacoes_condicao
+            total[3] += metricas.disparos
+            total[4] += metricas.passos
+            total[5] = max(total[5], metricas.profundidade_max)
+            for nome, segundos in metricas.tempo_regra.items():
+                regra = self._por_regra.setdefault((kb_name, nome), [0.0, 0])
+                regra[0] += segundos
+            for nome, disparos in metricas.disparos_regra.items():
+                self._por_regra.setdefault((kb_name, nome), [0.0, 0])[1] += disparos
+
+    def prometheus(self):
+        series = (
+            ("inferencia_consultas_total", "counter", "Chamadas instrumentadas aos motores.", 0),
+            ("inferencia_segundos_total", "counter", "Tempo total dentro dos motores.", 1),
+            ("inferencia_avaliacoes_condicao_total", "counter", "Condições SE avaliadas.", 2),
+            ("inferencia_disparos_regra_total", "counter", "Regras disparadas.", 3),
+            ("inferencia_passos_forward_total", "counter", "Passos do encadeamento para frente.", 4),
+            ("inferencia_profundidade_max", "gauge", "Maior pilha de subobjetivos no backward.", 5),
+        )
+        with self._lock:
+            por_motor = sorted(self._por_motor.items())
+            por_regra = self._regras_exportadas() if self.max_regras else []
+        linhas = []
+        for nome, tipo, ajuda, i in series:
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+            for (kb, motor), valores in por_motor:
+                linhas.append(f'{nome}{{kb="{_rotulo(kb)}",motor="{motor}"}} {valores[i]}')
+        for nome, ajuda, i in (
+            ("inferencia_regra_segundos_total", "Tempo avaliando e disparando cada regra.", 0),
+            ("inferencia_regra_disparos_total", "Disparos de cada regra.", 1),
+        ) if por_regra else ():
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+            for (kb, regra), valores in por_regra:
+                linhas.append(f'{nome}{{kb="{_rotulo(kb)}",regra="{_rotulo(regra)}"}} {valores[i]}')
+        return "\n".join(linhas) + "\n"
+
+    def _regras_exportadas(self):
+        por_kb = {}
+        for (kb, regra), valores in self._por_regra.items():
+            por_kb.setdefault(kb, []).append((regra, valores))
+        series = []
+        for kb, regras in sorted(por_kb.items()):
+            regras.sort(key=lambda item: (-item[1][0], item[0]))
+            series += [((kb, regra), valores) for regra, valores in regras[:self.max_regras]]
+            resto = regras[self.max_regras:]
+            if resto:
+                series.append(((kb, self.OUTRAS), [
+                    sum(valores[0] for _, valores in resto), sum(valores[1] for _, valores in resto),
+                ]))
+        return series
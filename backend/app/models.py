@@ -1,7 +1,91 @@
 # --- base_conhecimento.py ---
+import functools
+import itertools
+import operator
+import sys
+from array import array
+from collections.abc import MutableMapping
+
+_OPERADORES_ORDEM = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+
+def _para_float(valor):
+    try:
+        return float(valor)
+    except (ValueError, TypeError):
+        return None
+
+
+def compilar_predicado(operador, alvo, tipo=None):
+    """Gera a função valor -> bool de uma condição, com o alvo já convertido.
+
+    O tipo vem da declaração da variável: em variáveis 'numerica' a igualdade
+    e o 'in' comparam números; nas demais, comparam o valor como informado.
+    """
+    numerica = tipo == "numerica"
+
+    if operador in ("==", "!="):
+        alvo_num = _para_float(alvo) if numerica else None
+        if alvo_num is None:
+            def igual(valor):
+                return valor == alvo
+        else:
+            def igual(valor):
+                valor_num = _para_float(valor)
+                return valor == alvo if valor_num is None else valor_num == alvo_num
+        if operador == "==":
+            return igual
+        return lambda valor: not igual(valor)
+
+    if operador in _OPERADORES_ORDEM:
+        comparar = _OPERADORES_ORDEM[operador]
+        alvo_num = _para_float(alvo)
+        if alvo_num is None:
+            return lambda valor: False
+
+        def ordem(valor):
+            valor_num = _para_float(valor)
+            return valor_num is not None and comparar(valor_num, alvo_num)
+        return ordem
+
+    if operador == "in":
+        # Aceita lista JSON ou texto separado por vírgulas ("Leve, Intensa")
+        itens = alvo if isinstance(alvo, (list, tuple, set)) else str(alvo).split(",")
+        textos = frozenset(str(i).strip() for i in itens)
+        if numerica:
+            numeros = frozenset(n for n in map(_para_float, textos) if n is not None)
+
+            def pertence(valor):
+                valor_num = _para_float(valor)
+                return valor_num in numeros if valor_num is not None else str(valor) in textos
+            return pertence
+        return lambda valor: str(valor) in textos
+
+    return lambda valor: False
+
+
+# Bases grandes repetem muito (operador, alvo, tipo); os predicados são puros
+@functools.lru_cache(maxsize=4096, typed=True)
+def _predicado_em_cache(operador, alvo, tipo):
+    return compilar_predicado(operador, alvo, tipo)
+
+
+
+def _internar(nome):
+    # Nomes de variáveis se repetem em todas as condições e sessões
+    return sys.intern(nome) if type(nome) is str else nome
 
 
 class Variavel:
+    __slots__ = (
+        "nome", "tipo", "valores_possiveis", "min_val", "max_val", "pergunta", "explicacao",
+    )
+
     def __init__(
         self,
         nome,
@@ -12,7 +96,7 @@ class Variavel:
         pergunta="",
         explicacao="",
     ):
-        self.nome = nome
+        self.nome = _internar(nome)
         self.tipo = tipo  # univalorada, multivalorada, numerica
         self.valores_possiveis = valores_possiveis or []
         self.min_val = min_val
@@ -33,11 +117,21 @@ class Variavel:
 
 
 class Condicao:
+    __slots__ = ("variavel", "operador", "valor", "fc", "avaliar")
+
     def __init__(self, variavel, operador, valor, fc=1.0):
-        self.variavel = variavel  # Nome da variável (string)
-        self.operador = operador  # ex: '==', '!=', '>', '<', 'in'
+        self.variavel = _internar(variavel)  # Nome da variável (string)
+        self.operador = _internar(operador)  # ex: '==', '!=', '>', '<', 'in'
         self.valor = valor
         self.fc = float(fc)
+        self.compilar()
+
+    def compilar(self, tipo=None):
+        """(Re)gera o predicado avaliar(valor) para o tipo da variável."""
+        try:
+            self.avaliar = _predicado_em_cache(self.operador, self.valor, tipo)
+        except TypeError:  # Alvo não hashable (lista do 'in')
+            self.avaliar = compilar_predicado(self.operador, self.valor, tipo)
 
     def __str__(self):
         return f"{self.variavel} {self.operador} {self.valor}"
@@ -52,11 +146,13 @@ class Condicao:
 
 
 class Regra:
+    __slots__ = ("nome", "condicoes_se", "conclusoes_entao")
+
     def __init__(self, nome, condicoes_se, conclusoes_entao):
         self.nome = nome
-        self.condicoes_se = condicoes_se  # Lista de objetos Condicao
-        self.conclusoes_entao = (
-            conclusoes_entao  # Lista de objetos Condicao (representando as conclusões)
+        self.condicoes_se = tuple(condicoes_se)  # Objetos Condicao
+        self.conclusoes_entao = tuple(
+            conclusoes_entao  # Objetos Condicao (representando as conclusões)
         )
 
     def __str__(self):
@@ -79,12 +175,158 @@ class BaseConhecimento:
         self.fatos = (
             {}
         )  # Dicionário para guardar os fatos conhecidos (ex: {'Idade': 25})
+        self.versao = 0  # Incrementada a cada alteração estrutural (invalida estruturas compiladas)
+        self.publicacao = 0  # Versão do base.kbc de onde a base veio (ver compilado.py)
+        # Índices variável -> regras (na ordem do arquivo de regras)
+        self.regras_por_conclusao = {}
+        self.regras_por_premissa = {}
+        # Nome de variável -> ID estável (posição nos arrays de FatosSessao)
+        self.ids_variaveis = {}
+        self._proximo_id = itertools.count()
+
+    def id_variavel(self, nome):
+        """ID da variável, criado na primeira vez que o nome aparece."""
+        id_var = self.ids_variaveis.get(nome)
+        if id_var is None:
+            # setdefault + count() mantém os IDs únicos mesmo entre threads
+            id_var = self.ids_variaveis.setdefault(_internar(nome), next(self._proximo_id))
+        return id_var
 
     def adicionar_regra(self, regra):
+        for cond in regra.condicoes_se:
+            cond.compilar(self._tipo_de(cond.variavel))
+            self.id_variavel(cond.variavel)
+        for conc in regra.conclusoes_entao:
+            self.id_variavel(conc.variavel)
         self.regras.append(regra)
+        self._indexar(self.regras_por_conclusao, regra, regra.conclusoes_entao)
+        self._indexar(self.regras_por_premissa, regra, regra.condicoes_se)
+        self.versao += 1
+
+    def remover_regra(self, regra):
+        self.regras.remove(regra)
+        self._desindexar(self.regras_por_conclusao, regra, regra.conclusoes_entao)
+        self._desindexar(self.regras_por_premissa, regra, regra.condicoes_se)
+        self.versao += 1
+
+    @staticmethod
+    def _indexar(indice, regra, condicoes):
+        for cond in condicoes:
+            lista = indice.setdefault(cond.variavel, [])
+            # A regra acabou de entrar no fim da lista; evita duplicá-la
+            if not lista or lista[-1] is not regra:
+                lista.append(regra)
+
+    @staticmethod
+    def _desindexar(indice, regra, condicoes):
+        for variavel in {cond.variavel for cond in condicoes}:
+            lista = indice.get(variavel, [])
+            if regra in lista:
+                lista.remove(regra)
+            if not lista:
+                indice.pop(variavel, None)
 
     def adicionar_variavel(self, variavel):
         self.variaveis[variavel.nome] = variavel
+        self.id_variavel(variavel.nome)
+        self.versao += 1  # O domínio mudou (ver analise.py)
+        # O tipo pode ter mudado: recompila as premissas que usam a variável
+        for regra in self.regras_por_premissa.get(variavel.nome, []):
+            for cond in regra.condicoes_se:
+                if cond.variavel == variavel.nome:
+                    cond.compilar(variavel.tipo)
+
+    def remover_variavel(self, nome):
+        """Tira a declaração da variável (o ID continua reservado para ela)."""
+        if self.variaveis.pop(nome, None) is None:
+            return
+        self.versao += 1
+        for regra in self.regras_por_premissa.get(nome, []):
+            for cond in regra.condicoes_se:
+                if cond.variavel == nome:
+                    cond.compilar(None)
+
+    def _tipo_de(self, nome_variavel):
+        variavel = self.variaveis.get(nome_variavel)
+        return variavel.tipo if variavel else None
+
+
+_AUSENTE = object()
+
+
+class FatosSessao(MutableMapping):
+    """Fatos (valor, cf) de uma sessão em arrays paralelos indexados pelo ID
+    da variável na base, em vez de um dict de tuplas.
+
+    Tem a interface de dict usada pelos motores: `fatos[var]` devolve
+    (valor, cf) e `fatos[var] = (valor, cf)` grava. Nomes que a base não
+    conhece (respostas a variáveis inexistentes, por exemplo) ficam num dict
+    da própria sessão: a base é compartilhada entre sessões e threads, e
+    registrar neles IDs novos a faria crescer a cada nome digitado.
+    """
+
+    __slots__ = ("_ids", "_valores", "_cfs", "_n", "_extras")
+
+    def __init__(self, bc: BaseConhecimento, fatos=None):
+        self._ids = bc.ids_variaveis
+        self._valores = []
+        self._cfs = array("d")
+        self._n = 0
+        self._extras = {}  # nome fora da base -> (valor, cf)
+        if fatos:
+            self.update(fatos)
+
+    def _posicao(self, variavel):
+        id_var = self._ids.get(variavel)
+        if id_var is None or id_var >= len(self._valores):
+            return None
+        return id_var if self._valores[id_var] is not _AUSENTE else None
+
+    def __contains__(self, variavel):
+        return self._posicao(variavel) is not None or variavel in self._extras
+
+    def __getitem__(self, variavel):
+        pos = self._posicao(variavel)
+        if pos is None:
+            return self._extras[variavel]
+        return self._valores[pos], self._cfs[pos]
+
+    def __setitem__(self, variavel, fato):
+        valor, cf = fato
+        id_var = self._ids.get(variavel)
+        if id_var is None:
+            self._extras[variavel] = (valor, cf)
+            return
+        falta = id_var + 1 - len(self._valores)
+        if falta > 0:
+            self._valores.extend([_AUSENTE] * falta)
+            self._cfs.extend([0.0] * falta)
+        if self._valores[id_var] is _AUSENTE:
+            self._n += 1
+        self._valores[id_var] = valor
+        self._cfs[id_var] = cf
+
+    def __delitem__(self, variavel):
+        pos = self._posicao(variavel)
+        if pos is None:
+            del self._extras[variavel]
+            return
+        self._valores[pos] = _AUSENTE
+        self._n -= 1
+
+    def __iter__(self):
+        # Cópia dos itens: a iteração não depende de ninguém mexer no dict da base
+        nomes = {id_var: nome for nome, id_var in tuple(self._ids.items()) if id_var < len(self._valores)}
+        for id_var, valor in enumerate(self._valores):
+            if valor is not _AUSENTE:
+                yield nomes[id_var]
+        yield from list(self._extras)
+
+    def __len__(self):
+        return self._n + len(self._extras)
+
+    def __repr__(self):
+        return f"FatosSessao({dict(self.items())!r})"
 
 
 # fim de models.py
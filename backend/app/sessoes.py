@@ -0,0 +1,368 @@
+# backend/app/sessoes.py
+# Sessões de consulta backward: uma por usuário, identificadas por um ID opaco.
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .inference_engine import MotorBackwardChaining
+from .utils import carregar_base_conhecimento
+
+try:
+    import fcntl
+except ImportError:  # Windows: o modo compartilhado serializa só dentro do processo
+    fcntl = None
+
+_ID_VALIDO = re.compile(r"^[0-9a-f]{32}$")
+
+
+class _Sessao:
+    def __init__(self, kb_name, motor, ultimo_acesso=None):
+        self.kb_name = kb_name
+        self.motor = motor
+        self.lock = threading.Lock()
+        self.ultimo_acesso = ultimo_acesso or time.time()
+        self.carimbo = None  # (inode, mtime, tamanho) do arquivo de onde veio
+
+
+class GerenciadorSessoes:
+    """Guarda as consultas em andamento, com TTL, LRU e limite de sessões vivas.
+
+    Cada sessão tem seu próprio lock: requisições da mesma sessão são
+    serializadas, as de sessões diferentes correm em paralelo. Com
+    `pasta_disco`, sessões que excedem o limite ou ficam ociosas por
+    `ocioso_para_disco` segundos vão para disco na forma compacta
+    (para_dict do motor; `restaurar` faz o caminho inverso) e voltam quando
+    usadas de novo.
+
+    Com `compartilhada`, a pasta é a fonte da verdade e vários processos
+    (workers do gunicorn) atendem as mesmas sessões: cada uso trava o
+    arquivo da sessão (flock), lê o estado do disco e o grava de volta ao
+    terminar. A memória vira só um cache, validado pelo carimbo do arquivo,
+    que evita reconstruir o motor quando a sessão volta ao mesmo processo.
+    """
+
+    def __init__(
+        self,
+        ttl=1800,
+        max_sessoes=1000,
+        pasta_disco=None,
+        ocioso_para_disco=None,
+        compartilhada=False,
+        restaurar=MotorBackwardChaining.de_dict,
+    ):
+        if compartilhada and not pasta_disco:
+            raise ValueError("Sessões compartilhadas precisam de uma pasta em disco.")
+        self.ttl = ttl
+        self.max_sessoes = max_sessoes
+        self.pasta_disco = pasta_disco
+        self.ocioso_para_disco = ocioso_para_disco
+        self.compartilhada = compartilhada
+        self.restaurar = restaurar
+        self._sessoes = OrderedDict()  # id -> _Sessao, da menos para a mais recente
+        self._lock = threading.Lock()
+        self._travas = [threading.Lock() for _ in range(64)]  # sem fcntl: por faixa de ID
+        self._ultima_varredura_disco = 0.0
+        if pasta_disco:
+            os.makedirs(pasta_disco, exist_ok=True)
+
+    def criar(self, kb_name, motor, sessao_id=None) -> str:
+        sessao_id = sessao_id or uuid.uuid4().hex
+        sessao = _Sessao(kb_name, motor)
+        if self.compartilhada:
+            self._salvar_em_disco(sessao_id, sessao)
+        with self._lock:
+            self._sessoes[sessao_id] = sessao
+        self.expurgar()
+        return sessao_id
+
+    @contextmanager
+    def usar(self, sessao_id):
+        """Entrega a sessão com o lock dela adquirido, ou None se não existe/expirou."""
+        if self.compartilhada:
+            with self._usar_compartilhada(sessao_id) as sessao:
+                yield sessao
+            return
+        while True:
+            sessao = self._obter(sessao_id)
+            if sessao is None:
+                yield None
+                return
+            with sessao.lock:
+                # expurgar() pode ter retirado a sessão (para disco ou por
+                # TTL) entre _obter e o lock; nesse caso ela é obtida de novo
+                with self._lock:
+                    vigente = self._sessoes.get(sessao_id) is sessao
+                if vigente:
+                    sessao.ultimo_acesso = time.time()
+                    yield sessao
+                    return
+
+    def remover(self, sessao_id):
+        if self.compartilhada and self._caminho(sessao_id):
+            with self._trava_arquivo(sessao_id):
+                self._remover(sessao_id)
+        else:
+            self._remover(sessao_id)
+
+    def expurgar(self):
+        """Descarta sessões expiradas e aplica o limite/ociosidade (indo a disco se houver)."""
+        agora = time.time()
+        if self.compartilhada:
+            # O disco já está em dia: só o cache em memória é aparado
+            with self._lock:
+                while len(self._sessoes) > self.max_sessoes:
+                    self._sessoes.popitem(last=False)
+            self._varrer_disco(agora)
+            return
+        para_disco = []
+        with self._lock:
+            for sessao_id, sessao in list(self._sessoes.items()):
+                ocioso = agora - sessao.ultimo_acesso
+                if ocioso > self.ttl:
+                    del self._sessoes[sessao_id]
+                elif self.ocioso_para_disco is not None and ocioso > self.ocioso_para_disco:
+                    para_disco.append(sessao_id)
+            excesso = len(self._sessoes) - len(para_disco) - self.max_sessoes
+            for sessao_id in self._sessoes:
+                if excesso <= 0:
+                    break
+                if sessao_id not in para_disco:
+                    para_disco.append(sessao_id)
+                    excesso -= 1
+            retiradas = []
+            for sessao_id in para_disco:
+                sessao = self._sessoes[sessao_id]
+                # Sessão em uso agora não é retirada; fica para a próxima varredura
+                if sessao.lock.acquire(blocking=False):
+                    del self._sessoes[sessao_id]
+                    retiradas.append((sessao_id, sessao))
+        for sessao_id, sessao in retiradas:
+            try:
+                self._salvar_em_disco(sessao_id, sessao)
+            finally:
+                sessao.lock.release()
+        self._varrer_disco(agora)
+
+    def estatisticas(self):
+        with self._lock:
+            em_memoria = len(self._sessoes)
+        em_disco = 0
+        if self.pasta_disco:
+            em_disco = sum(nome.endswith(".json") for nome in os.listdir(self.pasta_disco))
+        return {
+            "em_memoria": em_memoria,
+            "em_disco": em_disco,
+            "max_sessoes": self.max_sessoes,
+            "compartilhada": self.compartilhada,
+        }
+
+    # --- internos ---
+    @contextmanager
+    def _usar_compartilhada(self, sessao_id):
+        if self._caminho(sessao_id) is None:
+            yield None
+            return
+        with self._trava_arquivo(sessao_id):
+            sessao = self._carregar_compartilhada(sessao_id)
+            if sessao is None:
+                yield None
+                return
+            sessao.ultimo_acesso = time.time()
+            try:
+                yield sessao
+            finally:
+                # Grava mesmo se a requisição falhou: o motor em memória já
+                # pode ter mudado, e é esse estado que o próximo uso veria
+                self._salvar_em_disco(sessao_id, sessao)
+
+    def _carregar_compartilhada(self, sessao_id):
+        """Sessão vigente no disco; reaproveita o objeto em cache se o arquivo
+        ainda é o que este processo gravou/leu por último."""
+        try:
+            st = os.stat(self._caminho(sessao_id))
+        except FileNotFoundError:
+            with self._lock:
+                self._sessoes.pop(sessao_id, None)
+            return None
+        carimbo = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            sessao = self._sessoes.get(sessao_id)
+            if sessao is not None and sessao.carimbo == carimbo:
+                if time.time() - sessao.ultimo_acesso > self.ttl:
+                    self._remover(sessao_id)
+                    return None
+                self._sessoes.move_to_end(sessao_id)
+                return sessao
+        sessao = self._ler_do_disco(sessao_id, manter_arquivo=True)
+        if sessao is None:
+            return None
+        with self._lock:
+            self._sessoes[sessao_id] = sessao
+            self._sessoes.move_to_end(sessao_id)
+        self.expurgar()
+        return sessao
+
+    @contextmanager
+    def _trava_arquivo(self, sessao_id):
+        """Exclusão mútua entre processos sobre uma sessão (flock no arquivo
+        .trava dela); sem fcntl, só entre as threads deste processo."""
+        if fcntl is None:
+            with self._travas[int(sessao_id[:8], 16) % len(self._travas)]:
+                yield
+            return
+        # Cada abertura é uma descrição de arquivo própria, então o flock
+        # também exclui as threads deste processo entre si
+        with open(os.path.join(self.pasta_disco, f"{sessao_id}.trava"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _remover(self, sessao_id):
+        with self._lock:
+            self._sessoes.pop(sessao_id, None)
+        caminho = self._caminho(sessao_id)
+        if caminho:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+    def _obter(self, sessao_id):
+        if not sessao_id or not _ID_VALIDO.match(sessao_id):
+            return None
+        with self._lock:
+            sessao = self._sessoes.get(sessao_id)
+            if sessao is not None:
+                if time.time() - sessao.ultimo_acesso > self.ttl:
+                    del self._sessoes[sessao_id]
+                    return None
+                self._sessoes.move_to_end(sessao_id)
+                return sessao
+        sessao = self._ler_do_disco(sessao_id)
+        if sessao is None:
+            return None
+        # Conta como acesso; senão a própria varredura abaixo a devolveria ao disco
+        sessao.ultimo_acesso = time.time()
+        with self._lock:
+            # Outra requisição pode ter reidratado a mesma sessão antes
+            sessao = self._sessoes.setdefault(sessao_id, sessao)
+            self._sessoes.move_to_end(sessao_id)
+        self.expurgar()
+        return sessao
+
+    def _caminho(self, sessao_id):
+        if not self.pasta_disco or not _ID_VALIDO.match(sessao_id or ""):
+            return None
+        return os.path.join(self.pasta_disco, f"{sessao_id}.json")
+
+    def _salvar_em_disco(self, sessao_id, sessao):
+        caminho = self._caminho(sessao_id)
+        if caminho is None:
+            return  # Sem pasta configurada a sessão é simplesmente descartada
+        dados = {
+            "kb": sessao.kb_name,
+            "ultimo_acesso": sessao.ultimo_acesso,
+            "motor": sessao.motor.para_dict(),
+        }
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+        if self.compartilhada:
+            st = os.stat(caminho)
+            sessao.carimbo = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _ler_do_disco(self, sessao_id, manter_arquivo=False):
+        caminho = self._caminho(sessao_id)
+        if caminho is None:
+            return None
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                dados = json.load(f)
+            if not manter_arquivo:
+                os.remove(caminho)
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - dados["ultimo_acesso"] > self.ttl:
+            return None
+        bc = carregar_base_conhecimento(dados["kb"])
+        motor = self.restaurar(bc, dados["motor"])
+        sessao = _Sessao(dados["kb"], motor, dados["ultimo_acesso"])
+        sessao.carimbo = (st.st_ino, st.st_mtime_ns, st.st_size)
+        return sessao
+
+    def _varrer_disco(self, agora):
+        if self.pasta_disco and agora - self._ultima_varredura_disco > 60:
+            self._ultima_varredura_disco = agora
+            self._expurgar_disco(agora)
+
+    def _expurgar_disco(self, agora):
+        nomes = {n for n in os.listdir(self.pasta_disco) if n.endswith((".json", ".trava", ".tmp"))}
+        for nome in nomes:
+            caminho = os.path.join(self.pasta_disco, nome)
+            # A trava só sai junto com a sessão: o arquivo dela nunca é
+            # escrito, e apagá-lo com a sessão em uso quebraria a exclusão
+            if nome.endswith(".trava") and nome[:-6] + ".json" in nomes:
+                continue
+            try:
+                if agora - os.path.getmtime(caminho) > self.ttl:
+                    os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+
+class CanaisEventos:
+    """Filas dos canais de eventos (SSE) abertos, uma por sessão.
+
+    A resposta chega por POST numa thread e o resultado é publicado na fila;
+    a thread que mantém o canal aberto o transmite ao cliente, na ordem.
+
+    Cada canal prende uma thread do servidor enquanto a consulta dura, então
+    `max_canais` limita quantos ficam abertos ao mesmo tempo (deve ser bem
+    menor que o pool de threads, senão os POSTs que alimentam os canais não
+    têm thread para rodar). Com o limite atingido abrir() devolve None e o
+    cliente usa o modo de requisições.
+    """
+
+    def __init__(self, max_canais=None):
+        self.max_canais = max_canais
+        self._filas = {}  # sessao_id -> queue.SimpleQueue
+        self._lock = threading.Lock()
+
+    def abrir(self, sessao_id):
+        """Fila do novo canal, ou None se já há max_canais abertos."""
+        fila = queue.SimpleQueue()
+        with self._lock:
+            if self.max_canais is not None and len(self._filas) >= self.max_canais:
+                return None
+            self._filas[sessao_id] = fila
+        return fila
+
+    def __len__(self):
+        """Quantos canais estão abertos."""
+        with self._lock:
+            return len(self._filas)
+
+    def fechar(self, sessao_id, fila):
+        with self._lock:
+            if self._filas.get(sessao_id) is fila:
+                del self._filas[sessao_id]
+
+    def publicar(self, sessao_id, evento) -> bool:
+        """Entrega o evento ao canal da sessão; False se não há canal aberto."""
+        with self._lock:
+            fila = self._filas.get(sessao_id)
+        if fila is None:
+            return False
+        fila.put(evento)
+        return True
@@ -1,9 +1,94 @@
 import json
 import os
 import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from .compilado import carregar_compilado, compilar_base, versao_publicada
 from .models import BaseConhecimento, Variavel, Regra, Condicao
 
+try:
+    import fcntl
+except ImportError:  # Windows: as escritas ficam serializadas só dentro do processo
+    fcntl = None
+
 PASTA_DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+ARQUIVOS_KB = ('variaveis.json', 'regras.json')
+ARQUIVO_DIARIO = 'diario.jsonl'  # Edições ainda não compactadas no snapshot JSON
+MARCA_COMPACTACAO = '.compactando'  # Existe enquanto os .tmp do snapshot são promovidos
+ARQUIVO_TRAVA = '.trava'
+ARQUIVO_COMPILADO = 'base.kbc'  # Versão publicada de snapshot+diário (ver _publicar)
+DIARIO_MAX_BYTES = int(os.environ.get('KB_DIARIO_MAX_BYTES', str(256 * 1024)))
+
+# ------------------ CACHE DE BASES ------------------
+class CacheBases:
+    """Cache LRU (por processo) das bases já carregadas, indexado pelo nome da KB.
+
+    Uma entrada só é reaproveitada se a assinatura dos arquivos (mtime/tamanho)
+    e o contador de versão da KB forem os mesmos de quando ela foi lida.
+    """
+
+    def __init__(self, tamanho_max=8):
+        self.tamanho_max = tamanho_max
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()  # kb_name -> (assinatura, bc)
+        self._versoes = {}  # kb_name -> contador incrementado a cada escrita
+        self._lock = threading.Lock()
+
+    def assinatura(self, kb_name: str):
+        kb_path = _get_kb_path(kb_name)
+        partes = [self._versoes.get(kb_name, 0)]
+        try:
+            for arquivo in ARQUIVOS_KB:
+                st = os.stat(os.path.join(kb_path, arquivo))
+                partes.extend((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            return None
+        try:
+            st = os.stat(os.path.join(kb_path, ARQUIVO_DIARIO))
+            partes.extend((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            partes.extend((0, 0))
+        return tuple(partes)
+
+    def obter(self, kb_name: str, assinatura):
+        with self._lock:
+            item = self._itens.get(kb_name)
+            if item is not None and assinatura is not None and item[0] == assinatura:
+                self._itens.move_to_end(kb_name)
+                self.acertos += 1
+                return item[1]
+            self.falhas += 1
+            return None
+
+    def guardar(self, kb_name: str, assinatura, bc: BaseConhecimento):
+        if assinatura is None or self.tamanho_max <= 0:
+            return
+        with self._lock:
+            self._itens[kb_name] = (assinatura, bc)
+            self._itens.move_to_end(kb_name)
+            while len(self._itens) > self.tamanho_max:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, kb_name: str):
+        with self._lock:
+            self._versoes[kb_name] = self._versoes.get(kb_name, 0) + 1
+            self._itens.pop(kb_name, None)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "tamanho": len(self._itens),
+                "tamanho_max": self.tamanho_max,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                # Versão publicada (base.kbc) que este processo tem em memória
+                "publicacoes": {kb: bc.publicacao for kb, (_, bc) in self._itens.items()},
+            }
+
+
+cache_bases = CacheBases(tamanho_max=int(os.environ.get('KB_CACHE_TAMANHO', '8')))
 
 def _get_kb_path(kb_name: str):
     return os.path.join(PASTA_DATA, kb_name)
@@ -13,43 +98,292 @@ def listar_kbs():
         os.makedirs(PASTA_DATA)
     return [d for d in os.listdir(PASTA_DATA) if os.path.isdir(_get_kb_path(d))]
 
+# ------------------ TRAVA E ESCRITA ATÔMICA ------------------
+_travas = {}
+_travas_lock = threading.Lock()
+
+@contextmanager
+def _trava_kb(kb_name: str):
+    """Serializa leitores/escritores de uma KB: entre threads e, onde há fcntl,
+    entre processos (flock num arquivo de trava dentro da pasta da KB)."""
+    with _travas_lock:
+        trava = _travas.setdefault(kb_name, threading.Lock())
+    with trava:
+        kb_path = _get_kb_path(kb_name)
+        if fcntl is None or not os.path.isdir(kb_path):
+            yield
+            return
+        with open(os.path.join(kb_path, ARQUIVO_TRAVA), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _escrever_json(caminho: str, dados, indent=None):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _escrever_json_atomico(caminho: str, dados, indent=None):
+    _escrever_json(caminho + '.tmp', dados, indent)
+    os.replace(caminho + '.tmp', caminho)
+
 def criar_kb(kb_name: str):
     kb_path = _get_kb_path(kb_name)
     if os.path.exists(kb_path):
         return False, "Base de conhecimento já existe."
     os.makedirs(kb_path)
-    with open(os.path.join(kb_path, 'variaveis.json'), 'w', encoding='utf-8') as f: json.dump([], f)
-    with open(os.path.join(kb_path, 'regras.json'), 'w', encoding='utf-8') as f: json.dump([], f)
+    for arquivo in ARQUIVOS_KB:
+        _escrever_json_atomico(os.path.join(kb_path, arquivo), [])
+    cache_bases.invalidar(kb_name)
     return True, "Base de conhecimento criada."
 
-def carregar_base_conhecimento(kb_name: str) -> BaseConhecimento:
-    bc = BaseConhecimento()
+def carregar_base_conhecimento(kb_name: str, usar_cache: bool = True) -> BaseConhecimento:
+    """Carrega a KB. Com usar_cache=True a instância é compartilhada entre
+    requisições e não deve ser alterada; quem for editar deve pedir uma cópia
+    nova com usar_cache=False."""
+    if not usar_cache:
+        return _ler_base_conhecimento(kb_name)
+    assinatura = cache_bases.assinatura(kb_name)
+    bc = cache_bases.obter(kb_name, assinatura)
+    if bc is None:
+        bc = _ler_base_conhecimento(kb_name)
+        cache_bases.guardar(kb_name, assinatura, bc)
+    return bc
+
+def assinatura_kb(kb_name: str):
+    """Identifica o conteúdo atual da KB sem lê-la (muda a cada escrita; None
+    se a KB não existe). Vem só dos arquivos, sem o contador do cache, que é
+    por processo: todos os workers dão a mesma resposta (serve de ETag)."""
+    return _assinatura_fontes(_get_kb_path(kb_name))
+
+def _ler_base_conhecimento(kb_name: str) -> BaseConhecimento:
+    with _trava_kb(kb_name):
+        return _ler_snapshot_e_diario(kb_name)
+
+def _ler_snapshot_e_diario(kb_name: str) -> BaseConhecimento:
     kb_path = _get_kb_path(kb_name)
+    _recuperar_compactacao(kb_path)
+    fontes = _assinatura_fontes(kb_path)
+    compilado = os.path.join(kb_path, ARQUIVO_COMPILADO)
+    if fontes is not None:
+        bc = carregar_compilado(compilado, fontes)
+        if bc is not None:
+            return bc
+    variaveis, regras = [], []
     try:
         with open(os.path.join(kb_path, 'variaveis.json'), 'r', encoding='utf-8') as f:
-            for v_data in json.load(f):
-                bc.adicionar_variavel(Variavel(**v_data))
+            variaveis = json.load(f)
         with open(os.path.join(kb_path, 'regras.json'), 'r', encoding='utf-8') as f:
-            for r_data in json.load(f):
-                se = [Condicao(**c) for c in r_data.get('condicoes_se', [])]
-                entao = [Condicao(**c) for c in r_data.get('conclusoes_entao', [])]
-                bc.adicionar_regra(Regra(r_data['nome'], se, entao))
+            regras = json.load(f)
     except FileNotFoundError:
         print(f"Aviso: KB '{kb_name}' não encontrada ou arquivos faltando.")
+    bc = base_de_dicts(variaveis, regras)
+    for edicao in _ler_diario(kb_path):
+        aplicar_edicao(bc, edicao)
+    _publicar(kb_path, bc)
+    return bc
+
+def _publicar(kb_path: str, bc: BaseConhecimento):
+    """Grava `bc` como nova versão do base.kbc (número de publicação + 1).
+
+    Quem primeiro lê fontes novas (ou compacta/salva a base) publica sob a
+    trava da KB; os demais processos, ao notar pela assinatura que as fontes
+    mudaram, carregam o arquivo publicado em vez de reler os JSON e
+    reaplicar o diário, e todos reportam o mesmo número de versão. Cada
+    processo ainda monta seus próprios objetos a partir dele: a memória só
+    é compartilhada pelo pré-carregamento no mestre (run.preparar_workers).
+    A troca é um os.replace, então quem já está lendo continua na versão
+    anterior.
+    """
+    fontes = _assinatura_fontes(kb_path)
+    if fontes is None:
+        return
+    compilado = os.path.join(kb_path, ARQUIVO_COMPILADO)
+    versao = versao_publicada(compilado) + 1
+    try:
+        compilar_base(bc, compilado, fontes, versao)
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar '{compilado}': {e}")
+        return
+    bc.publicacao = versao
+
+def _assinatura_fontes(kb_path: str):
+    """mtime/tamanho de variaveis.json, regras.json e do diário (None se faltar
+    o snapshot): o arquivo compilado só vale para essas mesmas fontes."""
+    partes = []
+    for arquivo in (*ARQUIVOS_KB, ARQUIVO_DIARIO):
+        try:
+            st = os.stat(os.path.join(kb_path, arquivo))
+        except FileNotFoundError:
+            if arquivo != ARQUIVO_DIARIO:
+                return None
+            partes.extend((0, 0))
+            continue
+        partes.extend((st.st_mtime_ns, st.st_size))
+    return tuple(partes)
+
+def base_de_dicts(variaveis, regras, fatos=None) -> BaseConhecimento:
+    """Monta a base a partir das listas de dicts dos arquivos JSON."""
+    bc = BaseConhecimento()
+    for v_data in variaveis:
+        bc.adicionar_variavel(Variavel(**v_data))
+    for r_data in regras:
+        bc.adicionar_regra(_regra_de_dict(r_data))
+    bc.fatos.update(fatos or {})
     return bc
 
+def _regra_de_dict(r_data) -> Regra:
+    se = [Condicao(**c) for c in r_data.get('condicoes_se', [])]
+    entao = [Condicao(**c) for c in r_data.get('conclusoes_entao', [])]
+    return Regra(r_data['nome'], se, entao)
+
+def base_para_dicts(bc: BaseConhecimento):
+    """Forma compacta e serializável (pickle/JSON) da base; inverso de base_de_dicts.
+
+    A BaseConhecimento em si não é serializável com pickle porque os
+    predicados compilados são closures.
+    """
+    return (
+        [v.to_dict() for v in bc.variaveis.values()],
+        [r.to_dict() for r in bc.regras],
+        dict(bc.fatos),
+    )
+
+# ------------------ DIÁRIO DE EDIÇÕES ------------------
+def aplicar_edicao(bc: BaseConhecimento, edicao: dict):
+    """Aplica à base uma edição no formato do diário (ver registrar_edicoes)."""
+    op = edicao['op']
+    if op == 'adicionar_variavel':
+        bc.adicionar_variavel(Variavel(**edicao['dados']))
+    elif op == 'remover_variavel':
+        bc.remover_variavel(edicao['nome'])
+    elif op == 'adicionar_regra':
+        bc.adicionar_regra(_regra_de_dict(edicao['dados']))
+    elif op == 'remover_regra':
+        regra = next((r for r in bc.regras if r.nome == edicao['nome']), None)
+        if regra is not None:
+            bc.remover_regra(regra)
+    else:
+        raise ValueError(f"Edição desconhecida: {op!r}")
+
+def registrar_edicoes(kb_name: str, *edicoes: dict):
+    """Acrescenta edições ao diário da KB em vez de reescrever os JSON.
+
+    Cada edição é um dict com 'op' ('adicionar_variavel' ou 'adicionar_regra'
+    com 'dados' = to_dict(); 'remover_variavel' ou 'remover_regra' com
+    'nome') e vira uma linha do diario.jsonl, gravada com fsync. Quando o
+    diário passa de DIARIO_MAX_BYTES ele é compactado no snapshot.
+
+    A base não é relida aqui: a nova versão do base.kbc é publicada pelo
+    primeiro leitor que notar as fontes mudadas (ver _ler_snapshot_e_diario),
+    e os demais processos mapeiam o arquivo que ele gravou.
+    """
+    kb_path = _get_kb_path(kb_name)
+    os.makedirs(kb_path, exist_ok=True)
+    with _trava_kb(kb_name):
+        _recuperar_compactacao(kb_path)
+        caminho = os.path.join(kb_path, ARQUIVO_DIARIO)
+        _descartar_linha_incompleta(caminho)
+        with open(caminho, 'a', encoding='utf-8') as f:
+            for edicao in edicoes:
+                f.write(json.dumps(edicao, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.getsize(caminho) > DIARIO_MAX_BYTES:
+            bc = _ler_snapshot_e_diario(kb_name)
+            _gravar_snapshot(kb_path, bc)
+            _publicar(kb_path, bc)
+    cache_bases.invalidar(kb_name)
+
+def compactar_base(kb_name: str):
+    """Incorpora o diário ao snapshot JSON (variaveis.json/regras.json)."""
+    kb_path = _get_kb_path(kb_name)
+    with _trava_kb(kb_name):
+        if _ler_diario(kb_path):
+            bc = _ler_snapshot_e_diario(kb_name)
+            _gravar_snapshot(kb_path, bc)
+            _publicar(kb_path, bc)
+    cache_bases.invalidar(kb_name)
+
 def salvar_base_conhecimento(kb_name: str, bc: BaseConhecimento):
+    """Grava a base inteira como novo snapshot (substitui também o diário)."""
     kb_path = _get_kb_path(kb_name)
-    if not os.path.exists(kb_path):
-        os.makedirs(kb_path)
-    with open(os.path.join(kb_path, 'variaveis.json'), 'w', encoding='utf-8') as f:
-        json.dump([v.to_dict() for v in bc.variaveis.values()], f, indent=4, ensure_ascii=False)
-    with open(os.path.join(kb_path, 'regras.json'), 'w', encoding='utf-8') as f:
-        json.dump([r.to_dict() for r in bc.regras], f, indent=4, ensure_ascii=False)
+    os.makedirs(kb_path, exist_ok=True)
+    with _trava_kb(kb_name):
+        _recuperar_compactacao(kb_path)
+        _gravar_snapshot(kb_path, bc)
+        _publicar(kb_path, bc)
+    cache_bases.invalidar(kb_name)
+
+def _ler_diario(kb_path: str):
+    try:
+        with open(os.path.join(kb_path, ARQUIVO_DIARIO), 'r', encoding='utf-8') as f:
+            linhas = f.read().split('\n')
+    except FileNotFoundError:
+        return []
+    edicoes = []
+    for i, linha in enumerate(linhas):
+        if not linha.strip():
+            continue
+        try:
+            edicoes.append(json.loads(linha))
+        except ValueError:
+            # Só a última linha pode estar truncada (queda durante a escrita)
+            if i != len(linhas) - 1:
+                raise
+    return edicoes
+
+def _descartar_linha_incompleta(caminho: str):
+    try:
+        with open(caminho, 'rb+') as f:
+            conteudo = f.read()
+            if conteudo and not conteudo.endswith(b'\n'):
+                f.truncate(conteudo.rfind(b'\n') + 1)
+    except FileNotFoundError:
+        pass
+
+def _gravar_snapshot(kb_path: str, bc: BaseConhecimento):
+    """Troca o snapshot e zera o diário como uma operação só.
+
+    Os novos JSON são gravados em .tmp e só então a marca de compactação é
+    criada; com a marca presente, _recuperar_compactacao conclui a troca
+    (mesmo após uma queda) em vez de reaplicar o diário sobre o snapshot novo.
+    """
+    _escrever_json(os.path.join(kb_path, 'variaveis.json.tmp'),
+                   [v.to_dict() for v in bc.variaveis.values()], indent=4)
+    _escrever_json(os.path.join(kb_path, 'regras.json.tmp'),
+                   [r.to_dict() for r in bc.regras], indent=4)
+    _escrever_json_atomico(os.path.join(kb_path, MARCA_COMPACTACAO), {})
+    _concluir_compactacao(kb_path)
+
+def _concluir_compactacao(kb_path: str):
+    for arquivo in ARQUIVOS_KB:
+        caminho = os.path.join(kb_path, arquivo)
+        if os.path.exists(caminho + '.tmp'):
+            os.replace(caminho + '.tmp', caminho)
+    diario = os.path.join(kb_path, ARQUIVO_DIARIO)
+    if os.path.exists(diario):
+        os.remove(diario)
+    os.remove(os.path.join(kb_path, MARCA_COMPACTACAO))
+
+def _recuperar_compactacao(kb_path: str):
+    if os.path.exists(os.path.join(kb_path, MARCA_COMPACTACAO)):
+        _concluir_compactacao(kb_path)
+        return
+    # Snapshot interrompido antes da marca: os .tmp não valem nada
+    for arquivo in ARQUIVOS_KB:
+        tmp = os.path.join(kb_path, arquivo + '.tmp')
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
 def deletar_kb(kb_name: str):
     kb_path = _get_kb_path(kb_name)
     if not os.path.exists(kb_path):
         return False, "Base não encontrada."
-    shutil.rmtree(kb_path)
+    with _trava_kb(kb_name):
+        shutil.rmtree(kb_path)
+    cache_bases.invalidar(kb_name)
     return True, "Base removida."
\ No newline at end of file
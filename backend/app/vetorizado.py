@@ -0,0 +1,187 @@
+# backend/app/vetorizado.py
+# Encadeamento para frente vetorizado (NumPy) sobre dados em colunas.
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: só este modo depende dele
+    np = None
+
+from .analise import regras_de_trabalho
+from .models import BaseConhecimento, _para_float
+
+
+class _Coluna:
+    """Valores de uma variável para todas as linhas, codificados.
+
+    Cada valor distinto recebe um código (índice em `vocab`); -1 marca linhas
+    sem fato. Assim cada predicado compilado é avaliado uma vez por valor
+    distinto e a máscara da condição sai de uma indexação da tabela.
+    """
+
+    def __init__(self, valores):
+        arr = np.asarray(valores)
+        if arr.ndim != 1:
+            raise ValueError("Cada coluna deve ser unidimensional.")
+        if arr.dtype.kind in "fiub":
+            presentes = ~np.isnan(arr) if arr.dtype.kind == "f" else np.ones(len(arr), bool)
+            unicos, inverso = np.unique(arr[presentes], return_inverse=True)
+            self.vocab = unicos.tolist()
+            self.vocab_num = unicos.astype(float)
+            self.codigos = np.full(len(arr), -1, dtype=np.int64)
+            self.codigos[presentes] = inverso
+        else:
+            self.vocab = []
+            self.vocab_num = None
+            indice = {}
+            codigos = np.empty(len(arr), dtype=np.int64)
+            for i, valor in enumerate(arr.tolist()):
+                if valor is None or (isinstance(valor, float) and valor != valor):
+                    codigos[i] = -1  # None ou NaN (coluna de objetos, ex. strings do pandas)
+                    continue
+                codigo = indice.get(valor)
+                if codigo is None:
+                    codigo = indice[valor] = len(self.vocab)
+                    self.vocab.append(valor)
+                codigos[i] = codigo
+            self.codigos = codigos
+        self._indice = {valor: i for i, valor in enumerate(self.vocab)}
+        self._tabelas = {}  # id(condicao) -> (condicao, tabela booleana por código)
+
+    @classmethod
+    def vazia(cls, n):
+        return cls(np.full(n, None, dtype=object))
+
+    def codigo(self, valor):
+        codigo = self._indice.get(valor)
+        if codigo is None:
+            codigo = self._indice[valor] = len(self.vocab)
+            self.vocab.append(valor)
+            if self.vocab_num is not None:
+                num = _para_float(valor)
+                self.vocab_num = np.append(self.vocab_num, np.nan if num is None else num)
+        return codigo
+
+    def tabela(self, condicao):
+        """Resultado do predicado para cada código; a última posição (código -1)
+        é sempre False."""
+        _, tabela = self._tabelas.get(id(condicao), (condicao, None))
+        feitos = 0 if tabela is None else len(tabela) - 1
+        if tabela is not None and feitos == len(self.vocab):
+            return tabela
+        if self.vocab_num is not None and condicao.operador in (">", "<", ">=", "<="):
+            # Mesma semântica do predicado compilado, sem laço em Python
+            alvo = _para_float(condicao.valor)
+            novos = self.vocab_num[feitos:]
+            if alvo is None:
+                parte = np.zeros(len(novos), bool)
+            else:
+                with np.errstate(invalid="ignore"):
+                    parte = {
+                        ">": np.greater,
+                        "<": np.less,
+                        ">=": np.greater_equal,
+                        "<=": np.less_equal,
+                    }[condicao.operador](novos, alvo)
+        else:
+            parte = np.fromiter(
+                (bool(condicao.avaliar(v)) for v in self.vocab[feitos:]),
+                dtype=bool,
+                count=len(self.vocab) - feitos,
+            )
+        base = np.zeros(0, bool) if tabela is None else tabela[:-1]
+        tabela = np.concatenate([base, parte, [False]])
+        self._tabelas[id(condicao)] = (condicao, tabela)
+        return tabela
+
+    def valores(self):
+        vocab = np.empty(len(self.vocab) + 1, dtype=object)
+        vocab[:-1] = self.vocab
+        vocab[-1] = None
+        return vocab[self.codigos]
+
+
+class ResultadoVetorizado:
+    def __init__(self, n_linhas, colunas, eventos, passos):
+        self.n_linhas = n_linhas
+        self.colunas = colunas  # variavel -> array (object) de valores, None = sem fato
+        self.passos = passos
+        self._eventos = eventos  # [(nome_regra, linhas_alteradas)] em ordem de disparo
+
+    def fatos(self, linha):
+        """Fatos da linha, no mesmo formato de MotorForwardChaining.encadear()."""
+        return {
+            var: valores[linha]
+            for var, valores in self.colunas.items()
+            if valores[linha] is not None
+        }
+
+    def regras_por_linha(self):
+        """Lista de regras disparadas por linha (equivale a explicacao_como)."""
+        listas = [[] for _ in range(self.n_linhas)]
+        for nome, linhas in self._eventos:
+            for linha in linhas.tolist():
+                listas[linha].append(nome)
+        return listas
+
+
+class MotorForwardVetorizado:
+    """Modo colunar do MotorForwardChaining.
+
+    Recebe um array por variável (todas com o mesmo número de linhas; NaN ou
+    None indicam fato ausente) e avalia cada condição como máscara sobre as
+    linhas. Cada passo percorre as regras na ordem da base, como o motor
+    escalar, mas só sobre as linhas que mudaram no passo anterior.
+    """
+
+    def __init__(self, bc: BaseConhecimento, max_passos=None):
+        if np is None:
+            raise RuntimeError("O modo vetorizado requer NumPy (pip install numpy).")
+        self.bc = bc
+        self.max_passos = max_passos
+
+    def encadear(self, colunas: dict) -> ResultadoVetorizado:
+        tamanhos = {len(valores) for valores in colunas.values()}
+        if len(tamanhos) > 1:
+            raise ValueError("Todas as colunas devem ter o mesmo número de linhas.")
+        n = tamanhos.pop() if tamanhos else 0
+        estado = {var: _Coluna(valores) for var, valores in colunas.items()}
+        for var, val in self.bc.fatos.items():
+            if var not in estado:
+                estado[var] = _Coluna(np.full(n, val, dtype=object))
+
+        def coluna(var):
+            if var not in estado:
+                estado[var] = _Coluna.vazia(n)
+            return estado[var]
+
+        eventos = []
+        linhas = np.arange(n)
+        passos = 0
+        regras, _ = regras_de_trabalho(self.bc)
+        while len(linhas) and (self.max_passos is None or passos < self.max_passos):
+            passos += 1
+            alteradas = np.zeros(n, bool)
+            for regra in regras:
+                mascara = np.ones(len(linhas), bool)
+                for cond in regra.condicoes_se:
+                    col = coluna(cond.variavel)
+                    mascara &= col.tabela(cond)[col.codigos[linhas]]
+                    if not mascara.any():
+                        break
+                if not mascara.any():
+                    continue
+                satisfeitas = linhas[mascara]
+                # Aplica conclusões ENTÃO
+                for conc in regra.conclusoes_entao:
+                    col = coluna(conc.variavel)
+                    codigo = col.codigo(conc.valor)
+                    mudam = satisfeitas[col.codigos[satisfeitas] != codigo]
+                    if len(mudam):
+                        col.codigos[mudam] = codigo
+                        eventos.append((regra.nome, mudam))
+                        alteradas[mudam] = True
+            linhas = np.flatnonzero(alteradas)
+
+        return ResultadoVetorizado(
+            n, {var: col.valores() for var, col in estado.items()}, eventos, passos
+        )
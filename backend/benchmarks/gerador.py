@@ -0,0 +1,117 @@
+# backend/benchmarks/gerador.py
+# Gerador de bases sintéticas para os benchmarks dos motores.
+
+import random
+
+VALORES_CATEGORICOS = ("a", "b", "c", "d")
+MIX_PADRAO = {"==": 0.5, "!=": 0.1, ">": 0.15, "<=": 0.1, "in": 0.15}
+_ORDEM = (">", "<", ">=", "<=")
+
+
+def ler_mix(texto):
+    """'==:0.5,>:0.3,in:0.2' -> {'==': 0.5, '>': 0.3, 'in': 0.2}"""
+    mix = {}
+    for parte in texto.split(","):
+        operador, _, peso = parte.strip().rpartition(":")
+        mix[operador] = float(peso)
+    return mix
+
+
+class BaseSintetica:
+    """Base em camadas: a camada 0 são as perguntas; cada regra conclui uma
+    variável da camada L a partir de `fan_in` premissas de camadas
+    anteriores (ao menos uma da camada L-1, para a cadeia ter a profundidade
+    pedida). Todas as regras de uma mesma variável concluem o mesmo valor,
+    então o encadeamento para frente sempre atinge um ponto fixo.
+    """
+
+    def __init__(
+        self,
+        regras=1000,
+        profundidade=4,
+        fan_in=3,
+        entradas=None,
+        mix_operadores=None,
+        cf=(1.0, 1.0),
+        semente=0,
+    ):
+        rnd = random.Random(semente)
+        mix = mix_operadores or MIX_PADRAO
+        operadores, pesos = list(mix), list(mix.values())
+        por_camada = max(1, regras // (profundidade * 3))
+        entradas = entradas or max(fan_in, por_camada)
+
+        # (nome, numerica?) por camada; o valor concluído por variável
+        self.camadas = [[(f"E{i}", i % 2 == 0) for i in range(entradas)]]
+        self.conclusao = {}
+        for c in range(1, profundidade + 1):
+            camada = [(f"C{c}_{i}", False) for i in range(por_camada)]
+            self.camadas.append(camada)
+            for nome, _ in camada:
+                self.conclusao[nome] = rnd.choice(VALORES_CATEGORICOS)
+        self.entradas = [nome for nome, _ in self.camadas[0]]
+        self.objetivos = [nome for nome, _ in self.camadas[-1]]
+
+        self.variaveis = []
+        for c, camada in enumerate(self.camadas):
+            for nome, numerica in camada:
+                self.variaveis.append({
+                    "nome": nome,
+                    "tipo": "numerica" if numerica else "univalorada",
+                    "valores_possiveis": [] if numerica else list(VALORES_CATEGORICOS),
+                    "min_val": 0 if numerica else None,
+                    "max_val": 100 if numerica else None,
+                    "pergunta": f"Valor de {nome}?" if c == 0 else "",
+                    "explicacao": "",
+                })
+
+        self.regras = []
+        for i in range(regras):
+            c = 1 + i % profundidade
+            alvo, _ = rnd.choice(self.camadas[c])
+            anteriores = [v for camada in self.camadas[:c] for v in camada]
+            premissas = [rnd.choice(self.camadas[c - 1])]
+            premissas += rnd.sample(anteriores, min(fan_in - 1, len(anteriores)))
+            condicoes, vistas = [], set()
+            for nome, numerica in premissas:
+                if nome in vistas:
+                    continue
+                vistas.add(nome)
+                condicoes.append(self._condicao(rnd, nome, numerica, operadores, pesos))
+            self.regras.append({
+                "nome": f"R{i}",
+                "condicoes_se": condicoes,
+                "conclusoes_entao": [{
+                    "variavel": alvo,
+                    "operador": "==",
+                    "valor": self.conclusao[alvo],
+                    "fc": round(rnd.uniform(*cf), 3),
+                }],
+            })
+
+    def _condicao(self, rnd, nome, numerica, operadores, pesos):
+        operador = rnd.choices(operadores, pesos)[0]
+        if numerica:
+            if operador == "in":
+                valor = [rnd.randrange(100) for _ in range(3)]
+            else:
+                valor = rnd.randrange(100)
+        else:
+            if operador in _ORDEM:
+                operador = "=="
+            # Variáveis concluídas só assumem o valor das suas regras
+            possiveis = (self.conclusao[nome],) if nome in self.conclusao else VALORES_CATEGORICOS
+            if operador == "in":
+                valor = rnd.sample(VALORES_CATEGORICOS, 2)
+            else:
+                valor = rnd.choice(possiveis)
+        return {"variavel": nome, "operador": operador, "valor": valor, "fc": 1.0}
+
+    def casos(self, n, semente=1):
+        """Fatos de entrada (camada 0) para n consultas."""
+        rnd = random.Random(semente)
+        for _ in range(n):
+            yield {
+                nome: rnd.randrange(100) if numerica else rnd.choice(VALORES_CATEGORICOS)
+                for nome, numerica in self.camadas[0]
+            }
@@ -0,0 +1,59 @@
+# backend/benchmarks/memoria_sessoes.py
+# Memória por sessão backward: FatosSessao (arrays por ID) x dict de tuplas.
+#
+# Uso (a partir de backend/): python -m benchmarks.memoria_sessoes [--sessoes N]
+
+import argparse
+import gc
+import tracemalloc
+
+from app.inference_engine import MotorBackwardChaining
+from app.utils import base_de_dicts
+
+from .gerador import BaseSintetica
+
+
+def medir(criar, n_sessoes):
+    """Bytes alocados por sessão (tracemalloc), mantendo todas vivas."""
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    sessoes = [criar(i) for i in range(n_sessoes)]
+    depois = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(s.size_diff for s in depois.compare_to(antes, "filename"))
+    del sessoes
+    return total / n_sessoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessoes", type=int, default=2000)
+    parser.add_argument("--regras", type=int, default=600)
+    parser.add_argument("--fatos", type=int, default=50, help="fatos por sessão")
+    args = parser.parse_args()
+
+    base = BaseSintetica(regras=args.regras)
+    bc = base_de_dicts(base.variaveis, base.regras)
+    nomes = list(bc.variaveis)[:args.fatos]
+
+    def sessao_motor(semente):
+        motor = MotorBackwardChaining(bc)
+        for nome in nomes:
+            motor.fatos_sessao[nome] = (semente, 0.8)
+        return motor
+
+    def sessao_dict(semente):
+        motor = MotorBackwardChaining(bc)
+        motor.fatos_sessao = {nome: (semente, 0.8) for nome in nomes}
+        return motor
+
+    por_sessao = medir(sessao_motor, args.sessoes)
+    por_sessao_dict = medir(sessao_dict, args.sessoes)
+    print(f"{args.sessoes} sessões, {len(nomes)} fatos cada ({len(bc.variaveis)} variáveis na base)")
+    print(f"  FatosSessao:     {por_sessao:10.0f} bytes/sessão")
+    print(f"  dict de tuplas:  {por_sessao_dict:10.0f} bytes/sessão")
+
+
+if __name__ == "__main__":
+    main()
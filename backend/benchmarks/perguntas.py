@@ -0,0 +1,96 @@
+# backend/benchmarks/perguntas.py
+# Perguntas feitas por consulta backward em cada estratégia de ordenação.
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.perguntas                 # KBs de backend/data
+#   python -m benchmarks.perguntas --sintetica 600 # base gerada
+#   python -m benchmarks.perguntas --top-k 1       # objetivo ranqueado, com poda
+
+import argparse
+import random
+
+from app.inference_engine import ESTRATEGIAS_PERGUNTA, MotorBackwardChaining
+from app.utils import base_de_dicts, carregar_base_conhecimento, listar_kbs
+
+from .gerador import BaseSintetica
+
+
+class Respostas:
+    """Valor oculto de cada variável num caso, sorteado sob demanda entre os
+    valores possíveis: as duas estratégias respondem ao mesmo "mundo"."""
+
+    def __init__(self, bc, semente):
+        self.bc = bc
+        self.semente = semente
+        self.valores = {}
+
+    def __call__(self, nome):
+        if nome not in self.valores:
+            rnd = random.Random(f"{self.semente}:{nome}")
+            variavel = self.bc.variaveis.get(nome)
+            if variavel and variavel.valores_possiveis:
+                self.valores[nome] = rnd.choice(variavel.valores_possiveis)
+            else:
+                minimo = variavel.min_val if variavel and variavel.min_val is not None else 0
+                maximo = variavel.max_val if variavel and variavel.max_val is not None else 100
+                self.valores[nome] = rnd.randint(int(minimo), int(maximo))
+        return self.valores[nome]
+
+
+def consultar(bc, objetivo, respostas, estrategia, limite=500, **ranking):
+    motor = MotorBackwardChaining(bc, estrategia=estrategia, **ranking)
+    resultado = motor.provar_objetivo(objetivo)
+    n = 0
+    while resultado["tipo"] == "pergunta" and n < limite:
+        n += 1
+        resultado = motor.adicionar_resposta(resultado["variavel"], respostas(resultado["variavel"]))
+    return n, resultado.get("valor")
+
+
+def comparar(bc, objetivos, casos, **ranking):
+    medias = {e: 0.0 for e in ESTRATEGIAS_PERGUNTA}
+    iguais = total = 0
+    for caso in range(casos):
+        for objetivo in objetivos:
+            respostas = Respostas(bc, caso)
+            valores = set()
+            for estrategia in ESTRATEGIAS_PERGUNTA:
+                n, valor = consultar(bc, objetivo, respostas, estrategia, **ranking)
+                medias[estrategia] += n
+                valores.add(repr(valor))
+            total += 1
+            iguais += len(valores) == 1
+    return {e: soma / total for e, soma in medias.items()}, iguais / total if total else 1.0
+
+
+def imprimir(nome, medias, concordancia):
+    colunas = "  ".join(f"{e} {m:6.2f}" for e, m in medias.items())
+    print(f"  {nome:24s} perguntas/consulta: {colunas}   mesmo resultado {concordancia:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perguntas por consulta em cada estratégia.")
+    parser.add_argument("--casos", type=int, default=50)
+    parser.add_argument("--sintetica", type=int, default=0, help="regras da base gerada (0 = KBs reais)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--top-k", type=int, default=None, help="ranqueia o objetivo (ver MotorBackwardChaining)")
+    parser.add_argument("--cf-minimo", type=float, default=None)
+    args = parser.parse_args()
+    ranking = {"top_k": args.top_k, "cf_minimo": args.cf_minimo}
+
+    if args.sintetica:
+        base = BaseSintetica(regras=args.sintetica, semente=args.semente)
+        bases = [("sintetica", base_de_dicts(base.variaveis, base.regras))]
+    else:
+        bases = [(kb, carregar_base_conhecimento(kb)) for kb in listar_kbs()]
+    for nome, bc in bases:
+        # Objetivos: variáveis concluídas que não são premissa de nenhuma regra
+        objetivos = [v for v in bc.regras_por_conclusao if v not in bc.regras_por_premissa]
+        objetivos = objetivos or list(bc.regras_por_conclusao)
+        if not objetivos:
+            continue
+        imprimir(nome, *comparar(bc, objetivos[:10], args.casos, **ranking))
+
+
+if __name__ == "__main__":
+    main()
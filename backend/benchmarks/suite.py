@@ -0,0 +1,215 @@
+# backend/benchmarks/suite.py
+# Benchmarks de carga, encadeamento para frente e consultas backward.
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.suite --regras 5000 --saida resultado.json
+#   python -m benchmarks.suite --regras 5000 --comparar resultado.json
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from app import utils
+from app.inference_engine import MotorBackwardChaining, MotorForwardChaining
+from app.utils import base_de_dicts, carregar_base_conhecimento
+
+from .gerador import BaseSintetica, ler_mix
+
+KB_BENCH = "bench"
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    k = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[k]
+
+
+def medir(operacao, entradas, memoria=True):
+    """Roda `operacao` para cada entrada; latências em ms, vazão em ops/s e
+    pico de memória (tracemalloc, numa segunda passada para não distorcer o tempo)."""
+    entradas = list(entradas)
+    latencias = []
+    inicio = time.perf_counter()
+    for entrada in entradas:
+        t0 = time.perf_counter()
+        operacao(entrada)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    resultado = {
+        "n": len(entradas),
+        "p50_ms": percentil(latencias, 50),
+        "p90_ms": percentil(latencias, 90),
+        "p99_ms": percentil(latencias, 99),
+        "max_ms": latencias[-1] if latencias else 0.0,
+        "ops_por_s": len(entradas) / total if total else 0.0,
+    }
+    if memoria:
+        tracemalloc.start()
+        for entrada in entradas:
+            operacao(entrada)
+        resultado["pico_memoria_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return resultado
+
+
+def bench_carga(base, repeticoes, memoria):
+    pasta = tempfile.mkdtemp(prefix="kb_bench_")
+    pasta_original = utils.PASTA_DATA
+    utils.PASTA_DATA = pasta
+    try:
+        utils.criar_kb(KB_BENCH)
+        kb_path = os.path.join(pasta, KB_BENCH)
+        for arquivo, dados in (("variaveis.json", base.variaveis), ("regras.json", base.regras)):
+            with open(os.path.join(kb_path, arquivo), "w", encoding="utf-8") as f:
+                json.dump(dados, f, indent=4, ensure_ascii=False)
+
+        def carga_json(_):
+            compilado = os.path.join(kb_path, utils.ARQUIVO_COMPILADO)
+            if os.path.exists(compilado):
+                os.remove(compilado)
+            carregar_base_conhecimento(KB_BENCH, usar_cache=False)
+
+        def carga_compilada(_):
+            carregar_base_conhecimento(KB_BENCH, usar_cache=False)
+
+        return {
+            "carga_json": medir(carga_json, range(repeticoes), memoria),
+            "carga_compilada": medir(carga_compilada, range(repeticoes), memoria),
+        }
+    finally:
+        utils.PASTA_DATA = pasta_original
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def bench_forward(bc, casos, memoria, objetivos=None):
+    def encadear(fatos):
+        motor = MotorForwardChaining(bc, objetivos=objetivos)
+        for var, val in fatos.items():
+            motor.adicionar_fato(var, val)
+        motor.encadear()
+
+    return medir(encadear, casos, memoria)
+
+
+def bench_backward(bc, casos, objetivos, memoria):
+    """Consulta completa: responde cada pergunta com o valor do caso (ou 'a'
+    para variáveis intermediárias que nenhuma regra concluiu)."""
+    perguntas = []
+
+    def consultar(entrada):
+        fatos, objetivo = entrada
+        motor = MotorBackwardChaining(bc)
+        resultado = motor.provar_objetivo(objetivo)
+        n = 0
+        while resultado["tipo"] == "pergunta":
+            n += 1
+            resultado = motor.adicionar_resposta(
+                resultado["variavel"], fatos.get(resultado["variavel"], "a")
+            )
+        perguntas.append(n)
+
+    entradas = [(fatos, objetivos[i % len(objetivos)]) for i, fatos in enumerate(casos)]
+    resultado = medir(consultar, entradas, memoria)
+    resultado["perguntas_media"] = sum(perguntas) / len(perguntas) if perguntas else 0.0
+    return resultado
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, anterior):
+    print(f"\nComparação com {anterior['meta'].get('commit') or 'execução anterior'}:")
+    for cenario, medidas in atual["resultados"].items():
+        antes = anterior["resultados"].get(cenario)
+        if not antes:
+            continue
+        p50 = medidas["p50_ms"] / antes["p50_ms"] if antes["p50_ms"] else float("nan")
+        vazao = medidas["ops_por_s"] / antes["ops_por_s"] if antes["ops_por_s"] else float("nan")
+        print(f"  {cenario:18s} p50 x{p50:6.2f}   vazão x{vazao:6.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dos motores de inferência.")
+    parser.add_argument("--regras", type=int, default=2000)
+    parser.add_argument("--profundidade", type=int, default=4)
+    parser.add_argument("--fan-in", type=int, default=3)
+    parser.add_argument("--entradas", type=int, default=None, help="variáveis de entrada")
+    parser.add_argument("--operadores", type=ler_mix, default=None,
+                        help="mix de operadores, ex.: '==:0.5,>:0.3,in:0.2'")
+    parser.add_argument("--cf-min", type=float, default=0.5)
+    parser.add_argument("--cf-max", type=float, default=1.0)
+    parser.add_argument("--casos", type=int, default=200)
+    parser.add_argument("--cargas", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede pico de memória")
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    parametros = {
+        "regras": args.regras,
+        "profundidade": args.profundidade,
+        "fan_in": args.fan_in,
+        "entradas": args.entradas,
+        "operadores": args.operadores,
+        "cf": [args.cf_min, args.cf_max],
+        "casos": args.casos,
+        "semente": args.semente,
+    }
+    base = BaseSintetica(
+        regras=args.regras,
+        profundidade=args.profundidade,
+        fan_in=args.fan_in,
+        entradas=args.entradas,
+        mix_operadores=args.operadores,
+        cf=(args.cf_min, args.cf_max),
+        semente=args.semente,
+    )
+    memoria = not args.sem_memoria
+    bc = base_de_dicts(base.variaveis, base.regras)
+    casos = list(base.casos(args.casos, args.semente + 1))
+
+    resultados = bench_carga(base, args.cargas, memoria)
+    resultados["forward"] = bench_forward(bc, casos, memoria)
+    resultados["forward_objetivo"] = bench_forward(bc, casos, memoria, base.objetivos[:1])
+    resultados["backward"] = bench_backward(bc, casos, base.objetivos, memoria)
+
+    saida = {
+        "meta": {
+            "commit": _commit_atual(),
+            "python": platform.python_version(),
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "parametros": parametros,
+        },
+        "resultados": resultados,
+    }
+    print(f"{args.regras} regras, profundidade {args.profundidade}, fan-in {args.fan_in}")
+    for cenario, m in resultados.items():
+        memoria_txt = f"  pico {m['pico_memoria_kb']:9.0f} KB" if "pico_memoria_kb" in m else ""
+        print(f"  {cenario:18s} p50 {m['p50_ms']:8.3f} ms  p90 {m['p90_ms']:8.3f} ms  "
+              f"p99 {m['p99_ms']:8.3f} ms  {m['ops_por_s']:9.1f} ops/s{memoria_txt}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(saida, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(saida, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
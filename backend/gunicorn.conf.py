@@ -0,0 +1,48 @@
+# backend/gunicorn.conf.py
+# Vários processos servindo a API (a partir de backend/):
+#   gunicorn -c gunicorn.conf.py app.api:app
+#
+# As KBs são carregadas uma vez no mestre e herdadas pelos workers no fork
+# (ver run.preparar_workers). Cada worker ainda tem seus próprios objetos:
+# a memória é compartilhada por cópia-na-escrita, não por um arquivo mapeado.
+# Depois de uma edição, cada worker que herdou a versão antiga se encerra
+# graciosamente (termina as requisições em andamento) e o mestre, ao pôr
+# outro no lugar, recarrega a KB, então a versão nova também fica
+# compartilhada (run.reciclar_worker_desatualizado; KB_RECICLAR_ATRASO=-1
+# desliga). Um worker com canais SSE abertos ou sessões só em memória espera
+# até não ter nenhum: com as configurações abaixo nada se perde na troca,
+# mas sem SESSAO_COMPARTILHADA e com SSE ligado a troca fica adiada e o
+# worker segue com uma cópia própria da KB.
+#
+# Uma consulta pode cair em qualquer worker, por isso as sessões ficam em
+# disco, compartilhadas (SESSAO_PASTA + SESSAO_COMPARTILHADA=1), e os canais
+# SSE ficam desligados: a fila de um canal vive num processo só, e o
+# frontend usa o modo de requisições.
+
+import os
+import tempfile
+
+bind = f"{os.environ.get('SERVIDOR_HOST', '127.0.0.1')}:{os.environ.get('SERVIDOR_PORTA', '5000')}"
+workers = int(os.environ.get("SERVIDOR_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.environ.get("SERVIDOR_THREADS", "8"))
+preload_app = True
+
+# Lidas quando app.api é importado, o que com preload_app acontece depois daqui
+os.environ.setdefault("SESSAO_PASTA", os.path.join(tempfile.gettempdir(), "sistema-especialista-sessoes"))
+os.environ.setdefault("SESSAO_COMPARTILHADA", "1")
+os.environ.setdefault("SSE_MAX_CANAIS", "0")
+if workers > 1 and os.environ["SESSAO_COMPARTILHADA"] != "1":
+    raise RuntimeError("Com mais de um worker as sessões precisam ser compartilhadas (SESSAO_COMPARTILHADA=1).")
+
+
+def pre_fork(server, worker):
+    from run import preparar_workers
+
+    preparar_workers()
+
+
+def post_fork(server, worker):
+    from run import reciclar_worker_desatualizado
+
+    reciclar_worker_desatualizado()
@@ -1,11 +1,161 @@
 # inicio de backend/run.py
 
-from app.api import app
+import argparse
+import gc
+import os
+import signal
+import threading
+import time
+
+from app.analise import obter_analise
+from app.api import app, canais, sessoes, sessoes_hipoteses
+from app.inference_engine import obter_rede_casamento
+from app.utils import assinatura_kb, carregar_base_conhecimento, listar_kbs
+
+
+def preaquecer(nomes=None):
+    """Carrega as KBs no cache (já com a análise estática e a rede de
+    casamento do forward) numa thread em segundo plano, para a primeira
+    consulta não pagar a leitura. Por padrão todas as KBs; KB_PREAQUECER
+    aceita uma lista separada por vírgulas ou 0."""
+    if nomes is None:
+        config = os.environ.get("KB_PREAQUECER", "")
+        if config == "0":
+            return None
+        nomes = [n.strip() for n in config.split(",") if n.strip()] or None
+
+    def trabalho():
+        for kb in nomes or sorted(listar_kbs()):
+            try:
+                bc = carregar_base_conhecimento(kb)
+                obter_analise(bc)
+                obter_rede_casamento(bc)
+            except Exception as e:
+                print(f"[AVISO] Falha ao pré-aquecer a KB '{kb}': {e}")
+
+    thread = threading.Thread(target=trabalho, name="preaquecer-kbs", daemon=True)
+    thread.start()
+    return thread
+
+
+_fontes_no_mestre = None  # assinaturas das KBs quando o mestre as carregou
+
+
+def preparar_workers():
+    """Para servidores pré-fork (gunicorn --preload, ver gunicorn.conf.py):
+    carrega as KBs no processo mestre antes do fork e congela esses objetos
+    fora do coletor de lixo (gc.freeze), para que as varreduras do GC nos
+    workers não escrevam neles e as páginas continuem compartilhadas por
+    cópia-na-escrita. Chamada antes de cada fork; só recarrega se alguma KB
+    mudou desde a última vez (ver reciclar_worker_desatualizado)."""
+    global _fontes_no_mestre
+    fontes = {kb: assinatura_kb(kb) for kb in listar_kbs()}
+    if fontes == _fontes_no_mestre:
+        return
+    gc.unfreeze()  # As versões antigas das KBs precisam poder ser coletadas
+    thread = preaquecer()
+    if thread is not None:
+        thread.join()
+    gc.collect()
+    gc.freeze()
+    _fontes_no_mestre = fontes
+
+
+def reciclar_worker_desatualizado(intervalo=None):
+    """Chamada em cada worker (post_fork). Uma KB editada seria recarregada
+    por cada worker numa cópia própria, e a memória voltaria a crescer com o
+    número de workers. Em vez disso, a cada `intervalo` segundos
+    (KB_RECICLAR_ATRASO, padrão 2; negativo desliga) o worker compara as
+    assinaturas das KBs herdadas do mestre com as atuais; se alguma mudou e
+    ficou estável por um intervalo inteiro (várias edições seguidas contam
+    como uma), o worker se encerra com SIGTERM, que no gunicorn é a saída
+    graciosa: termina as requisições em andamento e o mestre põe no lugar
+    um worker novo, que herda a versão nova (ver preparar_workers).
+
+    Workers cujas KBs não mudaram não são trocados. Um worker com canais SSE
+    abertos ou sessões que só existem na sua memória (SESSAO_COMPARTILHADA
+    desligado) espera até não ter nenhum, e enquanto isso segue atendendo
+    com a cópia própria."""
+    if intervalo is None:
+        intervalo = float(os.environ.get("KB_RECICLAR_ATRASO", "2"))
+    if intervalo < 0 or not _fontes_no_mestre:
+        return None
+    herdadas = dict(_fontes_no_mestre)
+
+    def ocioso():
+        if len(canais):
+            return False
+        return all(g.compartilhada or not g.estatisticas()["em_memoria"] for g in (sessoes, sessoes_hipoteses))
+
+    def vigiar():
+        anteriores = herdadas
+        while True:
+            time.sleep(intervalo)
+            atuais = {kb: assinatura_kb(kb) for kb in herdadas}
+            if atuais != herdadas and atuais == anteriores and ocioso():
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+            anteriores = atuais
+
+    thread = threading.Thread(target=vigiar, name="reciclar-worker", daemon=True)
+    thread.start()
+    return thread
+
+
+def servir_em_thread(host="127.0.0.1", porta=5000):
+    """Sobe a API numa thread daemon deste processo (uma thread por
+    requisição) e devolve o servidor; encerre com servidor.shutdown().
+    Usado pelo lançador desktop para não iniciar um segundo interpretador."""
+    from werkzeug.serving import make_server
+
+    servidor = make_server(host, porta, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, name="api", daemon=True).start()
+    preaquecer()
+    return servidor
+
+
+def servir_producao(host, porta, threads):
+    """Servidor de produção: o waitress atende as conexões num laço de E/S
+    assíncrono e roda cada requisição (carga de KB, inferência, canais SSE)
+    num pool de threads, então uma consulta lenta não trava as demais.
+    Alternativa multi-processo: gunicorn -c gunicorn.conf.py app.api:app
+    (com SESSAO_PASTA numa pasta comum e SESSAO_COMPARTILHADA=1, para que
+    qualquer worker atenda qualquer sessão)."""
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[AVISO] waitress não instalado (pip install waitress); "
+              "usando o servidor do Flask com uma thread por requisição.")
+        app.run(host=host, port=porta, threaded=True)
+        return
+    # Canais SSE prendem threads do pool: ao menos metade fica para os POSTs
+    # que os alimentam, senão o pool esgota e os canais esperam para sempre
+    limite = threads // 2
+    if canais.max_canais is None or canais.max_canais > limite:
+        canais.max_canais = limite
+    print(f"[INFO] Servindo em http://{host}:{porta} com {threads} threads "
+          f"(até {canais.max_canais} canais de eventos)")
+    serve(app, host=host, port=porta, threads=threads)
+
 
 if __name__ == "__main__":
-    # O debug=True faz com que o servidor reinicie automaticamente
-    # quando você altera o código. Ótimo para desenvolvimento.
-    # Não use em produção!
-    app.run(debug=False, port=5000)
+    parser = argparse.ArgumentParser(description="Servidor da API do sistema especialista.")
+    parser.add_argument("--producao", action="store_true",
+                        default=os.environ.get("SERVIDOR_PRODUCAO") == "1")
+    parser.add_argument("--host", default=os.environ.get("SERVIDOR_HOST", "127.0.0.1"))
+    parser.add_argument("--porta", type=int, default=int(os.environ.get("SERVIDOR_PORTA", "5000")))
+    # Cada canal SSE aberto ocupa uma thread enquanto a consulta dura (ver
+    # SSE_MAX_CANAIS; no waitress o limite fica em no máximo threads/2)
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVIDOR_THREADS", "16")))
+    args = parser.parse_args()
+
+    preaquecer()
+    if args.producao:
+        servir_producao(args.host, args.porta, args.threads)
+    else:
+        # O debug=True faz com que o servidor reinicie automaticamente
+        # quando você altera o código. Ótimo para desenvolvimento.
+        # Não use em produção!
+        app.run(debug=False, host=args.host, port=args.porta, threaded=True)
 
 # fim de backend/run.py
@@ -0,0 +1,44 @@
+# backend/tests/bases.py
+# Bases pequenas e sintéticas usadas pelos testes.
+
+from app.utils import base_de_dicts
+from benchmarks.gerador import BaseSintetica
+
+
+def base_sintetica(regras=60, profundidade=3, semente=0, **opcoes):
+    base = BaseSintetica(regras=regras, profundidade=profundidade, semente=semente, **opcoes)
+    return base, base_de_dicts(base.variaveis, base.regras)
+
+
+def variavel(nome, tipo="univalorada", valores=("sim", "nao"), pergunta=""):
+    return {
+        "nome": nome,
+        "tipo": tipo,
+        "valores_possiveis": list(valores) if tipo != "numerica" else [],
+        "min_val": 0 if tipo == "numerica" else None,
+        "max_val": 100 if tipo == "numerica" else None,
+        "pergunta": pergunta or f"{nome}?",
+        "explicacao": "",
+    }
+
+
+def regra(nome, condicoes, conclusoes):
+    """condicoes/conclusoes como tuplas (variavel, operador, valor[, fc])."""
+    def cond(t):
+        return {"variavel": t[0], "operador": t[1], "valor": t[2], "fc": t[3] if len(t) > 3 else 1.0}
+    return {
+        "nome": nome,
+        "condicoes_se": [cond(c) for c in condicoes],
+        "conclusoes_entao": [cond(c) for c in conclusoes],
+    }
+
+
+def base_consulta():
+    """A e B perguntadas; C concluída quando ambas são 'sim'."""
+    return base_de_dicts(
+        [variavel("A"), variavel("B"), variavel("C", pergunta="-")],
+        [
+            regra("r_sim", [("A", "==", "sim"), ("B", "==", "sim")], [("C", "==", "sim", 0.9)]),
+            regra("r_nao", [("A", "==", "nao")], [("C", "==", "nao")]),
+        ],
+    )
@@ -0,0 +1,20 @@
+# backend/tests/conftest.py
+# Os testes rodam a partir de backend/ (python -m pytest -q), com `app` e
+# `benchmarks` importáveis como pacotes.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import utils  # noqa: E402
+
+
+@pytest.fixture
+def pasta_data(tmp_path, monkeypatch):
+    """Isola as KBs do teste em tmp_path, com um cache de bases novo."""
+    monkeypatch.setattr(utils, "PASTA_DATA", str(tmp_path))
+    monkeypatch.setattr(utils, "cache_bases", utils.CacheBases())
+    return tmp_path
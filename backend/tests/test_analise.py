@@ -0,0 +1,87 @@
+# backend/tests/test_analise.py
+
+from app import analise
+from app.analise import obter_analise, regras_de_trabalho
+from app.inference_engine import MotorForwardChaining
+from app.utils import base_de_dicts
+
+from .bases import regra, variavel
+
+
+def _mortas(bc):
+    return {r.nome: (tipo, var) for r, tipo, var, _ in obter_analise(bc).mortas.values()}
+
+
+def _encadear(bc, fatos):
+    motor = MotorForwardChaining(bc)
+    for var, val in fatos.items():
+        motor.adicionar_fato(var, val)
+    return motor.encadear()["fatos"]
+
+
+def _numerica(nome, minimo, maximo):
+    return {**variavel(nome, "numerica"), "min_val": minimo, "max_val": maximo}
+
+
+def test_premissa_fora_do_intervalo_e_insatisfativel(monkeypatch):
+    bc = base_de_dicts(
+        [_numerica("V", 0, 10), variavel("S")],
+        [
+            regra("acima", [("V", ">", 10)], [("S", "==", "sim")]),
+            regra("no_limite", [("V", ">=", 10)], [("S", "==", "nao")]),
+        ],
+    )
+    assert _mortas(bc) == {"acima": ("insatisfativel", "V")}
+    # A poda muda o resultado de um fato fora do domínio declarado
+    assert _encadear(bc, {"V": 15}) == {"V": 15, "S": "nao"}
+    monkeypatch.setattr(analise, "PODAR_REGRAS", False)
+    assert [r.nome for r in regras_de_trabalho(bc)[0]] == ["acima", "no_limite"]
+
+
+def test_premissas_contraditorias_numa_univalorada():
+    bc = base_de_dicts(
+        [variavel("A"), variavel("S")],
+        [
+            regra("contraditoria", [("A", "==", "sim"), ("A", "==", "nao")], [("S", "==", "sim")]),
+            regra("compativel", [("A", "==", "sim"), ("A", "!=", "nao")], [("S", "==", "nao")]),
+        ],
+    )
+    diagnosticos = obter_analise(bc).to_dict()["diagnosticos"]
+    assert [(d["regra"], d["tipo"]) for d in diagnosticos] == [("contraditoria", "insatisfativel")]
+    assert diagnosticos[0]["motivo"].startswith("premissas contraditórias")
+
+
+def test_cadeia_inalcancavel_ate_o_ponto_fixo():
+    # C só vale "c1" pela regra morta; D só vale "d1" por quem exige C == c1
+    bc = base_de_dicts(
+        [_numerica("V", 0, 10), variavel("C", valores=["outro"]), variavel("D", valores=["outro"]), variavel("S")],
+        [
+            regra("morta", [("V", ">", 10)], [("C", "==", "c1")]),
+            regra("depois", [("C", "==", "c1")], [("D", "==", "d1")]),
+            regra("fim", [("D", "==", "d1")], [("S", "==", "sim")]),
+            regra("viva", [("C", "==", "outro")], [("S", "==", "nao")]),
+        ],
+    )
+    assert _mortas(bc) == {
+        "morta": ("insatisfativel", "V"),
+        "depois": ("inalcancavel", "C"),
+        "fim": ("inalcancavel", "D"),
+    }
+    assert [r.nome for r in regras_de_trabalho(bc)[0]] == ["viva"]
+
+
+def test_dominio_aberto_nunca_e_podado():
+    bc = base_de_dicts(
+        [
+            variavel("Livre", valores=()),
+            {**variavel("N", "numerica"), "min_val": None, "max_val": None},
+            variavel("S"),
+        ],
+        [
+            regra("texto", [("Livre", "==", "sim"), ("Livre", "==", "nao")], [("S", "==", "sim")]),
+            regra("numero", [("N", ">", 1e9)], [("S", "==", "sim")]),
+            regra("sem_declaracao", [("X", "==", "qualquer")], [("S", "==", "nao")]),
+        ],
+    )
+    assert _mortas(bc) == {}
+    assert obter_analise(bc).indefinidas == ["X"]
@@ -0,0 +1,179 @@
+# backend/tests/test_api.py
+
+import io
+import json
+
+import pytest
+
+pytest.importorskip("flask")
+
+from app import api, utils
+from app.utils import base_de_dicts, salvar_base_conhecimento
+
+from .bases import base_consulta, regra, variavel
+
+
+@pytest.fixture
+def cliente(pasta_data, monkeypatch):
+    salvar_base_conhecimento("kb", base_consulta())
+    monkeypatch.setattr(api, "canais", api.CanaisEventos(max_canais=1))
+    return api.app.test_client()
+
+
+def test_canal_de_eventos_respeita_o_limite(cliente):
+    url = "/api/consulta/eventos?kb=kb&objetivo=C"
+    primeira = cliente.get(url, buffered=False)
+    assert primeira.status_code == 200
+    assert cliente.get(url).status_code == 503
+    primeira.close()  # o cliente foi embora antes de ler o canal
+    segunda = cliente.get(url, buffered=False)
+    assert segunda.status_code == 200
+    segunda.close()
+
+
+def test_resposta_segue_pelo_canal(cliente):
+    resposta = cliente.get("/api/consulta/eventos?kb=kb&objetivo=C", buffered=False)
+    fluxo = resposta.response
+    assert next(fluxo).startswith(b"event: sessao")
+    pergunta = next(fluxo).decode()
+    assert pergunta.startswith("event: pergunta")
+    sessao = pergunta.split('"sessao": "')[1].split('"')[0]
+    aceita = cliente.post("/api/consulta/responder", json={"sessao": sessao, "variavel": "A", "valor": "nao"})
+    assert aceita.status_code == 202
+    assert next(fluxo).decode().startswith("event: resultado")
+    resposta.close()
+    assert cliente.get("/api/consulta/eventos?kb=kb&objetivo=C", buffered=False).status_code == 200
+
+
+def test_etag_nao_depende_do_processo(cliente):
+    url = "/api/regras?kb=kb&campos=nome"
+    etag = cliente.get(url).headers["ETag"]
+    # Invalidar o cache (como faz outro worker, ou este, ao recarregar) não
+    # muda o conteúdo, então o ETag continua valendo
+    utils.cache_bases.invalidar("kb")
+    assert cliente.get(url, headers={"If-None-Match": etag}).status_code == 304
+    cliente.post("/api/regras?kb=kb", json={
+        "nome": "r_nova",
+        "condicoes_se": [{"variavel": "A", "operador": "==", "valor": "sim"}],
+        "conclusoes_entao": [{"variavel": "B", "operador": "==", "valor": "sim"}],
+    })
+    assert cliente.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_hipoteses_sem_ponto_fixo_responde_409(pasta_data):
+    from .test_hipoteses import _base_com_conflito
+    salvar_base_conhecimento("conflito", _base_com_conflito())
+    cliente = api.app.test_client()
+    url = "/api/hipoteses?kb=conflito"
+    assert cliente.post(url, json={"fatos": {"A": "sim", "B": "sim"}}).status_code == 409
+    criada = cliente.post(url, json={"fatos": {"A": "sim"}})
+    assert criada.status_code == 201
+    sessao = criada.get_json()["sessao"]
+    assert cliente.patch(f"/api/hipoteses/{sessao}", json={"alterar": {"B": "sim"}}).status_code == 409
+    atual = cliente.get(f"/api/hipoteses/{sessao}").get_json()
+    assert atual["fatos"] == {"A": "sim", "Meta": "sim"}
+    assert atual["explicacao_como"] == ["meta_sim_a"]
+
+
+def test_forward_sem_ponto_fixo_responde_409(pasta_data):
+    from .test_hipoteses import _base_com_conflito
+    salvar_base_conhecimento("conflito", _base_com_conflito())
+    cliente = api.app.test_client()
+    resposta = cliente.post("/api/consulta/forward?kb=conflito", json={"fatos": {"A": "sim", "B": "sim"}})
+    assert resposta.status_code == 409
+    assert "ponto fixo" in resposta.get_json()["erro"]
+    lote = cliente.post("/api/consulta/forward/lote?kb=conflito", json={"casos": [{"A": "sim", "B": "sim"}, {"A": "sim"}]})
+    linhas = [json.loads(linha) for linha in lote.get_data(as_text=True).splitlines()]
+    assert linhas[0]["indice"] == 0 and "ponto fixo" in linhas[0]["erro"]
+    assert linhas[1]["fatos"] == {"A": "sim", "Meta": "sim"}
+
+
+def _lote(cliente, **kwargs):
+    resposta = cliente.post("/api/consulta/forward/lote?kb=kb", **kwargs)
+    assert resposta.status_code == 200
+    assert resposta.mimetype == "application/x-ndjson"
+    return [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+
+
+def _conclusoes(resultados):
+    return [(r["indice"], r["fatos"].get("C")) for r in resultados]
+
+
+def test_lote_aceita_json_csv_e_jsonl(cliente):
+    esperado = [(0, "sim"), (1, "nao"), (2, None)]
+    casos = [{"A": "sim", "B": "sim"}, {"A": "nao"}, {}]
+    assert _conclusoes(_lote(cliente, json={"casos": casos})) == esperado
+    csv = "A,B\nsim,sim\nnao,\n,\n"
+    assert _conclusoes(_lote(cliente, data=csv, content_type="text/csv")) == esperado
+    jsonl = "\n".join(json.dumps(c) for c in casos)
+    assert _conclusoes(_lote(cliente, data=jsonl, content_type="application/x-ndjson")) == esperado
+    arquivo = {"arquivo": (io.BytesIO(csv.encode()), "casos.csv")}
+    assert _conclusoes(_lote(cliente, data=arquivo, content_type="multipart/form-data")) == esperado
+
+
+def test_lote_rejeita_entrada_invalida(cliente):
+    url = "/api/consulta/forward/lote?kb=kb"
+    assert cliente.post("/api/consulta/forward/lote", json={"casos": []}).status_code == 400
+    assert cliente.post(url, json={"casos": {}}).status_code == 400
+    assert cliente.post(url + "&formato=xml", data="<casos/>").status_code == 400
+    resultados = _lote(cliente, data='{"A": "nao"}\n{"A": ', content_type="application/x-ndjson")
+    assert resultados[0]["fatos"]["C"] == "nao"
+    assert resultados[1]["erro"].startswith("Entrada inválida")
+
+
+NOMES_LISTA = ["r_a1", "r_a2", "r_a3", "r_a4", "r_b1", "r_b2", "r_b3"]
+
+
+@pytest.fixture
+def lista(cliente):
+    regras = [regra(nome, [("A", "==", "sim")], [("B", "==", nome)]) for nome in NOMES_LISTA]
+    salvar_base_conhecimento("lista", base_de_dicts([variavel("A"), variavel("B", valores=NOMES_LISTA)], regras))
+    return cliente
+
+
+def _paginas(cliente, url):
+    nomes, cursor = [], None
+    while True:
+        resposta = cliente.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert resposta.status_code == 200
+        nomes.append([r["nome"] for r in resposta.get_json()])
+        cursor = resposta.headers.get("X-Proximo-Cursor")
+        if cursor is None:
+            return nomes
+
+
+def test_listagem_paginada_pelo_cursor(lista):
+    paginas = _paginas(lista, "/api/regras?kb=lista&campos=nome&limite=3")
+    assert paginas == [NOMES_LISTA[0:3], NOMES_LISTA[3:6], NOMES_LISTA[6:]]
+    assert _paginas(lista, "/api/regras?kb=lista&campos=nome") == [NOMES_LISTA]
+    assert lista.get("/api/regras?kb=lista&limite=0").status_code == 400
+    assert lista.get("/api/regras?kb=lista&cursor=invalido").status_code == 400
+
+
+def test_listagem_filtra_pelo_prefixo(lista):
+    paginas = _paginas(lista, "/api/regras?kb=lista&campos=nome&prefixo=r_b&limite=2")
+    assert paginas == [["r_b1", "r_b2"], ["r_b3"]]
+    assert lista.get("/api/regras?kb=lista&prefixo=r_c").get_json() == []
+
+
+def test_listagem_projeta_os_campos(lista):
+    corpo = lista.get("/api/regras?kb=lista&campos=nome,conclusoes_entao&limite=1").get_json()
+    assert corpo == [{"nome": "r_a1", "conclusoes_entao": [
+        {"variavel": "B", "operador": "==", "valor": "r_a1", "fc": 1.0},
+    ]}]
+    variaveis = lista.get("/api/variaveis?kb=lista&campos=nome,tipo").get_json()
+    assert variaveis == [{"nome": "A", "tipo": "univalorada"}, {"nome": "B", "tipo": "univalorada"}]
+    assert lista.get("/api/regras?kb=lista&campos=nome,senha").status_code == 400
+
+
+def test_listagem_responde_304_com_o_mesmo_etag(lista):
+    url = "/api/regras?kb=lista&campos=nome&limite=3"
+    primeira = lista.get(url)
+    etag = primeira.headers["ETag"]
+    revalidada = lista.get(url, headers={"If-None-Match": etag})
+    assert revalidada.status_code == 304
+    assert revalidada.headers["ETag"] == etag
+    assert revalidada.get_data() == b""
+    # Outra página (ou outra projeção) é outro recurso
+    assert lista.get(url + "&prefixo=r_b", headers={"If-None-Match": etag}).status_code == 200
+    assert lista.get("/api/regras?kb=lista&campos=nome&limite=2", headers={"If-None-Match": etag}).status_code == 200
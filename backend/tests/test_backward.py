@@ -0,0 +1,81 @@
+# backend/tests/test_backward.py
+
+import pytest
+
+from app.inference_engine import MotorBackwardChaining
+from app.utils import base_de_dicts
+from benchmarks.perguntas import Respostas
+
+from .bases import base_sintetica, regra, variavel
+
+
+def consultar(bc, objetivo, respostas, **opcoes):
+    motor = MotorBackwardChaining(bc, **opcoes)
+    resultado = motor.provar_objetivo(objetivo)
+    while resultado["tipo"] == "pergunta":
+        resultado = motor.adicionar_resposta(resultado["variavel"], respostas(resultado["variavel"]))
+    return resultado
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_estrategia_ganho_conclui_o_mesmo_valor(semente):
+    base, bc = base_sintetica(regras=120, profundidade=3, semente=semente, cf=(0.5, 1.0))
+    for caso in range(10):
+        for objetivo in base.objetivos[:5]:
+            respostas = Respostas(bc, caso)
+            ordem = consultar(bc, objetivo, respostas)
+            ganho = consultar(bc, objetivo, respostas, estrategia="ganho")
+            assert ganho["valor"] == ordem["valor"]
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_ranking_podado_igual_ao_exaustivo(semente):
+    base, bc = base_sintetica(regras=120, profundidade=3, semente=semente, cf=(0.5, 1.0))
+    for caso in range(10):
+        for objetivo in base.objetivos[:5]:
+            respostas = Respostas(bc, caso)
+            todos = consultar(bc, objetivo, respostas, cf_minimo=-1)["candidatos"]
+            for top_k in (1, 2):
+                podado = consultar(bc, objetivo, respostas, top_k=top_k)
+                assert podado["candidatos"] == todos[:top_k]
+            acima = consultar(bc, objetivo, respostas, cf_minimo=0.6)["candidatos"]
+            assert acima == [c for c in todos if c["cf"] >= 0.6]
+
+
+def _base_encadeada():
+    return base_de_dicts(
+        [variavel(v) for v in "ABCDE"],
+        [
+            regra("rC", [("A", "==", "sim")], [("C", "==", "sim")]),
+            regra("rD", [("C", "==", "sim")], [("D", "==", "sim")]),
+            regra("rE", [("C", "==", "sim"), ("B", "==", "sim")], [("E", "==", "sim")]),
+        ],
+    )
+
+
+def test_resposta_corrigida_invalida_o_memo_e_rederiva():
+    bc = _base_encadeada()
+    motor = MotorBackwardChaining(bc)
+    assert motor.provar_objetivo("D")["variavel"] == "A"
+    # Com A = nao, rC falha e C fica sem derivação: C vira pergunta
+    assert motor.adicionar_resposta("A", "nao")["variavel"] == "C"
+    assert "C" in motor._sem_derivacao and motor._regra_falhou
+    copia = MotorBackwardChaining.de_dict(bc, motor.para_dict())
+    # Corrigir A desfaz a falha memorizada: C e D são derivados de novo
+    for sessao in (motor, copia):
+        resultado = sessao.adicionar_resposta("A", "sim")
+        assert (resultado["valor"], resultado["explicacao_como"]) == ("sim", ["rC", "rD"])
+        assert not sessao._sem_derivacao and not sessao._regra_falhou
+    # Outro objetivo na mesma sessão reaproveita C e só pergunta B
+    assert motor.provar_objetivo("E")["variavel"] == "B"
+    assert motor.adicionar_resposta("B", "sim")["valor"] == "sim"
+
+
+def test_premissa_ja_satisfeita_e_reavaliada_apos_correcao():
+    bc = _base_encadeada()
+    motor = MotorBackwardChaining(bc)
+    motor.provar_objetivo("E")
+    # A = sim deriva C; rE espera B com a premissa C já satisfeita
+    assert motor.adicionar_resposta("A", "sim")["variavel"] == "B"
+    # Corrigir C (agora respondida) derruba rE e descarta a pergunta por B
+    assert motor.adicionar_resposta("C", "nao")["variavel"] == "E"
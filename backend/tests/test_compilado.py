@@ -0,0 +1,58 @@
+# backend/tests/test_compilado.py
+
+import os
+
+from app import utils
+from app.compilado import BaseCompilada, carregar_compilado, compilar_base, versao_publicada
+from app.utils import base_para_dicts, carregar_base_conhecimento, salvar_base_conhecimento
+
+from .bases import base_consulta, base_sintetica
+
+ASSINATURA = (1, 2, 3, 4, 5, 6)
+
+
+def test_ida_e_volta_preserva_a_base(tmp_path):
+    _, bc = base_sintetica(regras=120, semente=3)
+    caminho = str(tmp_path / "base.kbc")
+    compilar_base(bc, caminho, ASSINATURA, versao=7)
+    copia = carregar_compilado(caminho, ASSINATURA)
+    assert base_para_dicts(copia) == base_para_dicts(bc)
+    assert copia.ids_variaveis == bc.ids_variaveis
+    assert copia.versao == bc.versao
+    assert copia.publicacao == 7 == versao_publicada(caminho)
+    for variavel, regras in bc.regras_por_premissa.items():
+        assert [r.nome for r in copia.regras_por_premissa[variavel]] == [r.nome for r in regras]
+    for variavel, regras in bc.regras_por_conclusao.items():
+        assert [r.nome for r in copia.regras_por_conclusao[variavel]] == [r.nome for r in regras]
+
+
+def test_arquivo_de_outras_fontes_ou_invalido_e_ignorado(tmp_path):
+    bc = base_consulta()
+    caminho = str(tmp_path / "base.kbc")
+    compilar_base(bc, caminho, ASSINATURA)
+    assert carregar_compilado(caminho, (0,) * 6) is None
+    with open(caminho, "r+b") as f:
+        f.truncate(os.path.getsize(caminho) // 2)
+    assert carregar_compilado(caminho, ASSINATURA) is None
+    with open(caminho, "wb") as f:
+        f.write(b"lixo")
+    assert carregar_compilado(caminho, ASSINATURA) is None
+    assert versao_publicada(caminho) == 0
+    assert carregar_compilado(str(tmp_path / "nao_existe.kbc"), ASSINATURA) is None
+
+
+def test_base_mapeada_nao_guarda_o_arquivo_aberto(tmp_path):
+    caminho = str(tmp_path / "base.kbc")
+    compilar_base(base_consulta(), caminho, ASSINATURA)
+    with BaseCompilada(caminho) as compilada:
+        assert compilada.string(compilada.regra_nome[0]) == "r_sim"
+    os.remove(caminho)
+
+
+def test_leitura_usa_a_versao_publicada(pasta_data):
+    salvar_base_conhecimento("kb", base_consulta())
+    compilado = os.path.join(utils._get_kb_path("kb"), utils.ARQUIVO_COMPILADO)
+    assert versao_publicada(compilado) == 1
+    bc = carregar_base_conhecimento("kb", usar_cache=False)
+    assert bc.publicacao == 1
+    assert base_para_dicts(bc) == base_para_dicts(base_consulta())
@@ -0,0 +1,101 @@
+# backend/tests/test_forward.py
+
+import pytest
+
+from app.inference_engine import MotorForwardChaining
+from app.utils import base_de_dicts
+
+from .bases import base_sintetica, regra, variavel
+
+
+def varredura_original(bc, fatos):
+    """O motor forward original: varre todas as regras, na ordem, até nenhuma
+    conclusão mudar. É a referência de resultado e de trilha."""
+    fatos = {**bc.fatos, **fatos}
+    trilha = []
+    alterado = True
+    while alterado:
+        alterado = False
+        for r in bc.regras:
+            if all(
+                fatos.get(c.variavel) is not None and c.avaliar(fatos[c.variavel])
+                for c in r.condicoes_se
+            ):
+                for conc in r.conclusoes_entao:
+                    if fatos.get(conc.variavel) != conc.valor:
+                        fatos[conc.variavel] = conc.valor
+                        trilha.append(r.nome)
+                        alterado = True
+    return {"fatos": fatos, "explicacao_como": trilha}
+
+
+def encadear(bc, fatos, **opcoes):
+    motor = MotorForwardChaining(bc, **opcoes)
+    for var, val in fatos.items():
+        motor.adicionar_fato(var, val)
+    resultado = motor.encadear()
+    return {"fatos": dict(resultado["fatos"]), "explicacao_como": resultado["explicacao_como"]}
+
+
+@pytest.mark.parametrize("semente", range(4))
+def test_equivale_a_varredura_original(semente):
+    base, bc = base_sintetica(regras=150, profundidade=4, semente=semente)
+    for caso in base.casos(30, semente=semente):
+        assert encadear(bc, caso) == varredura_original(bc, caso)
+
+
+def test_ordem_das_regras_e_redisparo():
+    # A segunda regra só é satisfeita depois da terceira; a primeira volta a
+    # disparar quando B muda, como na varredura original
+    bc = base_de_dicts(
+        [variavel("A"), variavel("B"), variavel("C", valores=("x", "y"))],
+        [
+            regra("c_de_b", [("B", "==", "sim")], [("C", "==", "x")]),
+            regra("c_de_a", [("A", "==", "nao")], [("C", "==", "y")]),
+            regra("b_de_a", [("A", "==", "sim")], [("B", "==", "sim")]),
+        ],
+    )
+    for caso in ({"A": "sim"}, {"A": "nao"}, {"A": "sim", "B": "nao"}, {}):
+        assert encadear(bc, caso) == varredura_original(bc, caso)
+
+
+@pytest.mark.parametrize("semente", range(4))
+def test_fatia_dos_objetivos_da_os_mesmos_valores(semente):
+    base, bc = base_sintetica(regras=150, profundidade=4, semente=semente)
+    objetivos = base.objetivos[:3]
+    for caso in base.casos(30, semente=semente):
+        completo = varredura_original(bc, caso)["fatos"]
+        for parar in (True, False):
+            fatia = encadear(bc, caso, objetivos=objetivos, parar_nos_objetivos=parar)["fatos"]
+            assert {o: fatia.get(o) for o in objetivos} == {o: completo.get(o) for o in objetivos}
+
+
+def test_para_quando_os_objetivos_estao_decididos():
+    # Depois de Meta decidida, o resto da fatia ainda teria o que disparar
+    bc = base_de_dicts(
+        [variavel("A"), variavel("B"), variavel("C"), variavel("Meta")],
+        [
+            regra("meta", [("A", "==", "sim")], [("Meta", "==", "sim")]),
+            regra("b", [("A", "==", "sim")], [("B", "==", "sim")]),
+            regra("c", [("B", "==", "sim")], [("C", "==", "sim")]),
+            regra("meta_c", [("C", "==", "sim")], [("Meta", "==", "sim")]),
+        ],
+    )
+    cedo = encadear(bc, {"A": "sim"}, objetivos=["Meta"])
+    assert cedo["explicacao_como"] == ["meta"]
+    assert cedo["fatos"]["Meta"] == "sim"
+    inteiro = encadear(bc, {"A": "sim"}, objetivos=["Meta"], parar_nos_objetivos=False)
+    assert inteiro["explicacao_como"] == ["meta", "b", "c"]
+
+
+def test_nao_para_se_outra_regra_pode_mudar_o_objetivo():
+    bc = base_de_dicts(
+        [variavel("A"), variavel("B"), variavel("Meta")],
+        [
+            regra("meta_sim", [("B", "==", "nao")], [("Meta", "==", "sim")]),
+            regra("b", [("A", "==", "sim")], [("B", "==", "sim")]),
+            regra("meta_nao", [("B", "==", "sim")], [("Meta", "==", "nao")]),
+        ],
+    )
+    caso = {"A": "sim", "B": "nao"}
+    assert encadear(bc, caso, objetivos=["Meta"]) == varredura_original(bc, caso)
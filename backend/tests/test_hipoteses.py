@@ -0,0 +1,98 @@
+# backend/tests/test_hipoteses.py
+
+import random
+
+import pytest
+
+from app.hipoteses import SessaoHipoteses
+from app.inference_engine import SemPontoFixo
+from app.utils import base_de_dicts
+from benchmarks.gerador import VALORES_CATEGORICOS, BaseSintetica
+
+from .bases import regra, variavel
+
+
+def _fresca(bc, entradas, objetivos=None):
+    try:
+        return SessaoHipoteses(bc, entradas, objetivos).resultado()
+    except SemPontoFixo:
+        return None
+
+
+@pytest.mark.parametrize("semente,conflito", [(0, 0.0), (1, 0.05), (2, 0.2)])
+def test_alteracoes_dao_o_resultado_de_uma_sessao_nova(semente, conflito):
+    base = BaseSintetica(regras=200, profundidade=4, semente=semente)
+    rnd = random.Random(semente)
+    # Parte das regras passa a concluir outro valor: variáveis conflitantes
+    for r in base.regras:
+        if rnd.random() < conflito:
+            r["conclusoes_entao"][0]["valor"] = rnd.choice(VALORES_CATEGORICOS)
+    bc = base_de_dicts(base.variaveis, base.regras)
+    casos = base.casos(80, semente=semente)
+    caso = SessaoHipoteses(bc, next(casos))
+    for novo in casos:
+        mudancas = {k: v for k, v in novo.items() if rnd.random() < 0.1}
+        retirar = [rnd.choice(list(caso.entradas))] if rnd.random() < 0.2 else []
+        esperado_entradas = {k: v for k, v in caso.entradas.items() if k not in retirar}
+        esperado_entradas.update(mudancas)
+        esperado = _fresca(bc, esperado_entradas)
+        try:
+            resposta = caso.alterar(mudancas, retirar)
+        except SemPontoFixo:
+            assert esperado is None
+            continue
+        assert resposta["modo"] == "incremental"
+        assert caso.resultado() == esperado
+
+
+def _base_com_conflito():
+    return base_de_dicts(
+        [variavel("A"), variavel("B"), variavel("Meta")],
+        [
+            regra("meta_sim_a", [("A", "==", "sim")], [("Meta", "==", "sim")]),
+            regra("meta_nao", [("B", "==", "sim")], [("Meta", "==", "nao")]),
+            regra("meta_sim_b", [("B", "==", "nao")], [("Meta", "==", "sim")]),
+        ],
+    )
+
+
+def test_conflito_sem_recalculo_e_com_todos_os_suportes():
+    bc = _base_com_conflito()
+    caso = SessaoHipoteses(bc, {"A": "sim", "B": "nao"})
+    assert caso.resultado()["explicacao_como"] == ["meta_sim_a", "meta_sim_b"]
+    resposta = caso.alterar(retirar=["A"])
+    assert resposta["modo"] == "incremental"
+    # Meta continua sustentada por meta_sim_b
+    assert resposta["diferenca"]["removidos"] == {"A": "sim"}
+    assert caso.resultado() == _fresca(bc, {"B": "nao"})
+    resposta = caso.alterar({"B": "sim"})
+    assert resposta["modo"] == "incremental"
+    assert resposta["diferenca"]["alterados"] == {
+        "B": {"antes": "nao", "depois": "sim"},
+        "Meta": {"antes": "sim", "depois": "nao"},
+    }
+    assert caso.resultado() == _fresca(bc, {"B": "sim"})
+
+
+def test_sem_ponto_fixo_mantem_a_sessao():
+    bc = _base_com_conflito()
+    with pytest.raises(SemPontoFixo):
+        SessaoHipoteses(bc, {"A": "sim", "B": "sim"})
+    caso = SessaoHipoteses(bc, {"A": "sim"})
+    antes = caso.resultado()
+    with pytest.raises(SemPontoFixo):
+        caso.alterar({"B": "sim"})
+    assert caso.entradas == {"A": "sim"}
+    assert caso.resultado() == antes
+    assert caso.alterar({"B": "nao"})["modo"] == "incremental"
+
+
+def test_entrada_que_uma_regra_conclui_recalcula():
+    bc = base_de_dicts(
+        [variavel("A"), variavel("B")],
+        [regra("b_de_a", [("A", "==", "sim")], [("B", "==", "sim")])],
+    )
+    caso = SessaoHipoteses(bc, {"A": "sim"})
+    resposta = caso.alterar({"B": "nao"})
+    assert resposta["modo"] == "completo"
+    assert caso.resultado() == _fresca(bc, {"A": "sim", "B": "nao"})
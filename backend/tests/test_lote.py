@@ -0,0 +1,45 @@
+# backend/tests/test_lote.py
+
+import io
+
+from app import utils
+from app.lote import LoteParalelo, encadear_lote, ler_casos_csv, ler_casos_jsonl, resultados_ndjson
+
+from .bases import base_consulta, base_sintetica
+
+CASOS = [{"A": "sim", "B": "sim"}, {"A": "nao"}, {}]
+
+
+def test_leitores_de_casos():
+    csv = io.StringIO("A,B\r\nsim, sim \r\nnao,\r\n")
+    assert list(ler_casos_csv(csv)) == [{"A": "sim", "B": "sim"}, {"A": "nao"}]
+    jsonl = io.StringIO('{"A": "sim", "B": "sim"}\n\n  \n{"A": "nao"}\n')
+    assert list(ler_casos_jsonl(jsonl)) == [{"A": "sim", "B": "sim"}, {"A": "nao"}]
+
+
+def test_lote_responde_cada_caso_na_ordem():
+    resultados = list(encadear_lote(base_consulta(), iter(CASOS + ["invalido"])))
+    assert [r["indice"] for r in resultados] == [0, 1, 2, 3]
+    assert [r.get("fatos", {}).get("C") for r in resultados] == ["sim", "nao", None, None]
+    assert resultados[0]["explicacao_como"] == ["r_sim"]
+    assert "erro" in resultados[3]
+    linhas = list(resultados_ndjson(resultados))
+    assert all(linha.endswith("\n") and linha.count("\n") == 1 for linha in linhas)
+
+
+def test_lote_paralelo_igual_ao_sequencial():
+    sintetica, base = base_sintetica(40, 4, 7)
+    casos = [*sintetica.casos(20), "invalido"]
+    esperado = list(encadear_lote(base, casos))
+    lote = LoteParalelo(base, processos=2, tamanho_bloco=3)
+    assert list(lote.executar(iter(casos))) == esperado
+    relatorio = lote.relatorio()
+    assert relatorio["casos"] == len(casos)
+    assert sum(p["casos"] for p in relatorio["processos"]) == len(casos)
+
+
+def test_lote_paralelo_carrega_a_kb_pelo_nome(pasta_data):
+    utils.salvar_base_conhecimento("kb", base_consulta())
+    casos = [{"A": "nao"}, {"A": "sim", "B": "sim"}]
+    resultados = list(LoteParalelo("kb", processos=1, tamanho_bloco=1).executar(casos))
+    assert [(r["indice"], r["fatos"]["C"]) for r in resultados] == [(0, "nao"), (1, "sim")]
@@ -0,0 +1,120 @@
+# backend/tests/test_metricas.py
+
+import pytest
+
+from app.inference_engine import MotorBackwardChaining, MotorForwardChaining
+from app.metricas import MetricasConsulta, RegistroMetricas
+
+from .bases import base_consulta, base_sintetica
+
+
+class _Regra:
+    def __init__(self, nome):
+        self.nome = nome
+
+
+def _consulta(tempos, disparos=None):
+    metricas = MetricasConsulta()
+    for nome, segundos in tempos.items():
+        metricas.tempo(_Regra(nome), segundos)
+        metricas.segundos += segundos
+    for nome, n in (disparos or {}).items():
+        for _ in range(n):
+            metricas.disparo(_Regra(nome))
+    return metricas
+
+
+def test_tempo_por_regra_cabe_no_tempo_do_motor():
+    base, bc = base_sintetica(regras=200, profundidade=4, semente=0)
+    for fatos in base.casos(10):
+        metricas = MetricasConsulta()
+        motor = MotorForwardChaining(bc, metricas)
+        for var, val in fatos.items():
+            motor.adicionar_fato(var, val)
+        motor.encadear()
+        assert metricas.avaliacoes_condicao > 0
+        assert sum(metricas.tempo_regra.values()) <= metricas.segundos
+
+
+def test_backward_conta_disparos_e_profundidade():
+    metricas = MetricasConsulta()
+    motor = MotorBackwardChaining(base_consulta(), metricas)
+    motor.provar_objetivo("C")
+    motor.adicionar_resposta("A", "sim")
+    motor.adicionar_resposta("B", "sim")
+    dados = metricas.to_dict()
+    assert dados["disparos"] == 1 and dados["profundidade_max"] >= 1
+    assert {r["regra"] for r in dados["regras_lentas"]} <= {"r_sim", "r_nao"}
+    assert sum(metricas.tempo_regra.values()) <= metricas.segundos
+
+
+def test_to_dict_lista_as_regras_mais_lentas():
+    metricas = _consulta({"a": 0.1, "b": 0.3, "c": 0.2}, {"b": 2})
+    dados = metricas.to_dict(regras_lentas=2)
+    assert dados["regras_lentas"] == [
+        {"regra": "b", "segundos": 0.3, "disparos": 2},
+        {"regra": "c", "segundos": 0.2, "disparos": 0},
+    ]
+    assert dados["disparos"] == 2
+
+
+def _series(texto, nome):
+    return {
+        linha.split(" ")[0]: float(linha.split(" ")[1])
+        for linha in texto.splitlines() if linha.startswith(nome + "{")
+    }
+
+
+def test_registro_agrega_por_kb_e_motor():
+    registro = RegistroMetricas()
+    registro.registrar("kb", "forward", _consulta({"a": 0.5}, {"a": 1}))
+    registro.registrar("kb", "forward", _consulta({"a": 0.25}, {"a": 2}))
+    registro.registrar('k"b', "backward", _consulta({}))
+    texto = registro.prometheus()
+    assert _series(texto, "inferencia_consultas_total") == {
+        'inferencia_consultas_total{kb="k\\"b",motor="backward"}': 1,
+        'inferencia_consultas_total{kb="kb",motor="forward"}': 2,
+    }
+    assert _series(texto, "inferencia_regra_segundos_total") == {
+        'inferencia_regra_segundos_total{kb="kb",regra="a"}': 0.75,
+    }
+    assert _series(texto, "inferencia_regra_disparos_total") == {
+        'inferencia_regra_disparos_total{kb="kb",regra="a"}': 3,
+    }
+
+
+def test_series_por_regra_limitadas():
+    registro = RegistroMetricas(max_regras=2)
+    registro.registrar("kb", "forward", _consulta({f"r{i}": i / 10 for i in range(1, 6)}, {"r1": 1, "r2": 1}))
+    series = _series(registro.prometheus(), "inferencia_regra_segundos_total")
+    assert series == pytest.approx({
+        'inferencia_regra_segundos_total{kb="kb",regra="r5"}': 0.5,
+        'inferencia_regra_segundos_total{kb="kb",regra="r4"}': 0.4,
+        'inferencia_regra_segundos_total{kb="kb",regra="(outras)"}': 0.6,
+    })
+    assert _series(registro.prometheus(), "inferencia_regra_disparos_total")[
+        'inferencia_regra_disparos_total{kb="kb",regra="(outras)"}'
+    ] == 2
+    registro.max_regras = 0
+    texto = registro.prometheus()
+    assert "inferencia_regra_" not in texto and "inferencia_consultas_total{" in texto
+
+
+def test_endpoint_de_metricas(pasta_data, monkeypatch):
+    pytest.importorskip("flask")
+    from app import api
+    from app.utils import salvar_base_conhecimento
+
+    monkeypatch.setattr(api, "registro_metricas", RegistroMetricas())
+    salvar_base_conhecimento("kb", base_consulta())
+    cliente = api.app.test_client()
+    resposta = cliente.post("/api/consulta/forward?kb=kb&metricas=1", json={"fatos": {"A": "sim", "B": "sim"}})
+    assert resposta.get_json()["metricas"]["disparos"] == 1
+    cliente.post("/api/consulta/forward?kb=kb", json={"fatos": {"A": "nao"}})  # sem instrumentação
+    metricas = cliente.get("/api/metrics")
+    assert metricas.mimetype == "text/plain"
+    texto = metricas.get_data(as_text=True)
+    assert _series(texto, "inferencia_consultas_total") == {'inferencia_consultas_total{kb="kb",motor="forward"}': 1}
+    disparos = _series(texto, "inferencia_regra_disparos_total")
+    assert disparos['inferencia_regra_disparos_total{kb="kb",regra="r_sim"}'] == 1
+    assert sum(disparos.values()) == 1
@@ -0,0 +1,110 @@
+# backend/tests/test_models.py
+
+import pytest
+
+from app.analise import obter_analise
+from app.models import FatosSessao, Regra, Variavel, compilar_predicado
+from app.utils import aplicar_edicao, base_de_dicts
+
+from .bases import base_consulta, regra, variavel
+
+
+def test_fatos_sessao_se_comporta_como_dict():
+    bc = base_consulta()
+    fatos = FatosSessao(bc, {"A": ("sim", 1.0)})
+    fatos["C"] = ("nao", 0.5)
+    assert dict(fatos) == {"A": ("sim", 1.0), "C": ("nao", 0.5)}
+    assert "B" not in fatos and len(fatos) == 2
+    del fatos["A"]
+    assert dict(fatos) == {"C": ("nao", 0.5)}
+
+
+def test_nomes_fora_da_base_ficam_na_sessao():
+    bc = base_consulta()
+    ids = dict(bc.ids_variaveis)
+    fatos = FatosSessao(bc)
+    fatos["Digitada"] = ("x", 1.0)
+    fatos["A"] = ("sim", 1.0)
+    assert bc.ids_variaveis == ids
+    assert fatos["Digitada"] == ("x", 1.0)
+    assert dict(fatos) == {"A": ("sim", 1.0), "Digitada": ("x", 1.0)}
+    assert "Digitada" not in FatosSessao(bc)
+    del fatos["Digitada"]
+    assert len(fatos) == 1
+
+
+def test_remover_variavel_invalida_o_que_dependia_do_tipo():
+    bc = base_de_dicts(
+        [{**variavel("V", "numerica"), "max_val": 10}, variavel("S")],
+        [regra("r", [("V", "==", 10)], [("S", "==", "sim")]), regra("alto", [("V", ">", 10)], [("S", "==", "nao")])],
+    )
+    cond = bc.regras[0].condicoes_se[0]
+    assert cond.avaliar("10.0")
+    assert [r.nome for r in obter_analise(bc).regras_vivas] == ["r"]
+    versao = bc.versao
+    aplicar_edicao(bc, {"op": "remover_variavel", "nome": "V"})
+    assert bc.versao > versao and "V" not in bc.variaveis
+    # Sem o tipo a igualdade volta a comparar o valor como informado
+    assert not cond.avaliar("10.0") and cond.avaliar(10)
+    # Sem o intervalo declarado o domínio fica aberto
+    assert [r.nome for r in obter_analise(bc).regras_vivas] == ["r", "alto"]
+
+
+@pytest.mark.parametrize("operador,alvo,tipo,valor,esperado", [
+    # Igualdade numérica só em variáveis 'numerica'
+    ("==", 10, "numerica", "10", True),
+    ("==", "10", "numerica", 10.0, True),
+    ("==", 10, "numerica", "10.5", False),
+    ("==", "desconhecido", "numerica", "desconhecido", True),
+    ("==", 10, "numerica", "abc", False),
+    ("!=", 10, "numerica", "10.0", False),
+    # Nas demais, como o avaliador original: o valor como informado
+    ("==", 10, None, "10", False),
+    ("==", 10, "univalorada", 10, True),
+    ("!=", "sim", "univalorada", "nao", True),
+    # Ordem: sempre numérica; sem número dos dois lados é falsa
+    (">", 3, None, "5", True),
+    ("<=", "3", "univalorada", 3, True),
+    (">", 3, "numerica", "abc", False),
+    (">", "muito", "numerica", 5, False),
+    # 'in' com lista JSON ou texto separado por vírgulas
+    ("in", ["Leve", "Intensa"], None, "Leve", True),
+    ("in", "Leve, Intensa", "univalorada", "Intensa", True),
+    ("in", "Leve, Intensa", "univalorada", "Moderada", False),
+    ("in", "1,2", None, 2, True),
+    ("in", "1,2", None, "2.0", False),
+    ("in", [1, 2], "numerica", "2.0", True),
+    ("in", "1, 2", "numerica", 3, False),
+    ("in", ["x", 1], "numerica", "x", True),
+    # Operador desconhecido
+    ("~", "sim", None, "sim", False),
+])
+def test_predicados_compilados(operador, alvo, tipo, valor, esperado):
+    assert compilar_predicado(operador, alvo, tipo)(valor) is esperado
+
+
+def test_condicao_recompila_quando_o_tipo_muda():
+    bc = base_de_dicts([variavel("V")], [regra("r", [("V", "==", 10)], [("S", "==", "sim")])])
+    cond = bc.regras[0].condicoes_se[0]
+    assert not cond.avaliar("10")
+    bc.adicionar_variavel(Variavel("V", "numerica"))
+    assert cond.avaliar("10")
+    assert cond.avaliar(10.0)
+
+
+def test_remover_regra_atualiza_os_indices():
+    bc = base_consulta()
+    r_sim, r_nao = bc.regras
+    r_extra = Regra("r_extra", r_nao.condicoes_se, ())
+    bc.adicionar_regra(r_extra)
+    versao = bc.versao
+    bc.remover_regra(r_sim)
+    assert bc.versao == versao + 1
+    # B só aparecia em r_sim: a chave sai do índice em vez de ficar vazia
+    assert "B" not in bc.regras_por_premissa
+    assert bc.regras_por_premissa["A"] == [r_nao, r_extra]
+    assert bc.regras_por_conclusao["C"] == [r_nao]
+    bc.remover_regra(r_nao)
+    assert "C" not in bc.regras_por_conclusao
+    assert bc.regras_por_premissa == {"A": [r_extra]}
+    assert bc.regras == [r_extra]
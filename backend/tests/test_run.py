@@ -0,0 +1,64 @@
+# backend/tests/test_run.py
+
+import queue
+import signal
+
+import pytest
+
+pytest.importorskip("flask")
+
+import run
+from app.inference_engine import MotorBackwardChaining
+from app.sessoes import CanaisEventos, GerenciadorSessoes
+from app.utils import assinatura_kb, registrar_edicoes, salvar_base_conhecimento
+
+from .bases import base_consulta, regra
+
+
+@pytest.fixture
+def worker(pasta_data, monkeypatch):
+    """Worker recém-criado do fork: herdou a KB 'kb' do mestre."""
+    salvar_base_conhecimento("kb", base_consulta())
+    salvar_base_conhecimento("outra", base_consulta())
+    monkeypatch.setattr(run, "_fontes_no_mestre", {"kb": assinatura_kb("kb"), "outra": assinatura_kb("outra")})
+    monkeypatch.setattr(run, "canais", CanaisEventos())
+    for nome in ("sessoes", "sessoes_hipoteses"):
+        monkeypatch.setattr(run, nome, GerenciadorSessoes(ttl=60, max_sessoes=10))
+    sinais = queue.SimpleQueue()
+    monkeypatch.setattr(run.os, "kill", lambda pid, sinal: sinais.put(sinal))
+    return sinais
+
+
+def _editar():
+    registrar_edicoes("kb", {"op": "adicionar_regra", "dados": regra("r_b", [("A", "==", "sim")], [("B", "==", "sim")])})
+
+
+def test_worker_desatualizado_se_encerra(worker):
+    thread = run.reciclar_worker_desatualizado(0.05)
+    thread.join(0.2)  # KBs iguais às herdadas: nada a fazer
+    assert thread.is_alive() and worker.empty()
+    _editar()
+    thread.join(2)
+    assert worker.get_nowait() == signal.SIGTERM
+
+
+def test_worker_com_canal_aberto_espera(worker):
+    fila = run.canais.abrir("s1")
+    thread = run.reciclar_worker_desatualizado(0.05)
+    _editar()
+    thread.join(0.3)
+    assert thread.is_alive() and worker.empty()
+    run.canais.fechar("s1", fila)
+    thread.join(2)
+    assert worker.get_nowait() == signal.SIGTERM
+
+
+def test_sessoes_so_em_memoria_adiam_a_troca(worker):
+    sessao_id = run.sessoes.criar("kb", MotorBackwardChaining(base_consulta()))
+    thread = run.reciclar_worker_desatualizado(0.05)
+    _editar()
+    thread.join(0.3)
+    assert thread.is_alive() and worker.empty()
+    run.sessoes.remover(sessao_id)
+    thread.join(2)
+    assert worker.get_nowait() == signal.SIGTERM
@@ -0,0 +1,135 @@
+# backend/tests/test_sessoes.py
+
+import threading
+
+from app.inference_engine import MotorBackwardChaining
+from app.sessoes import GerenciadorSessoes
+from app.utils import salvar_base_conhecimento
+
+from .bases import base_consulta
+
+
+def _kb(pasta_data):
+    salvar_base_conhecimento("kb", base_consulta())
+
+
+def _nova_consulta(gerenciador, bc=None):
+    from app.utils import carregar_base_conhecimento
+
+    motor = MotorBackwardChaining(bc or carregar_base_conhecimento("kb"))
+    sessao_id = gerenciador.criar("kb", motor)
+    with gerenciador.usar(sessao_id) as sessao:
+        pergunta = sessao.motor.provar_objetivo("C")
+    assert pergunta["tipo"] == "pergunta" and pergunta["variavel"] == "A"
+    return sessao_id
+
+
+def test_para_dict_de_dict_retoma_a_consulta(pasta_data):
+    _kb(pasta_data)
+    from app.utils import carregar_base_conhecimento
+
+    bc = carregar_base_conhecimento("kb")
+    motor = MotorBackwardChaining(bc)
+    motor.provar_objetivo("C")
+    motor.adicionar_resposta("A", "sim")
+    copia = MotorBackwardChaining.de_dict(bc, motor.para_dict())
+    assert copia.para_dict() == motor.para_dict()
+    assert copia.adicionar_resposta("B", "sim") == motor.adicionar_resposta("B", "sim")
+
+
+def test_sessao_excedente_vai_para_disco_e_volta(pasta_data, tmp_path):
+    _kb(pasta_data)
+    gerenciador = GerenciadorSessoes(max_sessoes=1, pasta_disco=str(tmp_path / "sessoes"))
+    primeira = _nova_consulta(gerenciador)
+    _nova_consulta(gerenciador)
+    assert gerenciador.estatisticas()["em_disco"] == 1
+    with gerenciador.usar(primeira) as sessao:
+        assert sessao is not None
+        resultado = sessao.motor.adicionar_resposta("A", "nao")
+    assert (resultado["tipo"], resultado["valor"]) == ("resultado", "nao")
+
+
+def test_usar_obtem_de_novo_a_sessao_retirada_antes_do_lock(pasta_data, tmp_path):
+    _kb(pasta_data)
+    gerenciador = GerenciadorSessoes(pasta_disco=str(tmp_path / "sessoes"), ocioso_para_disco=5)
+    sessao_id = _nova_consulta(gerenciador)
+    obter = gerenciador._obter
+    retiradas = []
+
+    def obter_e_expurgar(sid):
+        # expurgar() de outra requisição roda entre _obter e o lock da sessão
+        sessao = obter(sid)
+        if not retiradas:
+            sessao.ultimo_acesso -= 10
+            gerenciador.expurgar()
+            retiradas.append(sessao)
+        return sessao
+
+    gerenciador._obter = obter_e_expurgar
+    with gerenciador.usar(sessao_id) as sessao:
+        assert sessao is not retiradas[0]
+        assert gerenciador._sessoes.get(sessao_id) is sessao
+        assert sessao.motor.adicionar_resposta("A", "sim")["variavel"] == "B"
+
+
+def test_sessoes_compartilhadas_entre_processos(pasta_data, tmp_path):
+    _kb(pasta_data)
+    pasta = str(tmp_path / "sessoes")
+    # Dois gerenciadores sobre a mesma pasta fazem o papel de dois workers
+    worker1 = GerenciadorSessoes(pasta_disco=pasta, compartilhada=True)
+    worker2 = GerenciadorSessoes(pasta_disco=pasta, compartilhada=True)
+    sessao_id = _nova_consulta(worker1)
+    with worker2.usar(sessao_id) as sessao:
+        assert sessao.motor.adicionar_resposta("A", "sim")["variavel"] == "B"
+    with worker1.usar(sessao_id) as sessao:
+        # O cache do worker1 ficou velho: a sessão vem do disco, já com A
+        assert sessao.motor.fatos_sessao["A"] == ("sim", 1.0)
+        resultado = sessao.motor.adicionar_resposta("B", "sim")
+    assert resultado["tipo"] == "resultado"
+    worker2.remover(sessao_id)
+    with worker1.usar(sessao_id) as sessao:
+        assert sessao is None
+
+
+def test_sessoes_compartilhadas_serializam_o_uso(pasta_data, tmp_path):
+    _kb(pasta_data)
+    pasta = str(tmp_path / "sessoes")
+    worker1 = GerenciadorSessoes(pasta_disco=pasta, compartilhada=True)
+    worker2 = GerenciadorSessoes(pasta_disco=pasta, compartilhada=True)
+    sessao_id = _nova_consulta(worker1)
+    dentro, liberar, ordem = threading.Event(), threading.Event(), []
+
+    def segurar():
+        with worker1.usar(sessao_id) as sessao:
+            dentro.set()
+            liberar.wait(5)
+            sessao.motor.adicionar_resposta("A", "sim")
+            ordem.append("worker1")
+
+    t = threading.Thread(target=segurar)
+    t.start()
+    dentro.wait(5)
+    threading.Timer(0.2, liberar.set).start()
+    with worker2.usar(sessao_id) as sessao:
+        ordem.append("worker2")
+        # Só entra depois do worker1 gravar: vê a resposta dele
+        assert sessao.motor.fatos_sessao["A"] == ("sim", 1.0)
+    t.join()
+    assert ordem == ["worker1", "worker2"]
+
+
+def test_hipoteses_compartilhadas_reconstroem_o_caso(pasta_data, tmp_path):
+    from app.hipoteses import SessaoHipoteses
+    from app.utils import carregar_base_conhecimento
+
+    _kb(pasta_data)
+    pasta = str(tmp_path / "hipoteses")
+    worker1 = GerenciadorSessoes(pasta_disco=pasta, compartilhada=True, restaurar=SessaoHipoteses.de_dict)
+    worker2 = GerenciadorSessoes(pasta_disco=pasta, compartilhada=True, restaurar=SessaoHipoteses.de_dict)
+    caso = SessaoHipoteses(carregar_base_conhecimento("kb"), {"A": "sim", "B": "sim"})
+    sessao_id = worker1.criar("kb", caso)
+    with worker2.usar(sessao_id) as sessao:
+        assert sessao.motor.resultado() == caso.resultado()
+        sessao.motor.alterar({"A": "nao"})
+    with worker1.usar(sessao_id) as sessao:
+        assert sessao.motor.resultado()["fatos"]["C"] == "nao"
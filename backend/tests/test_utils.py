@@ -0,0 +1,141 @@
+# backend/tests/test_utils.py
+
+import os
+
+from app import utils
+from app.compilado import versao_publicada
+from app.utils import (
+    base_para_dicts,
+    carregar_base_conhecimento,
+    registrar_edicoes,
+    salvar_base_conhecimento,
+)
+
+from .bases import base_consulta, regra
+
+
+def _compilado(kb_name="kb"):
+    return os.path.join(utils._get_kb_path(kb_name), utils.ARQUIVO_COMPILADO)
+
+
+def test_edicao_publica_no_primeiro_leitor(pasta_data):
+    salvar_base_conhecimento("kb", base_consulta())
+    registrar_edicoes("kb", {"op": "adicionar_regra", "dados": regra("r_b", [("A", "==", "sim")], [("B", "==", "sim")])})
+    # A edição só vai para o diário; a publicação fica para quem ler
+    assert versao_publicada(_compilado()) == 1
+    bc = carregar_base_conhecimento("kb")
+    assert [r.nome for r in bc.regras] == ["r_sim", "r_nao", "r_b"]
+    assert bc.publicacao == versao_publicada(_compilado()) == 2
+    # Outro processo (sem cache) mapeia a versão publicada
+    outro = utils._ler_base_conhecimento("kb")
+    assert outro.publicacao == 2
+    assert base_para_dicts(outro) == base_para_dicts(bc)
+
+
+def _regra_b(nome="r_b"):
+    return {"op": "adicionar_regra", "dados": regra(nome, [("A", "==", "sim")], [("B", "==", "sim")])}
+
+
+def _nomes(kb_name="kb"):
+    return [r.nome for r in carregar_base_conhecimento(kb_name, usar_cache=False).regras]
+
+
+def test_linha_truncada_do_diario_e_descartada(pasta_data):
+    salvar_base_conhecimento("kb", base_consulta())
+    registrar_edicoes("kb", _regra_b())
+    diario = os.path.join(utils._get_kb_path("kb"), utils.ARQUIVO_DIARIO)
+    with open(diario, "a", encoding="utf-8") as f:
+        f.write('{"op": "adicionar_regra", "dad')  # queda no meio da escrita
+    assert _nomes() == ["r_sim", "r_nao", "r_b"]
+    registrar_edicoes("kb", _regra_b("r_c"))
+    assert _nomes() == ["r_sim", "r_nao", "r_b", "r_c"]
+
+
+def test_compactacao_interrompida_apos_a_marca_e_concluida(pasta_data, monkeypatch):
+    salvar_base_conhecimento("kb", base_consulta())
+    registrar_edicoes("kb", _regra_b())
+    concluir = utils._concluir_compactacao
+
+    def queda(kb_path):
+        monkeypatch.setattr(utils, "_concluir_compactacao", concluir)
+        raise OSError("queda")
+
+    monkeypatch.setattr(utils, "_concluir_compactacao", queda)
+    try:
+        utils.compactar_base("kb")
+    except OSError:
+        pass
+    kb_path = utils._get_kb_path("kb")
+    assert os.path.exists(os.path.join(kb_path, utils.MARCA_COMPACTACAO))
+    # O snapshot novo já tem r_b: o diário não pode ser reaplicado sobre ele
+    assert _nomes() == ["r_sim", "r_nao", "r_b"]
+    restos = [utils.MARCA_COMPACTACAO, utils.ARQUIVO_DIARIO, *(a + ".tmp" for a in utils.ARQUIVOS_KB)]
+    assert not any(os.path.exists(os.path.join(kb_path, a)) for a in restos)
+
+
+def test_tmp_sem_marca_e_ignorado(pasta_data):
+    salvar_base_conhecimento("kb", base_consulta())
+    kb_path = utils._get_kb_path("kb")
+    with open(os.path.join(kb_path, "regras.json.tmp"), "w", encoding="utf-8") as f:
+        f.write("[")  # snapshot interrompido antes da marca
+    assert _nomes() == ["r_sim", "r_nao"]
+    assert not os.path.exists(os.path.join(kb_path, "regras.json.tmp"))
+
+
+def _salvar(*nomes):
+    for nome in nomes:
+        salvar_base_conhecimento(nome, base_consulta())
+    utils.cache_bases = utils.CacheBases(tamanho_max=2)
+    return utils.cache_bases
+
+
+def test_cache_acerto_e_falha(pasta_data):
+    cache = _salvar("kb")
+    bc = carregar_base_conhecimento("kb")
+    assert (cache.acertos, cache.falhas) == (0, 1)
+    assert carregar_base_conhecimento("kb") is bc
+    assert (cache.acertos, cache.falhas) == (1, 1)
+    # KB inexistente não tem assinatura e nunca entra no cache
+    assert cache.assinatura("outra") is None
+    cache.guardar("outra", None, bc)
+    assert cache.obter("outra", None) is None
+    assert cache.estatisticas()["tamanho"] == 1
+
+
+def test_cache_descarta_a_menos_usada(pasta_data):
+    cache = _salvar("a", "b", "c")
+    a = carregar_base_conhecimento("a")
+    carregar_base_conhecimento("b")
+    assert carregar_base_conhecimento("a") is a  # "b" passa a ser a menos usada
+    carregar_base_conhecimento("c")
+    assert list(cache._itens) == ["a", "c"]
+    assert carregar_base_conhecimento("a") is a
+    falhas = cache.falhas
+    carregar_base_conhecimento("b")
+    assert cache.falhas == falhas + 1
+    assert cache.estatisticas()["tamanho"] == cache.tamanho_max == 2
+
+
+def test_cache_invalida_quando_os_arquivos_mudam(pasta_data):
+    _salvar("kb")
+    bc = carregar_base_conhecimento("kb")
+    # Escrita feita por outro processo: só a assinatura dos arquivos denuncia
+    caminho = os.path.join(utils._get_kb_path("kb"), utils.ARQUIVOS_KB[0])
+    st = os.stat(caminho)
+    os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert carregar_base_conhecimento("kb") is not bc
+
+
+def test_cache_invalida_quando_a_versao_muda(pasta_data):
+    cache = _salvar("kb")
+    bc = carregar_base_conhecimento("kb")
+    assinatura = cache.assinatura("kb")
+    cache.invalidar("kb")
+    assert cache.assinatura("kb") != assinatura
+    assert cache.obter("kb", assinatura) is None
+    novo = carregar_base_conhecimento("kb")
+    assert novo is not bc
+    assert carregar_base_conhecimento("kb") is novo
+    # Edições pela API passam pelo invalidar
+    registrar_edicoes("kb", _regra_b())
+    assert "r_b" in [r.nome for r in carregar_base_conhecimento("kb").regras]
@@ -0,0 +1,80 @@
+# backend/tests/test_vetorizado.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.inference_engine import MotorForwardChaining
+from app.utils import base_de_dicts
+from app.vetorizado import MotorForwardVetorizado
+
+from .bases import base_sintetica, regra, variavel
+
+
+def _escalar(bc, fatos):
+    motor = MotorForwardChaining(bc)
+    for var, val in fatos.items():
+        motor.adicionar_fato(var, val)
+    return motor.encadear()
+
+
+def _comparar(bc, casos, colunas=None):
+    if colunas is None:
+        nomes = sorted({var for caso in casos for var in caso})
+        colunas = {
+            var: np.array([caso.get(var) for caso in casos], dtype=object) for var in nomes
+        }
+    resultado = MotorForwardVetorizado(bc).encadear(colunas)
+    por_linha = resultado.regras_por_linha()
+    for i, caso in enumerate(casos):
+        esperado = _escalar(bc, caso)
+        assert resultado.fatos(i) == esperado["fatos"]
+        assert por_linha[i] == esperado["explicacao_como"]
+
+
+@pytest.mark.parametrize("semente", [0, 1, 2])
+def test_equivale_ao_motor_escalar_em_bases_sinteticas(semente):
+    base, bc = base_sintetica(regras=80, profundidade=4, semente=semente)
+    _comparar(bc, list(base.casos(40, semente=semente)))
+
+
+def test_consumidor_antes_do_produtor():
+    bc = base_de_dicts(
+        [variavel("A"), variavel("B"), variavel("C")],
+        [
+            regra("consome", [("B", "==", "sim")], [("C", "==", "sim")]),
+            regra("produz", [("A", "==", "sim")], [("B", "==", "sim")]),
+        ],
+    )
+    _comparar(bc, [{"A": "sim"}, {"A": "nao"}, {}])
+
+
+def test_coluna_sem_nenhum_valor():
+    # "B" não vem nas colunas e nenhuma linha a conclui: vocabulário vazio
+    bc = base_de_dicts(
+        [variavel("A"), variavel("B"), variavel("C")],
+        [
+            regra("r1", [("B", "!=", "sim")], [("C", "==", "sim")]),
+            regra("r2", [("A", "==", "sim")], [("C", "==", "nao")]),
+        ],
+    )
+    _comparar(bc, [{"A": "sim"}, {"A": "nao"}])
+    # Coluna presente, mas toda ausente (NaN)
+    _comparar(
+        bc,
+        [{"A": "sim"}, {"A": "nao"}],
+        colunas={"A": np.array(["sim", "nao"], dtype=object), "B": np.array([np.nan, np.nan])},
+    )
+
+
+def test_nan_em_coluna_de_objetos_e_fato_ausente():
+    bc = base_de_dicts(
+        [variavel("A"), variavel("B")],
+        [regra("r1", [("A", "!=", "sim")], [("B", "==", "sim")])],
+    )
+    colunas = {"A": np.array(["sim", float("nan"), "nao", None], dtype=object)}
+    resultado = MotorForwardVetorizado(bc).encadear(colunas)
+    assert [resultado.fatos(i) for i in range(4)] == [
+        _escalar(bc, fatos)["fatos"] for fatos in ({"A": "sim"}, {}, {"A": "nao"}, {})
+    ]
+    assert resultado.regras_por_linha() == [[], [], ["r1"], []]
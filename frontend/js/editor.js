@@ -31,6 +31,7 @@ let variaveisDisponiveis = [];
 let regrasDisponiveis = [];
 let modoEdicaoRegra = { ativo: false, nomeOriginal: null };
 let modoEdicaoVariavel = { ativo: false, nomeOriginal: null };
+let diagnosticosPorRegra = {}; // Regras mortas segundo /api/analise
 
 // --- FUNÇÕES DE APAGAR ---
 async function apagarVariavel(nome) {
@@ -104,6 +105,13 @@ function renderizarRegras() {
                 <button class="btn-apagar" title="Apagar">Apagar</button>
             </div>
         `;
+        const diagnostico = diagnosticosPorRegra[r.nome];
+        if (diagnostico) {
+            const aviso = document.createElement('div');
+            aviso.className = 'diagnostico-regra';
+            aviso.textContent = `Nunca dispara: ${diagnostico.motivo}`;
+            li.firstElementChild.appendChild(aviso);
+        }
         li.querySelector('.btn-editar').addEventListener('click', () => popularFormularioRegra(r));
         li.querySelector('.btn-apagar').addEventListener('click', () => apagarRegra(r.nome));
         listaRegras.appendChild(li);
@@ -128,11 +136,42 @@ async function carregarRegras() {
     const response = await fetch(`${API_URL}/api/regras?kb=${encodeURIComponent(kbAtiva)}`);
         regrasDisponiveis = await response.json();
         renderizarRegras();
+        carregarAnalise();
     } catch (error) {
         console.error('Erro ao carregar regras:', error);
     }
 }
 
+async function carregarAnalise() {
+    const painel = document.getElementById('diagnosticos-kb');
+    if (!kbAtiva || !painel) return;
+    try {
+        const response = await fetch(`${API_URL}/api/analise?kb=${encodeURIComponent(kbAtiva)}`);
+        if (!response.ok) return;
+        const analise = await response.json();
+        diagnosticosPorRegra = {};
+        analise.diagnosticos.forEach(d => { diagnosticosPorRegra[d.regra] = d; });
+        const avisos = [];
+        if (analise.diagnosticos.length > 0) {
+            avisos.push(`${analise.diagnosticos.length} regra(s) nunca disparam e são ignoradas na inferência.`);
+        }
+        analise.ciclos.forEach(ciclo => avisos.push(`Dependência circular entre: ${ciclo.join(', ')}`));
+        if (analise.variaveis_indefinidas.length > 0) {
+            avisos.push(`Variáveis usadas em regras sem cadastro: ${analise.variaveis_indefinidas.join(', ')}`);
+        }
+        painel.innerHTML = '';
+        avisos.forEach(texto => {
+            const linha = document.createElement('div');
+            linha.textContent = texto;
+            painel.appendChild(linha);
+        });
+        painel.classList.toggle('hidden', avisos.length === 0);
+        renderizarRegras();
+    } catch (error) {
+        console.error('Erro ao carregar análise:', error);
+    }
+}
+
 function carregarTudo() {
     carregarVariaveis().then(carregarRegras);
 }
@@ -202,7 +241,7 @@ function criarLinhaCondicao(condicaoExistente = null, isConclusao = false) {
     });
     const selectOp = document.createElement('select');
     selectOp.className = 'condicao-operador';
-    ['==', '!=', '>', '<', '>=', '<='].forEach(op => {
+    ['==', '!=', '>', '<', '>=', '<=', 'in'].forEach(op => {
         selectOp.add(new Option(op, op));
     });
     const inputValor = document.createElement('input');
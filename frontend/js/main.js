@@ -267,6 +267,8 @@ const explicacaoComo = document.getElementById('explicacao-como');
 
 // Variáveis de estado
 let estadoConsulta = {
+    sessao: null,
+    canal: null, // EventSource da consulta (perguntas e resultado chegam por ele)
     objetivo: null,
     variavelAtual: null,
     contextoPorque: null,
@@ -320,8 +322,39 @@ async function buscarVariaveis() {
     }
 }
 
-async function iniciarConsulta(objetivo) {
+function iniciarConsulta(objetivo) {
     if (!kbAtiva) { alert('Selecione uma KB antes.'); return; }
+    if (typeof EventSource === 'undefined') { iniciarConsultaSemCanal(objetivo); return; }
+    // Canal de eventos: uma conexão para toda a consulta; as respostas vão por POST
+    fecharCanal();
+    const canal = new EventSource(`${API_URL}/api/consulta/eventos?kb=${encodeURIComponent(kbAtiva)}&objetivo=${encodeURIComponent(objetivo)}`);
+    estadoConsulta.canal = canal;
+    canal.addEventListener('sessao', e => { estadoConsulta.sessao = JSON.parse(e.data).sessao; });
+    canal.addEventListener('pergunta', e => processarRespostaAPI(JSON.parse(e.data)));
+    ['resultado', 'erro'].forEach(tipo => canal.addEventListener(tipo, e => {
+        fecharCanal();
+        processarRespostaAPI(JSON.parse(e.data));
+    }));
+    canal.onerror = () => {
+        // Sem reconexão automática: ela abriria uma nova consulta
+        const semSessao = !estadoConsulta.sessao;
+        fecharCanal();
+        if (semSessao) {
+            iniciarConsultaSemCanal(objetivo);
+        } else {
+            adicionarMensagem('Erro de comunicação com o servidor.', 'sistema');
+        }
+    };
+}
+
+function fecharCanal() {
+    if (estadoConsulta.canal) {
+        estadoConsulta.canal.close();
+        estadoConsulta.canal = null;
+    }
+}
+
+async function iniciarConsultaSemCanal(objetivo) {
     try {
         const response = await fetch(`${API_URL}/api/consulta/iniciar?kb=${encodeURIComponent(kbAtiva)}`, {
             method: 'POST',
@@ -341,9 +374,11 @@ async function enviarResposta(valor) {
         const response = await fetch(`${API_URL}/api/consulta/responder?kb=${encodeURIComponent(kbAtiva)}`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ variavel: estadoConsulta.variavelAtual, valor })
+            body: JSON.stringify({ sessao: estadoConsulta.sessao, variavel: estadoConsulta.variavelAtual, valor })
         });
         const data = await response.json();
+        // 202: a próxima pergunta (ou o resultado) chega pelo canal de eventos
+        if (response.status === 202) return;
         processarRespostaAPI(data);
     } catch (error) {
         console.error("Erro ao enviar resposta:", error);
@@ -366,6 +401,7 @@ function processarRespostaAPI(data) {
         adicionarMensagem(`Erro do sistema: ${data.erro}`, 'sistema');
         return;
     }
+    if (data.sessao) estadoConsulta.sessao = data.sessao;
 
     if (data.tipo === 'pergunta') {
         estadoConsulta.variavelAtual = data.variavel;
@@ -510,12 +546,13 @@ function mostrarResultado(data) {
 }
 
 function resetarInterface() {
+    fecharCanal();
     secaoInicio.classList.remove('hidden');
     secaoConsulta.classList.add('hidden');
     secaoResultado.classList.add('hidden');
     dialogoBox.innerHTML = '';
     areaInputUsuario.innerHTML = '';
-    estadoConsulta = { objetivo: null, variavelAtual: null, contextoPorque: null };
+    estadoConsulta = { sessao: null, objetivo: null, variavelAtual: null, contextoPorque: null };
     selectObjetivo.selectedIndex = 0;
     if (statusModo) statusModo.textContent = 'Modo: -';
     if (statusObjetivo) statusObjetivo.textContent = 'Objetivo: -';
@@ -534,6 +571,7 @@ document.addEventListener('DOMContentLoaded', () => {
         secaoResultado.classList.add('hidden');
         secaoForward?.classList.add('hidden');
         secaoInicio.classList.remove('hidden');
+        fecharCanal();
         dialogoBox.innerHTML = '';
         areaInputUsuario.innerHTML = '';
     });
@@ -543,6 +581,7 @@ document.addEventListener('DOMContentLoaded', () => {
         secaoResultado.classList.add('hidden');
         secaoForward?.classList.add('hidden');
         secaoInicio.classList.remove('hidden');
+        fecharCanal();
         dialogoBox.innerHTML = '';
         areaInputUsuario.innerHTML = '';
     });
@@ -1,9 +1,17 @@
 # main.py (Versão Definitiva)
+# Só a biblioteca padrão é importada aqui: o Flask (e as KBs) carregam no
+# backend enquanto o webview é importado, e a janela abre assim que a API
+# responde em /api/saude.
+import argparse
 import sys
 import os
 import subprocess
 import time
-import webview
+import urllib.request
+
+BACKEND_HOST = '127.0.0.1'
+BACKEND_PORTA = 5000
+BACKEND_URL = f'http://{BACKEND_HOST}:{BACKEND_PORTA}'
 
 def get_base_path():
     """ Retorna o caminho base para encontrar os arquivos,
@@ -17,26 +25,77 @@ def get_base_path():
 
 BASE_PATH = get_base_path()
 
-def start_backend():
-    """ Inicia o servidor Flask em um processo separado, apenas se não estiver congelado. """
-    if not getattr(sys, 'frozen', False):
-        backend_path = os.path.join(BASE_PATH, 'backend', 'run.py')
-        # Garante que o subprocesso use o mesmo interpretador Python
-        return subprocess.Popen([sys.executable, backend_path])
+def backend_ready(timeout=0.5):
+    """ True se a API já responde ao health check. """
+    try:
+        with urllib.request.urlopen(f'{BACKEND_URL}/api/saude', timeout=timeout) as resposta:
+            return resposta.status == 200
+    except OSError:
+        return False
+
+def wait_for_backend(backend_proc=None, limite=20.0):
+    """ Consulta /api/saude com espera crescente (10 ms até 250 ms) até a API
+        responder. Desiste se o processo do backend morrer ou o limite passar. """
+    inicio = time.perf_counter()
+    espera = 0.01
+    while time.perf_counter() - inicio < limite:
+        if backend_ready():
+            return time.perf_counter() - inicio
+        if backend_proc is not None and backend_proc.poll() is not None:
+            return None
+        time.sleep(espera)
+        espera = min(espera * 1.5, 0.25)
     return None
 
+def start_backend_in_process():
+    """ Sobe a API numa thread deste mesmo interpretador (sem subprocesso). """
+    sys.path.insert(0, os.path.join(BASE_PATH, 'backend'))
+    from run import servir_em_thread
+    try:
+        return servir_em_thread(BACKEND_HOST, BACKEND_PORTA)
+    except OSError as e:
+        # Outra instância pode ter ocupado a porta entre o health check e o bind
+        print(f"[AVISO] Não foi possível abrir a porta {BACKEND_PORTA}: {e}")
+        return None
+
+def start_backend(em_processo):
+    """ Inicia o servidor Flask em um processo separado (ou numa thread, com
+        em_processo). No executável congelado não há run.py para outro
+        interpretador, então a thread é o único modo. """
+    if backend_ready():
+        print("[INFO] Backend já está rodando; reaproveitando.")
+        return None, None
+    if em_processo or getattr(sys, 'frozen', False):
+        return None, start_backend_in_process()
+    backend_path = os.path.join(BASE_PATH, 'backend', 'run.py')
+    # Garante que o subprocesso use o mesmo interpretador Python
+    return subprocess.Popen([sys.executable, backend_path]), None
+
 if __name__ == "__main__":
-    backend_proc = start_backend()
-    if backend_proc:
-        print("[INFO] Backend iniciado em processo separado. Esperando 2 segundos...")
-        time.sleep(2)
+    inicio = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Abre o sistema especialista numa janela desktop.")
+    parser.add_argument("--em-processo", action="store_true",
+                        default=os.environ.get("BACKEND_EM_PROCESSO") == "1",
+                        help="roda a API numa thread deste processo em vez de um subprocesso")
+    args = parser.parse_args()
+
+    backend_proc, servidor = start_backend(args.em_processo)
+
+    # Importado só agora: enquanto isso o backend já está subindo
+    import webview
+
+    espera = wait_for_backend(backend_proc)
+    if espera is None:
+        print("[ERRO] O backend não respondeu em /api/saude; abrindo a janela mesmo assim.")
+    else:
+        print(f"[INFO] Backend pronto em {time.perf_counter() - inicio:.2f}s")
 
     # Define qual é a sua página HTML inicial
     frontend_path = os.path.join(BASE_PATH, 'frontend', 'kbs.html')
     url = f'file://{os.path.abspath(frontend_path)}'
-    
+
     print(f"[INFO] Abrindo janela desktop para {url}")
-    
+
     try:
         webview.create_window('My Expert App', url, width=1200, height=800)
         webview.start()
@@ -45,4 +104,6 @@ if __name__ == "__main__":
     finally:
         if backend_proc:
             print("[INFO] Encerrando backend...")
-            backend_proc.terminate()
\ No newline at end of file
+            backend_proc.terminate()
+        if servidor:
+            servidor.shutdown()